@@ -0,0 +1,173 @@
+"""Callables shared by the upload_to_s3 DAGs.
+
+AWS clients can be passed in (e.g. clients created under moto's mock_aws),
+otherwise they are created for REGION on each call.
+"""
+import os
+import shutil
+import subprocess
+from datetime import datetime, timedelta
+
+import boto3
+
+S3_BUCKET_NAME = 'ete-retailitics-storage-bucket'
+S3_RAW_KEY = 'data/raw'
+LOCAL_DATA_PATH = './retail_data_v2'
+# Each run generates into its own directory; master data, rollups and sketches stay shared in LOCAL_DATA_PATH
+STAGING_PATH = './staging'
+INSTANCE_ID = 'i-009a5f98335c002f0'
+REGION = 'ap-southeast-2'
+EC2_POLL_INTERVAL = 15  # seconds between state checks while waiting on the instance
+# Runs sharing the instance each hold a tag on it; the last run to release it stops it.
+# acquire_instance and release_instance must run one at a time (the EC2_POOL pool has a single slot).
+RUN_TAG_PREFIX = 'retailitics:run:'
+EC2_POOL = 'ec2_instance'
+
+
+def window_dates(start: str, end: str):
+    """The YYYY-MM-DD dates in [start, end), i.e. the days of a data interval."""
+    day = datetime.fromisoformat(start).date()
+    end_day = datetime.fromisoformat(end).date()
+    dates = []
+    while day < end_day:
+        dates.append(day.strftime("%Y-%m-%d"))
+        day += timedelta(days=1)
+    return dates
+
+
+def run_dir_for(execution_date: str, staging_path: str = STAGING_PATH):
+    return os.path.join(staging_path, execution_date)
+
+
+def generate_retail_data(execution_date: str, run_dir: str, master_dir: str = LOCAL_DATA_PATH, **_):
+    """Call the generator with Y M D taken from the DAG run date, writing into the run's staging dir."""
+    dt = datetime.fromisoformat(execution_date)
+    y, m, d = dt.strftime("%Y"), dt.strftime("%m"), dt.strftime("%d")
+    subprocess.run([
+        "uv", "run", "scripts/data_generator_2.py", y, m, d,
+        "--output-dir", run_dir,
+        "--master-dir", master_dir,
+        "--rollup-dir", os.path.join(master_dir, "rollups"),
+        "--sketch-dir", master_dir,
+    ], check=True)
+
+
+def generate_and_upload_retail_data(execution_date: str, run_dir: str, bucket_name: str,
+                                    master_dir: str = LOCAL_DATA_PATH, **_):
+    """Pipelined generate -> write -> upload: the generator uploads part files while it is still generating.
+
+    Master data is not uploaded here; see upload_master_data.
+    """
+    dt = datetime.fromisoformat(execution_date)
+    y, m, d = dt.strftime("%Y"), dt.strftime("%m"), dt.strftime("%d")
+    subprocess.run([
+        "uv", "run", "scripts/data_generator_2.py", y, m, d,
+        "--output-dir", run_dir,
+        "--master-dir", master_dir,
+        "--rollup-dir", os.path.join(master_dir, "rollups"),
+        "--sketch-dir", master_dir,
+        "--upload-bucket", bucket_name,
+        "--upload-prefix", S3_RAW_KEY,
+    ], check=True)
+
+
+def upload_master_data(bucket_name: str, master_dir: str = LOCAL_DATA_PATH, s3=None):
+    """Upload the shared master data files to the static folder."""
+    s3 = s3 or boto3.client("s3")
+
+    static_list = ["customers.parquet", "products.parquet", "stores.parquet"]
+
+    # Master data is read-only for runs, so it comes from the shared snapshot
+    for fname in static_list:
+        fpath = os.path.join(master_dir, fname)
+        if os.path.isfile(fpath):
+            s3.upload_file(fpath, bucket_name, f"{S3_RAW_KEY}/static/{fname}")
+
+
+def upload_to_s3(local_dir: str, bucket_name: str, execution_date: str, master_dir: str = LOCAL_DATA_PATH,
+                 s3=None, include_master_data: bool = True, **_):
+    """Upload the files of this run's staging dir, and the shared master data, to a partitioned S3 folder."""
+    dt_str = datetime.fromisoformat(execution_date).strftime("%Y-%m-%d")
+    s3 = s3 or boto3.client("s3")
+
+    if include_master_data:
+        upload_master_data(bucket_name, master_dir, s3)
+
+    for fname in os.listdir(local_dir):
+        fpath = os.path.join(local_dir, fname)
+        if not os.path.isfile(fpath):
+            continue
+
+        if fname.startswith(f"transactions_{dt_str}") or fname.startswith(f"daily_summary_{dt_str}"):
+            key = f"{S3_RAW_KEY}/transactions/{dt_str}/{fname}"
+            s3.upload_file(fpath, bucket_name, key)
+
+    # Partitioned layout: keep the Hive-style path so loaders can prune by date and store
+    partition_root = os.path.join(local_dir, "transactions", f"transaction_date={dt_str}")
+    for root, _, files in os.walk(partition_root):
+        for fname in files:
+            fpath = os.path.join(root, fname)
+            key = f"{S3_RAW_KEY}/" + os.path.relpath(fpath, local_dir).replace(os.sep, "/")
+            s3.upload_file(fpath, bucket_name, key)
+
+    # Normalized layout: header and line-item files for the day, one prefix per dataset
+    for dataset in ("transactions", "transaction_items"):
+        fpath = os.path.join(local_dir, "normalized", dataset, f"{dataset}_{dt_str}.parquet")
+        if os.path.isfile(fpath):
+            s3.upload_file(fpath, bucket_name, f"{S3_RAW_KEY}/normalized/{dataset}/{dt_str}/{dataset}_{dt_str}.parquet")
+
+
+def cleanup_run_dir(run_dir: str, **_):
+    """Remove the run's staging dir once its files are in S3."""
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def start_instance(instance_id: str = INSTANCE_ID, ec2=None, wait: bool = True, **_):
+    """Start the instance; with wait=False only send the request and leave the wait to a deferrable sensor."""
+    ec2 = ec2 or boto3.client("ec2", region_name=REGION)
+    ec2.start_instances(InstanceIds=[instance_id])
+    if not wait:
+        return "instance starting"
+    waiter = ec2.get_waiter("instance_running")
+    waiter.wait(InstanceIds=[instance_id])
+    return "instance running"
+
+
+def stop_instance(instance_id: str = INSTANCE_ID, ec2=None, wait: bool = True, **_):
+    """Stop the instance; with wait=False only send the request and leave the wait to a deferrable sensor."""
+    ec2 = ec2 or boto3.client("ec2", region_name=REGION)
+    ec2.stop_instances(InstanceIds=[instance_id])
+    if not wait:
+        return "instance stopping"
+    waiter = ec2.get_waiter("instance_stopped")
+    waiter.wait(InstanceIds=[instance_id])
+    return "instance_stopped"
+
+
+def _run_tags(ec2, instance_id: str):
+    response = ec2.describe_tags(Filters=[{"Name": "resource-id", "Values": [instance_id]}])
+    return [tag["Key"] for tag in response["Tags"] if tag["Key"].startswith(RUN_TAG_PREFIX)]
+
+
+def acquire_instance(run_id: str, instance_id: str = INSTANCE_ID, ec2=None, wait: bool = True, **_):
+    """Tag the instance as in use by this run, then start it (a no-op when another run already has)."""
+    ec2 = ec2 or boto3.client("ec2", region_name=REGION)
+    ec2.create_tags(Resources=[instance_id], Tags=[{"Key": RUN_TAG_PREFIX + run_id, "Value": ""}])
+    # The last run to release may have stopped it just before; it can only be started once stopped
+    reservations = ec2.describe_instances(InstanceIds=[instance_id])["Reservations"]
+    if reservations[0]["Instances"][0]["State"]["Name"] == "stopping":
+        ec2.get_waiter("instance_stopped").wait(InstanceIds=[instance_id])
+    return start_instance(instance_id, ec2, wait)
+
+
+def release_instance(run_id: str, instance_id: str = INSTANCE_ID, ec2=None, wait: bool = True, **_):
+    """Drop this run's tag and stop the instance if no other run still holds it.
+
+    Returns True if the instance was stopped.
+    """
+    ec2 = ec2 or boto3.client("ec2", region_name=REGION)
+    ec2.delete_tags(Resources=[instance_id], Tags=[{"Key": RUN_TAG_PREFIX + run_id}])
+    if _run_tags(ec2, instance_id):
+        return False
+    stop_instance(instance_id, ec2, wait)
+    return True
@@ -2,95 +2,60 @@ import airflow
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from airflow.operators.bash import BashOperator
-import boto3
+from airflow.providers.amazon.aws.sensors.ec2 import EC2InstanceStateSensor
 from datetime import datetime, timedelta
-import os
-import subprocess
+
+from retail_tasks import (
+    EC2_POLL_INTERVAL,
+    EC2_POOL,
+    INSTANCE_ID,
+    REGION,
+    S3_BUCKET_NAME,
+    STAGING_PATH,
+    acquire_instance,
+    cleanup_run_dir,
+    generate_retail_data,
+    release_instance,
+    upload_to_s3,
+)
 
 today = datetime.now()
-S3_BUCKET_NAME = 'ete-retailitics-storage-bucket'
-S3_RAW_KEY = 'data/raw'
-LOCAL_DATA_PATH = './retail_data_v2'
-INSTANCE_ID = 'i-009a5f98335c002f0'
+RUN_DIR = STAGING_PATH + "/{{ ds }}"
 
 default_args = {
     'owner': 'data_engineer',
-    'depends_on_past': True,
     'retries': 1,
     'retry_delay': timedelta(minutes=5),
 }
 
-def generate_retail_data(execution_date: str, **_):
-    """Call the generator with Y M D taken from the DAG run date."""
-    dt = datetime.fromisoformat(execution_date)
-    y, m, d = dt.strftime("%Y"), dt.strftime("%m"), dt.strftime("%d")
-    subprocess.run(["uv", "run", "scripts/data_generator_2.py", y, m, d], check=True)
-
-def upload_to_s3(local_dir: str, bucket_name: str, execution_date: str, **_):
-    """Upload all files produced for this run to a partitioned S3 folder."""
-    dt_str = datetime.fromisoformat(execution_date).strftime("%Y-%m-%d")
-    s3 = boto3.client("s3")
-
-    static_list = ["customers.parquet", "products.parquet", "stores.parquet"]
-
-    for fname in os.listdir(local_dir):
-        fpath = os.path.join(local_dir, fname)
-        if not os.path.isfile(fpath):
-            continue
-
-        if fname in static_list:
-            key = f"{S3_RAW_KEY}/static/{fname}"
-            s3.upload_file(fpath, bucket_name, key)
-            continue
-
-        if fname.startswith(f"transactions_{dt_str}"):
-            key = f"{S3_RAW_KEY}/transactions/{dt_str}/{fname}"
-            s3.upload_file(fpath, bucket_name, key)
-            continue
-        elif fname.startswith(f"daily_summary_{dt_str}"):
-            key = f"{S3_RAW_KEY}/transactions/{dt_str}/{fname}"
-            s3.upload_file(fpath, bucket_name, key)
-            continue
-        else:
-            continue
-
-        # if fname.startswith(f"transactions_{dt_str}"):
-        #     key = f"{S3_RAW_KEY}/transactions/{dt_str}/{fname}"
-        # elif fname.startswith("daily_summary"):
-        #     key = f"{S3_RAW_KEY}/daily_summary/{dt_str}/{fname}"
-        # else:
-        #     key = f"{S3_RAW_KEY}/static/{fname}"
-
-            s3.upload_file(fpath, bucket_name, key)
-    
-    
-
-def start_instance():
-    ec2 = boto3.client("ec2", region_name="ap-southeast-2")
-    ec2.start_instances(InstanceIds=[INSTANCE_ID])
-    waiter = ec2.get_waiter("instance_running")
-    waiter.wait(InstanceIds=[INSTANCE_ID])  
-    return "instance running"
-
-def stop_instance():
-    ec2 = boto3.client("ec2", region_name="ap-southeast-2")
-    ec2.stop_instances(InstanceIds=[INSTANCE_ID])
-    waiter = ec2.get_waiter("instance_stopped")
-    waiter.wait(InstanceIds=[INSTANCE_ID])  
-    return "instance_stopped"
-
+# Covers the same dates, S3 keys and instance as upload_to_s3_windowed; keep only one of the two unpaused
 with DAG(
     dag_id="upload_to_s3",
     start_date=datetime(2025, 1, 1),
     schedule="@daily",
     catchup=True,
-    max_active_runs=1,
+    # Runs overlap on the shared instance: each run holds it from start_ec2 to stop_ec2, and
+    # only the last run to let go stops it. Those two tasks run one at a time in EC2_POOL, a
+    # one-slot pool created by airflow-init. 16 runs stays well under EC2's 50 tags per instance.
+    max_active_runs=16,
     default_args=default_args,
 ) as dag:
 
+    # Only the start request runs on a worker; the wait is deferred to the triggerer
     start = PythonOperator(
-        task_id = "start_ec2", 
-        python_callable = start_instance
+        task_id = "start_ec2",
+        python_callable = acquire_instance,
+        op_kwargs={"run_id": "{{ run_id }}", "wait": False},
+        pool = EC2_POOL
+        )
+
+    wait_running = EC2InstanceStateSensor(
+        task_id = "wait_for_ec2_running",
+        instance_id = INSTANCE_ID,
+        target_state = "running",
+        region_name = REGION,
+        poke_interval = EC2_POLL_INTERVAL,
+        deferrable = True
         )
 
     generate_data = PythonOperator(
@@ -103,7 +68,8 @@ with DAG(
         #     ),
         python_callable = generate_retail_data,
         op_kwargs={
-            "execution_date" : "{{ ds }}"
+            "execution_date" : "{{ ds }}",
+            "run_dir": RUN_DIR
         }
     )
 
@@ -111,16 +77,26 @@ with DAG(
         task_id = "upload_to_bucket", 
         python_callable = upload_to_s3, 
         op_kwargs={
-            "local_dir": LOCAL_DATA_PATH, 
+            "local_dir": RUN_DIR, 
             "bucket_name": S3_BUCKET_NAME,
             "execution_date": "{{ ds }}"
             }
         )
 
+    cleanup = PythonOperator(
+        task_id = "cleanup_run_dir",
+        python_callable = cleanup_run_dir,
+        op_kwargs={"run_dir": RUN_DIR}
+        )
+
+    # Waits for the stop on the worker while holding the pool slot, so a run starting meanwhile
+    # never finds the instance stopping (a deferred wait could also miss a stop undone by such a run)
     stop = PythonOperator(
-        task_id = "stop_ec2", 
-        python_callable = stop_instance,
+        task_id = "stop_ec2",
+        python_callable = release_instance,
+        op_kwargs={"run_id": "{{ run_id }}"},
+        pool = EC2_POOL,
         trigger_rule = 'all_done'
         )
 
-    start >> generate_data >> upload >> stop
\ No newline at end of file
+    start >> wait_running >> generate_data >> upload >> cleanup >> stop
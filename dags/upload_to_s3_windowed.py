@@ -0,0 +1,115 @@
+from airflow import DAG
+from airflow.decorators import task, task_group
+from airflow.operators.python import PythonOperator
+from airflow.providers.amazon.aws.sensors.ec2 import EC2InstanceStateSensor
+from airflow.timetables.interval import DeltaDataIntervalTimetable
+from datetime import datetime, timedelta
+
+import retail_tasks
+from retail_tasks import (
+    EC2_POLL_INTERVAL,
+    INSTANCE_ID,
+    REGION,
+    S3_BUCKET_NAME,
+    run_dir_for,
+    start_instance,
+    stop_instance,
+    window_dates,
+)
+
+# One run covers WINDOW_DAYS dates: the instance boots and stops once per window
+# instead of once per day, which is what dominates catchup time.
+# This DAG and upload_to_s3 cover the same dates, S3 keys and instance, so only one
+# of them may be unpaused; this one is created paused and is switched on in place of
+# upload_to_s3 (pause that one first).
+WINDOW_DAYS = 7
+# Generate and upload each date in one pipelined task (part files are uploaded while the day
+# is still being generated) instead of generate_retail_data followed by upload_to_bucket
+PIPELINED_UPLOAD = False
+
+default_args = {
+    'owner': 'data_engineer',
+    'retries': 1,
+    'retry_delay': timedelta(minutes=5),
+}
+
+with DAG(
+    dag_id="upload_to_s3_windowed",
+    start_date=datetime(2025, 1, 1),
+    schedule=DeltaDataIntervalTimetable(timedelta(days=WINDOW_DAYS)),
+    catchup=True,
+    # Windows share the instance: overlapping runs would stop it under each other
+    max_active_runs=1,
+    is_paused_upon_creation=True,
+    default_args=default_args,
+) as dag:
+
+    # Only the start/stop requests run on a worker; the waits are deferred to the triggerer
+    start = PythonOperator(
+        task_id = "start_ec2",
+        python_callable = start_instance,
+        op_kwargs={"wait": False}
+        )
+
+    wait_running = EC2InstanceStateSensor(
+        task_id = "wait_for_ec2_running",
+        instance_id = INSTANCE_ID,
+        target_state = "running",
+        region_name = REGION,
+        poke_interval = EC2_POLL_INTERVAL,
+        deferrable = True
+        )
+
+    # Master data is the same for every date, so it is uploaded once per window
+    @task
+    def upload_master_data():
+        retail_tasks.upload_master_data(S3_BUCKET_NAME)
+
+    @task
+    def list_window_dates(data_interval_start=None, data_interval_end=None):
+        return window_dates(data_interval_start.isoformat(), data_interval_end.isoformat())
+
+    # Mapped per date, so a failed day retries on its own without holding back the others
+    @task_group
+    def process_date(execution_date: str):
+
+        @task
+        def generate_retail_data(execution_date: str):
+            retail_tasks.generate_retail_data(execution_date, run_dir_for(execution_date))
+
+        @task
+        def upload_to_bucket(execution_date: str):
+            retail_tasks.upload_to_s3(run_dir_for(execution_date), S3_BUCKET_NAME, execution_date,
+                                      include_master_data=False)
+
+        @task
+        def generate_and_upload(execution_date: str):
+            retail_tasks.generate_and_upload_retail_data(execution_date, run_dir_for(execution_date), S3_BUCKET_NAME)
+
+        @task
+        def cleanup_run_dir(execution_date: str):
+            retail_tasks.cleanup_run_dir(run_dir_for(execution_date))
+
+        if PIPELINED_UPLOAD:
+            generate_and_upload(execution_date) >> cleanup_run_dir(execution_date)
+        else:
+            generate_retail_data(execution_date) >> upload_to_bucket(execution_date) >> cleanup_run_dir(execution_date)
+
+    stop = PythonOperator(
+        task_id = "stop_ec2",
+        python_callable = stop_instance,
+        op_kwargs={"wait": False},
+        trigger_rule = 'all_done'
+        )
+
+    wait_stopped = EC2InstanceStateSensor(
+        task_id = "wait_for_ec2_stopped",
+        instance_id = INSTANCE_ID,
+        target_state = "stopped",
+        region_name = REGION,
+        poke_interval = EC2_POLL_INTERVAL,
+        deferrable = True
+        )
+
+    processed = process_date.expand(execution_date=list_window_dates())
+    start >> wait_running >> [processed, upload_master_data()] >> stop >> wait_stopped
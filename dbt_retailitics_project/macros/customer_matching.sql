@@ -0,0 +1,65 @@
+{#
+    Blocking keys for customer deduplication. Duplicates produced by the
+    generator differ by case, single-character typos, .NN email suffixes,
+    reformatted phone numbers or missing fields, so each key normalises one
+    of those variations away. Records are only compared when they share a key.
+#}
+
+{% macro regexp_replace_all(expression, pattern, replacement) %}
+    {{ return(adapter.dispatch('regexp_replace_all')(expression, pattern, replacement)) }}
+{% endmacro %}
+
+{% macro default__regexp_replace_all(expression, pattern, replacement) %}
+    regexp_replace({{ expression }}, '{{ pattern }}', '{{ replacement }}', 'g')
+{% endmacro %}
+
+{% macro snowflake__regexp_replace_all(expression, pattern, replacement) %}
+    regexp_replace({{ expression }}, '{{ pattern }}', '{{ replacement }}')
+{% endmacro %}
+
+
+{# Last 10 digits of the phone number without extension, so +1-, dots and brackets don't matter #}
+{% macro customer_phone_key(phone) %}
+    CASE
+        WHEN length({{ regexp_replace_all(regexp_replace_all(phone, 'x.*$', ''), '[^0-9]', '') }}) >= 10
+        THEN right({{ regexp_replace_all(regexp_replace_all(phone, 'x.*$', ''), '[^0-9]', '') }}, 10)
+    END
+{% endmacro %}
+
+
+{# Lower-cased email with a trailing .NN removed from the local part #}
+{% macro customer_email_key(email) %}
+    CASE
+        WHEN {{ email }} LIKE '%@%'
+        THEN regexp_replace(lower(split_part({{ email }}, '@', 1)), '[.][0-9]{1,2}$', '')
+            || '@' || lower(split_part({{ email }}, '@', 2))
+    END
+{% endmacro %}
+
+
+{# Phonetic last name plus first initial; typos after the first letter and case changes map to the same key #}
+{% macro customer_name_key(first_name, last_name) %}
+    CASE
+        WHEN {{ first_name }} IS NOT NULL AND {{ last_name }} IS NOT NULL
+        THEN {{ name_soundex(last_name) }} || lower(left({{ first_name }}, 1))
+    END
+{% endmacro %}
+
+
+{% macro name_soundex(expression) %}
+    {{ return(adapter.dispatch('name_soundex')(expression)) }}
+{% endmacro %}
+
+{% macro snowflake__name_soundex(expression) %}
+    soundex({{ expression }})
+{% endmacro %}
+
+{# Simplified Soundex for adapters without a native function: letter codes, repeats collapsed, vowels dropped #}
+{% macro default__name_soundex(expression) %}
+    {%- set letters = regexp_replace_all('upper(' ~ expression ~ ')', '[^A-Z]', '') -%}
+    {%- set coded = "translate(substr(" ~ letters ~ ", 2), 'AEIOUYHWBFPVCGJKQSXZDTLMNR', '00000000111122222222334556')" -%}
+    {%- for digit in ['1', '2', '3', '4', '5', '6'] -%}
+        {%- set coded = regexp_replace_all(coded, digit ~ '+', digit) -%}
+    {%- endfor -%}
+    left({{ letters }}, 1) || rpad(left(replace({{ coded }}, '0', ''), 3), 3, '0')
+{% endmacro %}
@@ -0,0 +1,45 @@
+{#
+    Source transaction timestamps are stored as epoch nanoseconds in Snowflake
+    (loaded from pandas datetime64[ns] Parquet columns) but arrive as native
+    timestamps when the Parquet files are read directly, e.g. by DuckDB.
+#}
+
+{% macro source_timestamp(column_name) %}
+    {{ return(adapter.dispatch('source_timestamp')(column_name)) }}
+{% endmacro %}
+
+{% macro default__source_timestamp(column_name) %}
+    cast({{ column_name }} as timestamp)
+{% endmacro %}
+
+{% macro snowflake__source_timestamp(column_name) %}
+    to_timestamp({{ column_name }}, 9)
+{% endmacro %}
+
+
+{# Convert a date expression to the raw source representation so filters on raw columns can prune #}
+{% macro source_timestamp_bound(date_expression) %}
+    {{ return(adapter.dispatch('source_timestamp_bound')(date_expression)) }}
+{% endmacro %}
+
+{% macro default__source_timestamp_bound(date_expression) %}
+    cast({{ date_expression }} as timestamp)
+{% endmacro %}
+
+{% macro snowflake__source_timestamp_bound(date_expression) %}
+    date_part(epoch_nanosecond, ({{ date_expression }})::timestamp_ntz)
+{% endmacro %}
+
+
+{# Parse a YYYYMMDD string, e.g. the date embedded in TXNYYYYMMDD###### transaction ids #}
+{% macro parse_yyyymmdd(expression) %}
+    {{ return(adapter.dispatch('parse_yyyymmdd')(expression)) }}
+{% endmacro %}
+
+{% macro default__parse_yyyymmdd(expression) %}
+    cast(strptime({{ expression }}, '%Y%m%d') as date)
+{% endmacro %}
+
+{% macro snowflake__parse_yyyymmdd(expression) %}
+    to_date({{ expression }}, 'YYYYMMDD')
+{% endmacro %}
@@ -0,0 +1,65 @@
+{#
+    On DuckDB the flat TRANSACTIONS source reads the raw_flat_transactions view.
+    It is recreated once per invocation (on-run-start) over the files listed by
+    the compaction manifest written by scripts/compaction.py: compacted files
+    for compacted months, daily files (or the part files of days written in
+    pipelined mode) for every other month. Every model in the run therefore
+    sees a month either as daily or as compacted files, never both.
+#}
+
+{% macro create_transaction_files_view() %}
+    {% if target.type != 'duckdb' or var('retail_data_layout') != 'flat' or not execute %}
+        {{ return('') }}
+    {% endif %}
+    {% set data_path = var('retail_data_path') %}
+    {% set manifest_path = data_path ~ '/transactions_manifest.json' %}
+    {% set has_manifest = run_query("SELECT count(*) FROM glob('" ~ manifest_path ~ "')").columns[0].values()[0] > 0 %}
+
+    {% set files_query %}
+        WITH compacted AS (
+            {% if has_manifest %}
+            SELECT entry.month, unnest(entry.files) AS file
+            FROM (
+                SELECT unnest(months) AS entry
+                FROM read_json('{{ manifest_path }}', columns={months: 'STRUCT(month VARCHAR, files VARCHAR[])[]'})
+            )
+            {% else %}
+            SELECT NULL::VARCHAR AS month, NULL::VARCHAR AS file WHERE false
+            {% endif %}
+        )
+        , daily AS (
+            SELECT file FROM glob('{{ data_path }}/transactions_*.parquet')
+            UNION ALL
+            -- Days written in pipelined mode, once their summary marks them complete
+            SELECT file FROM glob('{{ data_path }}/transactions_*/part-*.parquet')
+            WHERE regexp_extract(file, 'transactions_([0-9-]{10})/part-[0-9]+[.]parquet$', 1) IN (
+                SELECT regexp_extract(file, 'daily_summary_([0-9-]{10})[.]json$', 1)
+                FROM glob('{{ data_path }}/daily_summary_*.json')
+            )
+        )
+        SELECT file
+        FROM daily
+        WHERE regexp_extract(file, 'transactions_([0-9]{4}-[0-9]{2})-[0-9]{2}([.]parquet|/part-[0-9]+[.]parquet)$', 1)
+            NOT IN (SELECT month FROM compacted)
+        UNION ALL
+        SELECT '{{ data_path }}/' || file FROM compacted
+        ORDER BY file
+    {% endset %}
+    {% set files = run_query(files_query).columns[0].values() %}
+    {% if files | length == 0 %}
+        {# Without files there is no schema for the view, and every model reading TRANSACTIONS would fail later #}
+        {{ exceptions.raise_compiler_error(
+            "No flat transaction files in " ~ data_path ~ " (transactions_YYYY-MM-DD.parquet, "
+            ~ "transactions_YYYY-MM-DD/part-*.parquet or compacted files in transactions_manifest.json). "
+            ~ "Generate data first, or point retail_data_path / retail_data_layout at existing files."
+        ) }}
+    {% endif %}
+
+    CREATE OR REPLACE VIEW {{ target.schema }}.raw_flat_transactions AS
+    SELECT *
+    FROM read_parquet([
+        {%- for file in files %}
+        '{{ file }}'{{ ',' if not loop.last }}
+        {%- endfor %}
+    ], union_by_name=true)
+{% endmacro %}
@@ -0,0 +1,22 @@
+{#
+    Incremental transaction models re-process the last stg_transactions_lookback_days
+    days already loaded into {{ this }}. The start day is rendered as a date literal
+    so the warehouse can prune files and partitions at plan time.
+#}
+
+{% macro transactions_lookback_start(partition_column='transaction_partition_date') %}
+    {% if not execute %}
+        {{ return("cast('1900-01-01' as date)") }}
+    {% endif %}
+    {% set lookback_query %}
+        SELECT {{ dbt.dateadd('day', -var('stg_transactions_lookback_days'), 'max(' ~ partition_column ~ ')') }} FROM {{ this }}
+    {% endset %}
+    {% set lookback_value = run_query(lookback_query).columns[0].values()[0] %}
+    {{ return("cast('" ~ (lookback_value.strftime('%Y-%m-%d') if lookback_value else '1900-01-01') ~ "' as date)") }}
+{% endmacro %}
+
+
+{# Day a transaction belongs to, taken from the TXNYYYYMMDD###### id (DUP prefixes removed) so it is never null #}
+{% macro transaction_partition_date(transaction_id) %}
+    {{ parse_yyyymmdd("substr(regexp_replace(" ~ transaction_id ~ ", '^(DUP)+', ''), 4, 8)") }}
+{% endmacro %}
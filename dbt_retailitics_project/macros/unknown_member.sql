@@ -0,0 +1,16 @@
+{#
+    Fact rows whose customer, product or store id is missing from its dimension
+    (the generator's INVALID#### products, null ids) point to an unknown member
+    row that every dimension carries, so fact keys always resolve.
+#}
+
+{% macro unknown_member_key() %}
+    '-1'
+{% endmacro %}
+
+
+{# Natural id of the unknown member row; generated ids never take this value #}
+{% macro unknown_member_id() %}
+    'UNKNOWN'
+{% endmacro %}
+
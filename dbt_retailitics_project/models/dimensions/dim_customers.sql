@@ -0,0 +1,146 @@
+{{config(
+    materialized='incremental',
+    unique_key='customer_id',
+    on_schema_change='append_new_columns'
+)}}
+
+-- One row per source customer record, each mapped to the master record it
+-- duplicates. Candidates are found by equi-joining on blocking keys instead of
+-- a full self-join, and only new customers are compared on incremental runs:
+-- against already resolved customers in their blocks and against each other.
+-- Two records match when at least two of phone, email, name and date of birth
+-- keys agree.
+
+WITH customers AS (
+    SELECT
+        *,
+        {{ customer_phone_key('phone') }} AS phone_key,
+        {{ customer_email_key('email') }} AS email_key,
+        {{ customer_name_key('first_name', 'last_name') }} AS name_key
+    FROM {{ ref('stg_customers') }}
+),
+
+new_customers AS (
+    SELECT *
+    FROM customers
+    {% if is_incremental() %}
+    WHERE customer_id NOT IN (SELECT customer_id FROM {{ this }})
+    {% endif %}
+),
+
+comparison_pool AS (
+    {% if is_incremental() %}
+    SELECT customer_id, master_customer_id, phone_key, email_key, name_key, date_of_birth
+    FROM {{ this }}
+    UNION ALL
+    {% endif %}
+    SELECT customer_id, customer_id AS master_customer_id, phone_key, email_key, name_key, date_of_birth
+    FROM new_customers
+),
+
+-- Very common keys (shared office numbers, placeholder emails) would bring back
+-- quadratic blocks, so they are not used for blocking
+oversized_blocks AS (
+    {% for key in ['phone_key', 'email_key', 'name_key'] %}
+    SELECT '{{ key }}' AS key_name, {{ key }} AS key_value
+    FROM comparison_pool
+    WHERE {{ key }} IS NOT NULL
+    GROUP BY {{ key }}
+    HAVING count(*) > {{ var('customer_match_max_block_size') }}
+    {% if not loop.last %}UNION ALL{% endif %}
+    {% endfor %}
+),
+
+candidate_pairs AS (
+    {% for key in ['phone_key', 'email_key', 'name_key'] %}
+    SELECT
+        n.customer_id,
+        p.master_customer_id AS candidate_master_id,
+        (CASE WHEN n.phone_key = p.phone_key THEN 1 ELSE 0 END)
+        + (CASE WHEN n.email_key = p.email_key THEN 1 ELSE 0 END)
+        + (CASE WHEN n.name_key = p.name_key THEN 1 ELSE 0 END)
+        + (CASE WHEN n.date_of_birth = p.date_of_birth THEN 1 ELSE 0 END) AS match_score
+    FROM new_customers n
+    JOIN comparison_pool p
+        ON n.{{ key }} = p.{{ key }}
+        AND n.customer_id <> p.customer_id
+    WHERE n.{{ key }} NOT IN (
+        SELECT key_value FROM oversized_blocks WHERE key_name = '{{ key }}'
+    )
+    {% if not loop.last %}UNION{% endif %}
+    {% endfor %}
+),
+
+matches AS (
+    SELECT
+        customer_id,
+        min(candidate_master_id) AS matched_master_id
+    FROM candidate_pairs
+    WHERE match_score >= 2
+    GROUP BY customer_id
+),
+
+resolved AS (
+    SELECT
+        c.*,
+        CASE
+            WHEN m.matched_master_id < c.customer_id THEN m.matched_master_id
+            ELSE c.customer_id
+        END AS master_customer_id
+    FROM new_customers c
+    LEFT JOIN matches m ON c.customer_id = m.customer_id
+)
+
+SELECT
+    {{ dbt_utils.generate_surrogate_key(['customer_id']) }} AS customer_key,
+    customer_id,
+    {{ dbt_utils.generate_surrogate_key(['master_customer_id']) }} AS master_customer_key,
+    master_customer_id,
+    master_customer_id <> customer_id AS is_duplicate,
+    first_name,
+    last_name,
+    email,
+    phone,
+    address,
+    city,
+    state,
+    zip_code,
+    date_of_birth,
+    gender,
+    registration_date,
+    loyalty_member,
+    preferred_contact,
+    customer_segment,
+    total_lifetime_value,
+    phone_key,
+    email_key,
+    name_key
+FROM resolved
+
+UNION ALL
+
+-- Unknown member for fact rows whose customer id is not in stg_customers
+SELECT
+    {{ unknown_member_key() }} AS customer_key,
+    {{ unknown_member_id() }} AS customer_id,
+    {{ unknown_member_key() }} AS master_customer_key,
+    {{ unknown_member_id() }} AS master_customer_id,
+    false AS is_duplicate,
+    NULL AS first_name,
+    NULL AS last_name,
+    NULL AS email,
+    NULL AS phone,
+    NULL AS address,
+    NULL AS city,
+    NULL AS state,
+    NULL AS zip_code,
+    NULL AS date_of_birth,
+    NULL AS gender,
+    NULL AS registration_date,
+    NULL AS loyalty_member,
+    NULL AS preferred_contact,
+    NULL AS customer_segment,
+    NULL AS total_lifetime_value,
+    NULL AS phone_key,
+    NULL AS email_key,
+    NULL AS name_key
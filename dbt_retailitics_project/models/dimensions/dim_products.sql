@@ -0,0 +1,98 @@
+{{config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='product_version_key',
+    on_schema_change='append_new_columns'
+)}}
+
+-- Type 2 product dimension built from products_snapshot. Incremental runs only
+-- pick up versions opened or closed since the last build, so the cost follows
+-- catalog churn rather than catalog size. -DUP SKU copies are mapped to the
+-- lowest product id sharing their SKU stem, name, brand, category and launch date.
+
+{% set last_changed_at %}
+    (SELECT max(last_changed_at) FROM {{ this }})
+{% endset %}
+
+WITH snapshot AS (
+    SELECT
+        *,
+        {{ dbt_utils.generate_surrogate_key([
+            "regexp_replace(sku, '(-DUP)+$', '')", 'product_name', 'brand', 'category', 'launch_date'
+        ]) }} AS product_match_key
+    FROM {{ ref('products_snapshot') }}
+),
+
+changed AS (
+    SELECT *
+    FROM snapshot
+    {% if is_incremental() %}
+    WHERE dbt_valid_from > {{ last_changed_at }}
+    OR dbt_valid_to > {{ last_changed_at }}
+    {% endif %}
+),
+
+canonical_products AS (
+    SELECT
+        product_match_key,
+        min(product_id) AS canonical_product_id
+    FROM snapshot
+    WHERE product_match_key IN (SELECT product_match_key FROM changed)
+    GROUP BY product_match_key
+)
+
+SELECT
+    c.dbt_scd_id AS product_version_key,
+    {{ dbt_utils.generate_surrogate_key(['c.product_id']) }} AS product_key,
+    c.product_id,
+    {{ dbt_utils.generate_surrogate_key(['p.canonical_product_id']) }} AS canonical_product_key,
+    p.canonical_product_id,
+    c.product_id <> p.canonical_product_id AS is_duplicate,
+    c.product_name,
+    c.category,
+    c.subcategory,
+    c.brand,
+    c.price,
+    c.cost,
+    c.sku,
+    c.description,
+    c.weight,
+    c.dimensions,
+    c.stock_quantity,
+    c.supplier,
+    c.launch_date,
+    c.dbt_valid_from AS valid_from,
+    c.dbt_valid_to AS valid_to,
+    c.dbt_valid_to IS NULL AS is_current,
+    coalesce(c.dbt_valid_to, c.dbt_valid_from) AS last_changed_at
+FROM changed c
+JOIN canonical_products p ON c.product_match_key = p.product_match_key
+
+UNION ALL
+
+-- Unknown member for fact rows whose product id is not in stg_products
+-- (the generator's INVALID#### references); one version, valid for all dates
+SELECT
+    {{ unknown_member_key() }} AS product_version_key,
+    {{ unknown_member_key() }} AS product_key,
+    {{ unknown_member_id() }} AS product_id,
+    {{ unknown_member_key() }} AS canonical_product_key,
+    {{ unknown_member_id() }} AS canonical_product_id,
+    false AS is_duplicate,
+    NULL AS product_name,
+    NULL AS category,
+    NULL AS subcategory,
+    NULL AS brand,
+    NULL AS price,
+    NULL AS cost,
+    NULL AS sku,
+    NULL AS description,
+    NULL AS weight,
+    NULL AS dimensions,
+    NULL AS stock_quantity,
+    NULL AS supplier,
+    NULL AS launch_date,
+    cast('1900-01-01' AS timestamp) AS valid_from,
+    NULL AS valid_to,
+    true AS is_current,
+    NULL AS last_changed_at
@@ -0,0 +1,89 @@
+{{config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='store_version_key',
+    on_schema_change='append_new_columns'
+)}}
+
+-- Type 2 store dimension built from stores_snapshot. Incremental runs only
+-- pick up versions opened or closed since the last build. "Branch" copies of a
+-- store are mapped to the lowest store id with the same base name and location.
+
+{% set last_changed_at %}
+    (SELECT max(last_changed_at) FROM {{ this }})
+{% endset %}
+
+WITH snapshot AS (
+    SELECT
+        *,
+        {{ dbt_utils.generate_surrogate_key([
+            "regexp_replace(store_name, '( Branch)+$', '')", 'city', 'state', 'zip_code'
+        ]) }} AS store_match_key
+    FROM {{ ref('stores_snapshot') }}
+),
+
+changed AS (
+    SELECT *
+    FROM snapshot
+    {% if is_incremental() %}
+    WHERE dbt_valid_from > {{ last_changed_at }}
+    OR dbt_valid_to > {{ last_changed_at }}
+    {% endif %}
+),
+
+canonical_stores AS (
+    SELECT
+        store_match_key,
+        min(store_id) AS canonical_store_id
+    FROM snapshot
+    WHERE store_match_key IN (SELECT store_match_key FROM changed)
+    GROUP BY store_match_key
+)
+
+SELECT
+    c.dbt_scd_id AS store_version_key,
+    {{ dbt_utils.generate_surrogate_key(['c.store_id']) }} AS store_key,
+    c.store_id,
+    {{ dbt_utils.generate_surrogate_key(['s.canonical_store_id']) }} AS canonical_store_key,
+    s.canonical_store_id,
+    c.store_id <> s.canonical_store_id AS is_duplicate,
+    c.store_name,
+    c.address,
+    c.city,
+    c.state,
+    c.zip_code,
+    c.phone,
+    c.manager,
+    c.store_type,
+    c.opening_date,
+    c.dbt_valid_from AS valid_from,
+    c.dbt_valid_to AS valid_to,
+    c.dbt_valid_to IS NULL AS is_current,
+    coalesce(c.dbt_valid_to, c.dbt_valid_from) AS last_changed_at
+FROM changed c
+JOIN canonical_stores s ON c.store_match_key = s.store_match_key
+
+UNION ALL
+
+-- Unknown member for fact rows whose store id is not in stg_stores; one
+-- version, valid for all dates
+SELECT
+    {{ unknown_member_key() }} AS store_version_key,
+    {{ unknown_member_key() }} AS store_key,
+    {{ unknown_member_id() }} AS store_id,
+    {{ unknown_member_key() }} AS canonical_store_key,
+    {{ unknown_member_id() }} AS canonical_store_id,
+    false AS is_duplicate,
+    NULL AS store_name,
+    NULL AS address,
+    NULL AS city,
+    NULL AS state,
+    NULL AS zip_code,
+    NULL AS phone,
+    NULL AS manager,
+    NULL AS store_type,
+    NULL AS opening_date,
+    cast('1900-01-01' AS timestamp) AS valid_from,
+    NULL AS valid_to,
+    true AS is_current,
+    NULL AS last_changed_at
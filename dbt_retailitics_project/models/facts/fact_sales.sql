@@ -0,0 +1,105 @@
+{{config(
+    materialized=var('transactions_materialization'),
+    incremental_strategy='delete+insert',
+    unique_key='sale_date',
+    cluster_by=['sale_date', 'store_id'],
+    on_schema_change='append_new_columns'
+)}}
+
+-- One row per sold line item. Generator duplicates (DUP-prefixed copies of a
+-- transaction) are collapsed onto the original line; a DUP line is only kept
+-- when its original never arrived. Products and stores resolve to the SCD2
+-- version valid on the sale date (valid_from <= sale date < valid_to); the
+-- first version of each id also covers the days before it was first
+-- snapshotted. Ids missing from their dimension get the unknown member key.
+-- Loaded incrementally by whole days.
+
+WITH transactions AS (
+    SELECT *
+    FROM {{ ref('stg_retail_transactions') }}
+    {% if is_incremental() %}
+    WHERE transaction_partition_date >= (
+        SELECT {{ dbt.dateadd('day', -var('stg_transactions_lookback_days'), 'max(sale_date)') }}
+        FROM {{ this }}
+    )
+    {% endif %}
+),
+
+deduplicated AS (
+    SELECT
+        *,
+        row_number() OVER (
+            PARTITION BY original_transaction_id, product_id
+            ORDER BY is_duplicate_record, transaction_datetime, transaction_id
+        ) AS line_rank
+    FROM transactions
+),
+
+sale_lines AS (
+    SELECT
+        *,
+        cast(transaction_partition_date AS timestamp) AS sale_timestamp
+    FROM deduplicated
+    WHERE line_rank = 1
+),
+
+product_versions AS (
+    SELECT
+        product_id,
+        product_key,
+        product_version_key,
+        CASE
+            WHEN row_number() OVER (PARTITION BY product_id ORDER BY valid_from) > 1 THEN valid_from
+        END AS effective_from,
+        valid_to
+    FROM {{ ref('dim_products') }}
+),
+
+store_versions AS (
+    SELECT
+        store_id,
+        store_key,
+        store_version_key,
+        CASE
+            WHEN row_number() OVER (PARTITION BY store_id ORDER BY valid_from) > 1 THEN valid_from
+        END AS effective_from,
+        valid_to
+    FROM {{ ref('dim_stores') }}
+)
+
+SELECT
+    {{ dbt_utils.generate_surrogate_key(['l.original_transaction_id', 'l.product_id']) }} AS sales_line_key,
+    l.transaction_partition_date AS sale_date,
+    cast(extract(year FROM l.transaction_partition_date) * 10000
+        + extract(month FROM l.transaction_partition_date) * 100
+        + extract(day FROM l.transaction_partition_date) AS integer) AS date_key,
+    coalesce(c.customer_key, {{ unknown_member_key() }}) AS customer_key,
+    coalesce(p.product_key, {{ unknown_member_key() }}) AS product_key,
+    coalesce(p.product_version_key, {{ unknown_member_key() }}) AS product_version_key,
+    coalesce(s.store_key, {{ unknown_member_key() }}) AS store_key,
+    coalesce(s.store_version_key, {{ unknown_member_key() }}) AS store_version_key,
+    l.original_transaction_id AS transaction_id,
+    l.is_duplicate_record AS loaded_from_duplicate,
+    l.transaction_datetime,
+    l.customer_id,
+    l.product_id,
+    l.store_id,
+    l.cashier_id,
+    l.payment_method,
+    l.promotion_code,
+    l.status,
+    l.quantity,
+    l.unit_price,
+    l.discount_percent,
+    l.line_total
+FROM sale_lines l
+LEFT JOIN {{ ref('dim_customers') }} c
+    ON l.customer_id = c.customer_id
+LEFT JOIN product_versions p
+    ON l.product_id = p.product_id
+    AND (p.effective_from IS NULL OR p.effective_from <= l.sale_timestamp)
+    AND (p.valid_to IS NULL OR l.sale_timestamp < p.valid_to)
+LEFT JOIN store_versions s
+    ON l.store_id = s.store_id
+    AND (s.effective_from IS NULL OR s.effective_from <= l.sale_timestamp)
+    AND (s.valid_to IS NULL OR l.sale_timestamp < s.valid_to)
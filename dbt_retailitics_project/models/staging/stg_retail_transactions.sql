@@ -1,12 +1,67 @@
 {{config(
-    materialized='view'
+    materialized=var('transactions_materialization'),
+    incremental_strategy='delete+insert',
+    unique_key='transaction_partition_date',
+    cluster_by=['transaction_partition_date'],
+    on_schema_change='append_new_columns'
 )}}
 
+-- Incremental by transaction date partition: each run deletes and re-inserts
+-- whole days inside the lookback window, so late-arriving DUP copies and
+-- re-delivered files replace their day instead of piling up as extra rows.
+
+{% if is_incremental() %}
+    {% set lookback_start = transactions_lookback_start() %}
+{% endif %}
+
+WITH source AS (
+    {% if var('retail_data_layout') == 'normalized' %}
+    -- Normalized files: rebuild the line-item grain; a transaction without items keeps one zero line
+    SELECT
+        headers.*,
+        items.product_id,
+        items.product_name,
+        items.category,
+        coalesce(items.quantity, 0) AS quantity,
+        coalesce(items.unit_price, 0) AS unit_price,
+        coalesce(items.discount_percent, 0) AS discount_percent,
+        coalesce(items.line_total, 0) AS line_total
+    FROM {{ source('RETAILITICS_TRANSACTIONS', 'TRANSACTION_HEADERS') }} AS headers
+    LEFT JOIN {{ source('RETAILITICS_TRANSACTIONS', 'TRANSACTION_ITEMS') }} AS items
+        ON items.transaction_id = headers.transaction_id
+    {% else %}
+    SELECT *
+    FROM {{source ('RETAILITICS_TRANSACTIONS', 'TRANSACTIONS' )}}
+    {% endif %}
+    {% if is_incremental() %}
+    {% if target.type == 'duckdb' and var('retail_data_layout') == 'hive' %}
+    -- Hive partitions are keyed by the transaction id date, so older directories are skipped
+    WHERE transaction_date >= {{ lookback_start }}
+    {% else %}
+    -- Compare the raw date column so the warehouse can prune partitions
+    WHERE date >= {{ source_timestamp_bound(lookback_start) }}
+    -- rows with a missing timestamp carry no date and are re-checked against the window below
+    OR date IS NULL
+    {% endif %}
+    {% endif %}
+),
+
+transactions AS (
+    SELECT
+        *,
+        regexp_replace(transaction_id, '^(DUP)+', '') AS original_transaction_id
+    FROM source
+)
+
 SELECT
+    -- Day the transaction belongs to, taken from the TXNYYYYMMDD###### id so it is never null
+    {{ parse_yyyymmdd('substr(original_transaction_id, 4, 8)') }} AS transaction_partition_date,
     transaction_id,
-    to_date(to_timestamp(date,9)) AS transaction_date,
+    original_transaction_id,
+    transaction_id LIKE 'DUP%' AS is_duplicate_record,
+    cast({{ source_timestamp('date') }} AS date) AS transaction_date,
     time AS transaction_time,
-    to_timestamp(datetime,9) AS transaction_datetime,
+    {{ source_timestamp('datetime') }} AS transaction_datetime,
     customer_id,
     store_id,
     store_name,
@@ -27,4 +82,7 @@ SELECT
     unit_price,
     discount_percent,
     line_total
-FROM {{source ('RETAILITICS_TRANSACTIONS', 'TRANSACTIONS' )}}
\ No newline at end of file
+FROM transactions
+{% if is_incremental() %}
+WHERE {{ parse_yyyymmdd('substr(original_transaction_id, 4, 8)') }} >= {{ lookback_start }}
+{% endif %}
@@ -0,0 +1,50 @@
+{{config(
+    enabled=(var('retail_data_layout') == 'normalized'),
+    materialized=var('transactions_materialization'),
+    incremental_strategy='delete+insert',
+    unique_key='transaction_partition_date',
+    cluster_by=['transaction_partition_date'],
+    on_schema_change='append_new_columns'
+)}}
+
+-- One row per transaction from the normalized output (retail_data_layout: normalized).
+-- Join stg_transaction_items on transaction_id only when line items are needed.
+
+{% if is_incremental() %}
+    {% set lookback_start = transactions_lookback_start() %}
+{% endif %}
+
+WITH source AS (
+    SELECT *
+    FROM {{ source('RETAILITICS_TRANSACTIONS', 'TRANSACTION_HEADERS') }}
+    {% if is_incremental() %}
+    WHERE date >= {{ source_timestamp_bound(lookback_start) }}
+    OR date IS NULL
+    {% endif %}
+)
+
+SELECT
+    {{ transaction_partition_date('transaction_id') }} AS transaction_partition_date,
+    transaction_id,
+    regexp_replace(transaction_id, '^(DUP)+', '') AS original_transaction_id,
+    transaction_id LIKE 'DUP%' AS is_duplicate_record,
+    cast({{ source_timestamp('date') }} AS date) AS transaction_date,
+    time AS transaction_time,
+    {{ source_timestamp('datetime') }} AS transaction_datetime,
+    customer_id,
+    store_id,
+    store_name,
+    cashier_id,
+    payment_method,
+    subtotal,
+    tax_amount,
+    total_amount,
+    items_count,
+    loyalty_points_earned,
+    promotion_code,
+    refund_reason,
+    status
+FROM source
+{% if is_incremental() %}
+WHERE {{ transaction_partition_date('transaction_id') }} >= {{ lookback_start }}
+{% endif %}
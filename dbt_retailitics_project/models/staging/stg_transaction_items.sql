@@ -0,0 +1,30 @@
+{{config(
+    enabled=(var('retail_data_layout') == 'normalized'),
+    materialized=var('transactions_materialization'),
+    incremental_strategy='delete+insert',
+    unique_key='transaction_partition_date',
+    cluster_by=['transaction_partition_date'],
+    on_schema_change='append_new_columns'
+)}}
+
+-- One row per line item from the normalized output, keyed by transaction_id and line_number.
+
+{% if is_incremental() %}
+    {% set lookback_start = transactions_lookback_start() %}
+{% endif %}
+
+SELECT
+    {{ transaction_partition_date('transaction_id') }} AS transaction_partition_date,
+    transaction_id,
+    line_number,
+    product_id,
+    product_name,
+    category,
+    quantity,
+    unit_price,
+    discount_percent,
+    line_total
+FROM {{ source('RETAILITICS_TRANSACTIONS', 'TRANSACTION_ITEMS') }}
+{% if is_incremental() %}
+WHERE {{ transaction_partition_date('transaction_id') }} >= {{ lookback_start }}
+{% endif %}
@@ -0,0 +1,20 @@
+{% snapshot products_snapshot %}
+
+{{config(
+    unique_key='product_id',
+    strategy='check',
+    check_cols=['row_hash']
+)}}
+
+-- Tracked attributes are hashed into one column so each run compares a single
+-- value per product; a new version is written only when the hash changes.
+
+SELECT
+    *,
+    {{ dbt_utils.generate_surrogate_key([
+        'product_name', 'category', 'subcategory', 'brand', 'price', 'cost', 'sku',
+        'description', 'weight', 'dimensions', 'stock_quantity', 'supplier', 'launch_date'
+    ]) }} AS row_hash
+FROM {{ ref('stg_products') }}
+
+{% endsnapshot %}
@@ -0,0 +1,20 @@
+{% snapshot stores_snapshot %}
+
+{{config(
+    unique_key='store_id',
+    strategy='check',
+    check_cols=['row_hash']
+)}}
+
+-- Tracked attributes are hashed into one column so each run compares a single
+-- value per store; a new version is written only when the hash changes.
+
+SELECT
+    *,
+    {{ dbt_utils.generate_surrogate_key([
+        'store_name', 'address', 'city', 'state', 'zip_code', 'phone',
+        'manager', 'store_type', 'opening_date'
+    ]) }} AS row_hash
+FROM {{ ref('stg_stores') }}
+
+{% endsnapshot %}
@@ -0,0 +1,108 @@
+{#
+    Evaluates every column rule of a model in a single scan. Each rule becomes
+    a failure flag and all flags are summed in one aggregate, so the model is
+    read once instead of once per not_null / unique / accepted_values / between
+    / relationships test. Returns one row per failing rule with its failure
+    count and the first and last failing key.
+
+    rules:
+      <column>:
+        - not_null
+        - unique
+        - accepted_values: [<value>, ...]
+        - between: {min_value: <number>, max_value: <number>}
+        - relationships: {to: <relation>, field: <column>}
+    row_count: {min_value: <number>, max_value: <number>}   (optional)
+#}
+
+{% test column_rules(model, rules, key_column, row_count=none) %}
+
+{%- set checks = [] -%}
+{%- set parents = [] -%}
+
+{%- for column_name, column_rules in rules.items() -%}
+    {%- for rule in column_rules -%}
+        {%- if rule is string -%}
+            {%- set rule_name, options = rule, none -%}
+        {%- else -%}
+            {%- set rule_name, options = (rule.items() | list)[0] -%}
+        {%- endif -%}
+
+        {%- if rule_name == 'not_null' -%}
+            {%- set condition = column_name ~ ' IS NULL' -%}
+        {%- elif rule_name == 'unique' -%}
+            {%- set condition = column_name ~ ' IS NOT NULL AND count(*) OVER (PARTITION BY ' ~ column_name ~ ') > 1' -%}
+        {%- elif rule_name == 'accepted_values' -%}
+            {%- set values = [] -%}
+            {%- for value in options -%}
+                {%- do values.append((value | string | lower) if value is boolean
+                    else (value | string) if value is number
+                    else "'" ~ (value | replace("'", "''")) ~ "'") -%}
+            {%- endfor -%}
+            {%- set condition = column_name ~ ' NOT IN (' ~ values | join(', ') ~ ')' -%}
+        {%- elif rule_name == 'between' -%}
+            {%- set condition = column_name ~ ' < ' ~ options.min_value ~ ' OR ' ~ column_name ~ ' > ' ~ options.max_value -%}
+        {%- elif rule_name == 'relationships' -%}
+            {%- set parent_alias = 'parent_' ~ (parents | length) -%}
+            {%- do parents.append({'alias': parent_alias, 'relation': options.to, 'field': options.field, 'column_name': column_name}) -%}
+            {%- set condition = column_name ~ ' IS NOT NULL AND ' ~ parent_alias ~ '.parent_key IS NULL' -%}
+        {%- else -%}
+            {{ exceptions.raise_compiler_error("column_rules: unknown rule '" ~ rule_name ~ "' on " ~ column_name) }}
+        {%- endif -%}
+
+        {%- do checks.append({'name': 'check_' ~ (checks | length), 'rule': rule_name, 'column_name': column_name, 'condition': condition}) -%}
+    {%- endfor -%}
+{%- endfor -%}
+
+WITH flagged AS (
+    SELECT
+        cast(m.{{ key_column }} AS {{ dbt.type_string() }}) AS rule_key
+        {%- for check in checks %},
+        CASE WHEN {{ check.condition }} THEN 1 ELSE 0 END AS {{ check.name }}
+        {%- endfor %}
+    FROM {{ model }} m
+    {%- for parent in parents %}
+    LEFT JOIN (
+        SELECT DISTINCT {{ parent.field }} AS parent_key FROM {{ parent.relation }}
+    ) {{ parent.alias }} ON m.{{ parent.column_name }} = {{ parent.alias }}.parent_key
+    {%- endfor %}
+),
+
+summary AS (
+    SELECT
+        count(*) AS row_count
+        {%- for check in checks %},
+        sum({{ check.name }}) AS {{ check.name }}_failures,
+        min(CASE WHEN {{ check.name }} = 1 THEN rule_key END) AS {{ check.name }}_first_key,
+        max(CASE WHEN {{ check.name }} = 1 THEN rule_key END) AS {{ check.name }}_last_key
+        {%- endfor %}
+    FROM flagged
+),
+
+results AS (
+    {%- for check in checks %}
+    SELECT
+        '{{ check.column_name }}' AS column_name,
+        '{{ check.rule }}' AS rule_name,
+        {{ check.name }}_failures AS failures,
+        {{ check.name }}_first_key AS first_failing_key,
+        {{ check.name }}_last_key AS last_failing_key
+    FROM summary
+    {% if not loop.last or row_count %}UNION ALL{% endif %}
+    {%- endfor %}
+    {%- if row_count %}
+    SELECT
+        cast(NULL AS {{ dbt.type_string() }}) AS column_name,
+        'row_count' AS rule_name,
+        CASE WHEN row_count BETWEEN {{ row_count.min_value }} AND {{ row_count.max_value }} THEN 0 ELSE row_count END AS failures,
+        cast(NULL AS {{ dbt.type_string() }}) AS first_failing_key,
+        cast(NULL AS {{ dbt.type_string() }}) AS last_failing_key
+    FROM summary
+    {%- endif %}
+)
+
+SELECT *
+FROM results
+WHERE failures > 0
+
+{% endtest %}
@@ -1,2 +1,11 @@
+import os
+import sys
+
+# The modules also run as scripts (python scripts/data_generator_2.py) and import
+# their siblings by bare name, so the package directory has to be on sys.path too
+_SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if _SCRIPTS_DIR not in sys.path:
+    sys.path.append(_SCRIPTS_DIR)
+
 from .data_generator import *
 from .data_generator_2 import *
\ No newline at end of file
@@ -0,0 +1,45 @@
+import json
+import os
+from contextlib import contextmanager
+
+from filelock import FileLock
+
+DEFAULT_LOCK_TIMEOUT = 30 * 60  # seconds; master data generation can take several minutes
+# Lock files live in this directory under the data dir, not next to the files they guard
+LOCK_DIR = '.locks'
+
+
+@contextmanager
+def atomic_output(path):
+    """Yield a temp path next to path that replaces it only if the block completes.
+
+    The temp name is unique per process, so concurrent writers never share a
+    temp file and readers only ever see the old or the new complete file.
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json(path, data, **kwargs):
+    """Write JSON atomically (temp file, fsync, rename)"""
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def write_parquet(df, path):
+    """Write a DataFrame to Parquet atomically"""
+    with atomic_output(path) as tmp_path:
+        df.to_parquet(tmp_path, index=False)
+
+
+def file_lock(path, timeout=DEFAULT_LOCK_TIMEOUT):
+    """Cross-process lock held on path + '.lock' (use as a context manager)"""
+    return FileLock(f'{path}.lock', timeout=timeout)
@@ -0,0 +1,369 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from atomic_io import file_lock, write_json
+from parquet_layout import sort_by_datetime, write_transactions_file
+
+MANIFEST_FILE = 'transactions_manifest.json'
+COMPACTED_DIR = 'compacted'
+DAILY_PATTERN = 'transactions_*.parquet'
+# Where the DAGs upload each day: {S3_PREFIX}/{date}/transactions_{date}.parquet
+S3_PREFIX = 'data/raw/transactions'
+DEFAULT_ROWS_PER_FILE = 4 * 1024 * 1024
+COMPACTED_ROW_GROUP_SIZE = 512 * 1024  # rows
+
+_DAILY_FILE = re.compile(r'^transactions_(\d{4}-\d{2})-\d{2}\.parquet$')
+# Days written in pipelined mode: transactions_{date}/part-NNNN.parquet
+_DAILY_PARTS_DIR = re.compile(r'^transactions_(\d{4}-\d{2})-\d{2}$')
+_FILE_DAY = re.compile(r'transactions_(\d{4}-\d{2}-\d{2})(?:\.parquet|[/\\]part-\d+\.parquet)$')
+_SUMMARY_FILE = re.compile(r'^daily_summary_(\d{4}-\d{2})-\d{2}\.json$')
+_S3_DAY = re.compile(r'^(\d{4}-\d{2})-\d{2}$')
+
+
+def load_manifest(data_dir):
+    """Read the compaction manifest (an empty one when nothing has been compacted yet)"""
+    path = os.path.join(data_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'version': 0, 'updated_at': None, 'months': []}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_manifest(data_dir, manifest):
+    """Publish a new manifest version; the rename is the point where readers switch over"""
+    manifest = dict(manifest, version=manifest['version'] + 1, updated_at=datetime.now().isoformat())
+    write_json(os.path.join(data_dir, MANIFEST_FILE), manifest, indent=2)
+    return manifest
+
+
+def file_day(path):
+    """The YYYY-MM-DD day of a daily transaction file or pipelined part file (None for other files)"""
+    match = _FILE_DAY.search(path)
+    return match.group(1) if match else None
+
+
+def daily_files(data_dir, month=None, pattern=_DAILY_FILE):
+    """Daily files (transactions or summaries) in data_dir, optionally for one YYYY-MM month.
+
+    A day written in pipelined mode is listed as the part files of its
+    transactions_{date}/ directory, once its summary marks the day complete.
+    """
+    files = []
+    for name in sorted(os.listdir(data_dir)) if os.path.isdir(data_dir) else []:
+        match = pattern.match(name)
+        if match and (month is None or match.group(1) == month):
+            files.append(os.path.join(data_dir, name))
+            continue
+        match = _DAILY_PARTS_DIR.match(name) if pattern is _DAILY_FILE else None
+        if match and (month is None or match.group(1) == month) and \
+                os.path.exists(os.path.join(data_dir, f"daily_summary_{name[len('transactions_'):]}.json")):
+            files.extend(sorted(glob.glob(os.path.join(data_dir, name, 'part-*.parquet'))))
+    return files
+
+
+def transaction_files(data_dir):
+    """Flat transaction files readers should scan: compacted files for compacted months, daily files otherwise.
+
+    The manifest is read once, so a reader sees a month either as its daily
+    files or as its compacted files, whichever was current when it started.
+    """
+    compacted = {entry['month']: entry for entry in load_manifest(data_dir)['months']}
+    files = [path for path in daily_files(data_dir) if file_day(path)[:7] not in compacted]
+    for entry in compacted.values():
+        files.extend(os.path.join(data_dir, path) for path in entry['files'])
+    return sorted(files)
+
+
+def is_compacted(data_dir, date_str):
+    """Whether a day's daily transaction files have been merged into a compacted month"""
+    return any(file_day(path) == date_str
+               for entry in load_manifest(data_dir)['months'] for path in entry['daily_files'])
+
+
+def row_checksum(table):
+    """Order-independent checksum of a table's rows (wrapping sum of per-row 64-bit hashes)"""
+    if table.num_rows == 0:
+        return 0
+    hashes = pd.util.hash_pandas_object(table.to_pandas(), index=False).to_numpy()
+    return int(hashes.sum(dtype=np.uint64))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_closed(month, today=None):
+    """A month is closed once the calendar has moved past it"""
+    today = today or date.today()
+    return month < today.strftime('%Y-%m')
+
+
+def _pack_days(tables, rows_per_file):
+    """Group consecutive day tables into files of about rows_per_file rows, never splitting a day"""
+    groups = [[]]
+    rows = 0
+    for table in tables:
+        if groups[-1] and rows + table.num_rows > rows_per_file:
+            groups.append([])
+            rows = 0
+        groups[-1].append(table)
+        rows += table.num_rows
+    return groups
+
+
+def _conform(table, schema):
+    """Add columns missing from a day (as nulls) so every day has the month's schema"""
+    for field in schema:
+        if field.name not in table.column_names:
+            table = table.append_column(field, pa.nulls(table.num_rows, field.type))
+    return table.select(schema.names).cast(schema)
+
+
+def compact_month(data_dir, month, rows_per_file=DEFAULT_ROWS_PER_FILE, row_group_size=COMPACTED_ROW_GROUP_SIZE,
+                  prune=False, today=None):
+    """Merge a closed month's daily transaction files into a few large sorted files.
+
+    Daily files are left untouched until the compacted files have been read
+    back and matched on row count and row checksum; the manifest rename then
+    switches readers over. Daily files are only removed with prune, after the
+    switch.
+    """
+    if not is_closed(month, today):
+        raise ValueError(f'Month {month} is not closed yet')
+    # Held from reading the manifest to publishing the new one, so concurrent
+    # compactions can't overwrite each other's entries
+    with file_lock(os.path.join(data_dir, MANIFEST_FILE)):
+        manifest = load_manifest(data_dir)
+        if any(entry['month'] == month for entry in manifest['months']):
+            print(f'{month} is already compacted')
+            return None
+        sources = daily_files(data_dir, month)
+        if not sources:
+            print(f'No daily transaction files for {month}')
+            return None
+
+        # Days are concatenated in order, each sorted by datetime, so files stay day-aligned
+        days = {}
+        for path in sources:
+            days.setdefault(file_day(path), []).append(path)
+        day_tables = [sort_by_datetime(pa.concat_tables([pq.read_table(path) for path in paths],
+                                                        promote_options='permissive'))
+                      for paths in days.values()]
+        schema = pa.unify_schemas([table.schema for table in day_tables], promote_options='permissive')
+        day_tables = [_conform(table, schema) for table in day_tables]
+        expected_rows = sum(table.num_rows for table in day_tables)
+        expected_checksum = sum(row_checksum(table) for table in day_tables) % (1 << 64)
+
+        run_dir = os.path.join(COMPACTED_DIR, month, datetime.now().strftime('%Y%m%dT%H%M%S'))
+        os.makedirs(os.path.join(data_dir, run_dir), exist_ok=True)
+        files = []
+        for i, group in enumerate(_pack_days(day_tables, rows_per_file)):
+            path = os.path.join(run_dir, f'part-{i:04d}.parquet')
+            write_transactions_file(pa.concat_tables(group), os.path.join(data_dir, path), row_group_size)
+            files.append(path)
+
+        compacted = [pq.read_table(os.path.join(data_dir, path), schema=schema) for path in files]
+        rows = sum(table.num_rows for table in compacted)
+        checksum = sum(row_checksum(table) for table in compacted) % (1 << 64)
+        if rows != expected_rows or checksum != expected_checksum:
+            raise RuntimeError(f'Compacted {month} does not match its daily files: '
+                               f'{rows} rows / {checksum:016x} vs {expected_rows} rows / {expected_checksum:016x}')
+
+        summaries = {}
+        for path in daily_files(data_dir, month, _SUMMARY_FILE):
+            with open(path, encoding='utf-8') as f:
+                summaries[os.path.basename(path)[len('daily_summary_'):-len('.json')]] = json.load(f)
+        summaries_path = os.path.join(run_dir, 'daily_summaries.json')
+        write_json(os.path.join(data_dir, summaries_path), summaries, indent=2)
+
+        entry = {
+            'month': month,
+            'files': files,
+            'sha256': {path: _sha256(os.path.join(data_dir, path)) for path in files},
+            'rows': rows,
+            'checksum': f'{checksum:016x}',
+            'daily_files': [os.path.relpath(path, data_dir).replace(os.sep, '/') for path in sources],
+            'daily_summaries': summaries_path,
+            'compacted_at': datetime.now().isoformat(),
+        }
+        manifest['months'] = sorted(manifest['months'] + [entry], key=lambda e: e['month'])
+        _save_manifest(data_dir, manifest)
+        print(f'Compacted {len(days)} days of daily files for {month} into {len(files)} files ({rows:,} rows)')
+
+    if prune:
+        prune_month(data_dir, month)
+    return entry
+
+
+def prune_month(data_dir, month):
+    """Delete the daily transaction files of a compacted month.
+
+    Daily summaries are kept: they mark days as generated, and are small.
+    """
+    if not any(entry['month'] == month for entry in load_manifest(data_dir)['months']):
+        raise ValueError(f'Month {month} is not in the manifest; refusing to delete its daily files')
+    removed = daily_files(data_dir, month)
+    for path in removed:
+        os.remove(path)
+    # Pipelined days leave an empty transactions_{date}/ directory behind
+    for parts_dir in {os.path.dirname(path) for path in removed}:
+        if _DAILY_PARTS_DIR.match(os.path.basename(parts_dir)) and not os.listdir(parts_dir):
+            os.rmdir(parts_dir)
+    print(f'Removed {len(removed)} daily files for {month}')
+    return removed
+
+
+def closed_months(data_dir, today=None):
+    """Closed months that still have uncompacted daily transaction files"""
+    compacted = {entry['month'] for entry in load_manifest(data_dir)['months']}
+    months = {file_day(path)[:7] for path in daily_files(data_dir)}
+    return sorted(month for month in months - compacted if is_closed(month, today))
+
+
+def _s3_client(s3):
+    if s3 is None:
+        import boto3
+        s3 = boto3.client('s3')
+    return s3
+
+
+def _s3_daily_keys(s3, bucket, prefix, month):
+    """Keys of a month's daily transaction and summary objects under {prefix}/{date}/.
+
+    Part files of a pipelined day are included once its summary, uploaded
+    last, marks the day complete.
+    """
+    keys, parts, complete_days = [], [], set()
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=f'{prefix}/{month}-'):
+        for obj in page.get('Contents', []):
+            day, _, name = obj['Key'][len(prefix) + 1:].partition('/')
+            if name == f'daily_summary_{day}.json':
+                complete_days.add(day)
+                keys.append(obj['Key'])
+            elif name == f'transactions_{day}.parquet':
+                keys.append(obj['Key'])
+            elif name.startswith(f'transactions_{day}/part-') and name.endswith('.parquet'):
+                parts.append((day, obj['Key']))
+    return sorted(keys + [key for day, key in parts if day in complete_days])
+
+
+def _load_s3_manifest(s3, bucket, prefix):
+    """The S3 manifest and its ETag (None when nothing has been compacted yet)"""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=f'{prefix}/{MANIFEST_FILE}')
+    except s3.exceptions.NoSuchKey:
+        return {'version': 0, 'updated_at': None, 'months': []}, None
+    return json.loads(response['Body'].read()), response['ETag']
+
+
+def compact_s3_month(bucket, month, prefix=S3_PREFIX, s3=None, rows_per_file=DEFAULT_ROWS_PER_FILE,
+                     row_group_size=COMPACTED_ROW_GROUP_SIZE, prune=False, today=None):
+    """Compact a closed month of the daily files uploaded under s3://{bucket}/{prefix}/{date}/.
+
+    The month's daily objects and the S3 manifest are copied to a scratch
+    directory and compacted there by compact_month. The compacted files go to
+    {prefix}/compacted/ and the manifest is uploaded last, so S3 readers switch
+    over when it is replaced. The manifest is only replaced if its ETag is
+    unchanged since it was read: a concurrent compaction makes this one fail
+    (and remove its compacted files) instead of dropping the other's month.
+    Daily transaction objects are only deleted with prune, after the switch.
+    """
+    s3 = _s3_client(s3)
+    if not is_closed(month, today):
+        raise ValueError(f'Month {month} is not closed yet')
+    manifest, etag = _load_s3_manifest(s3, bucket, prefix)
+    if any(entry['month'] == month for entry in manifest['months']):
+        print(f'{month} is already compacted in s3://{bucket}/{prefix}')
+        return None
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        if etag is not None:
+            write_json(os.path.join(work_dir, MANIFEST_FILE), manifest, indent=2)
+        # {prefix}/{date}/{name} -> {work_dir}/{name}, the layout compact_month reads
+        for key in _s3_daily_keys(s3, bucket, prefix, month):
+            path = os.path.join(work_dir, *key[len(prefix) + 1:].split('/')[1:])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            s3.download_file(bucket, key, path)
+        entry = compact_month(work_dir, month, rows_per_file, row_group_size, today=today)
+        if entry is None:
+            return None
+
+        uploaded = []
+        for path in entry['files'] + [entry['daily_summaries']]:
+            key = f'{prefix}/{path.replace(os.sep, "/")}'
+            s3.upload_file(os.path.join(work_dir, path), bucket, key)
+            uploaded.append(key)
+        with open(os.path.join(work_dir, MANIFEST_FILE), 'rb') as f:
+            condition = {'IfMatch': etag} if etag is not None else {'IfNoneMatch': '*'}
+            try:
+                s3.put_object(Bucket=bucket, Key=f'{prefix}/{MANIFEST_FILE}', Body=f.read(), **condition)
+            except s3.exceptions.ClientError as exc:
+                if exc.response['Error']['Code'] != 'PreconditionFailed':
+                    raise
+                s3.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': key} for key in uploaded]})
+                raise RuntimeError(f'The manifest in s3://{bucket}/{prefix} changed while {month} was compacted; '
+                                   f'run the compaction again') from exc
+    print(f'Published {month} to s3://{bucket}/{prefix}/{MANIFEST_FILE}')
+
+    if prune:
+        prune_s3_month(bucket, month, prefix, s3)
+    return entry
+
+
+def prune_s3_month(bucket, month, prefix=S3_PREFIX, s3=None):
+    """Delete the daily transaction objects of a month compacted in S3 (summaries are kept)"""
+    s3 = _s3_client(s3)
+    manifest, _ = _load_s3_manifest(s3, bucket, prefix)
+    if not any(entry['month'] == month for entry in manifest['months']):
+        raise ValueError(f'Month {month} is not in the S3 manifest; refusing to delete its daily files')
+    removed = [key for key in _s3_daily_keys(s3, bucket, prefix, month) if file_day(key)]
+    for i in range(0, len(removed), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': key} for key in removed[i:i + 1000]]})
+    print(f'Removed {len(removed)} daily files for {month} from s3://{bucket}/{prefix}')
+    return removed
+
+
+def closed_s3_months(bucket, prefix=S3_PREFIX, s3=None, today=None):
+    """Closed months with day prefixes in S3 that are not compacted there yet"""
+    s3 = _s3_client(s3)
+    compacted = {entry['month'] for entry in _load_s3_manifest(s3, bucket, prefix)[0]['months']}
+    months = set()
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=f'{prefix}/', Delimiter='/'):
+        for common in page.get('CommonPrefixes', []):
+            match = _S3_DAY.match(common['Prefix'][len(prefix) + 1:].rstrip('/'))
+            if match:
+                months.add(match.group(1))
+    return sorted(month for month in months - compacted if is_closed(month, today))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compact closed months of daily transaction files')
+    parser.add_argument('--data-dir', default='retail_data_v2')
+    parser.add_argument('--bucket', help='Compact the daily files uploaded to this S3 bucket instead of --data-dir')
+    parser.add_argument('--prefix', default=S3_PREFIX, help='S3 prefix holding the {date}/ day prefixes')
+    parser.add_argument('--month', nargs='*', help='YYYY-MM months to compact (default: every closed month)')
+    parser.add_argument('--rows-per-file', type=int, default=DEFAULT_ROWS_PER_FILE)
+    parser.add_argument('--prune', action='store_true', help='Delete the daily files once the manifest points at the compacted files')
+    args = parser.parse_args()
+
+    if args.bucket:
+        for month in args.month or closed_s3_months(args.bucket, args.prefix):
+            compact_s3_month(args.bucket, month, args.prefix, rows_per_file=args.rows_per_file, prune=args.prune)
+    else:
+        for month in args.month or closed_months(args.data_dir):
+            compact_month(args.data_dir, month, args.rows_per_file, prune=args.prune)
@@ -1,3 +1,4 @@
+import argparse
 import random
 import json
 from datetime import datetime, timedelta
@@ -9,10 +10,27 @@ import pandas as pd
 import sys
 import string
 import re
+import time
+from atomic_io import LOCK_DIR, file_lock, write_json, write_parquet
+from compaction import is_compacted
+from sketches import build_daily_sketches, save_daily_sketches
+from rollup_store import ROLLUP_DIR, ingest_daily_rollup
+from pipelined_upload import (DEFAULT_BATCH_SIZE, DEFAULT_QUEUE_DEPTH, DEFAULT_UPLOAD_THREADS, delete_prefix,
+                              part_files_dir, upload_transaction_parts)
+from parquet_layout import (LAYOUTS, normalized_files, partition_dir, write_flat_transactions,
+                            write_normalized_transactions, write_partitioned_transactions)
+
+MASTER_DATA_FILES = ('stores.parquet', 'products.parquet', 'customers.parquet')
+# Written last by save_master_data; master data without it is treated as missing
+MASTER_DATA_MARKER = '_MASTER_DATA_COMPLETE'
 
 class RetailDataGenerator:
-    def __init__(self, seed=42, add_noise=True):
-        """Initialize the retail data generator with configurable parameters."""
+    def __init__(self, seed=42, add_noise=True, master_dir='retail_data_v2'):
+        """Initialize the retail data generator with configurable parameters.
+        
+        Master data is loaded from (or, if missing, generated into) master_dir,
+        which can be shared read-only by generators writing elsewhere.
+        """
         self.fake = Faker()
         Faker.seed(seed)
         random.seed(seed)
@@ -96,7 +114,7 @@ class RetailDataGenerator:
         self.duplicate_transactions = []
         
         # Load or generate master data
-        self._load_or_generate_master_data()
+        self._load_or_generate_master_data(master_dir)
     
     def _introduce_encoding_issues(self, text):
         """Introduce realistic encoding and special character issues."""
@@ -172,43 +190,76 @@ class RetailDataGenerator:
         return modified_datetime
     
     def _load_or_generate_master_data(self, output_dir='retail_data_v2'):
-        """Load existing master data or generate new if it doesn't exist."""
-        stores_file = f'{output_dir}/stores.parquet'
-        products_file = f'{output_dir}/products.parquet'
-        customers_file = f'{output_dir}/customers.parquet'
-        
-        # Check if all master data files exist
-        if (os.path.exists(stores_file) and 
-            os.path.exists(products_file) and 
-            os.path.exists(customers_file)):
-            
-            print("Loading existing master data...")
-            try:
-                # Load existing data
-                stores_df = pd.read_parquet(stores_file)
-                products_df = pd.read_parquet(products_file)
-                customers_df = pd.read_parquet(customers_file)
-                
-                # Convert back to dictionaries
-                self.stores = stores_df.to_dict('records')
-                self.products = products_df.to_dict('records')
-                self.customers = customers_df.to_dict('records')
-                
-                print(f"Loaded {len(self.stores)} stores, {len(self.products)} products, {len(self.customers)} customers")
+        """Load existing master data or generate new if it doesn't exist.
+        
+        Master data counts as present once its completion marker exists. Otherwise
+        generation runs under a cross-process lock, so concurrent generators
+        sharing output_dir create it once and the others load the result.
+        """
+        if self._master_data_state(output_dir) == 'complete' and self._load_master_data(output_dir):
+            return
+        
+        os.makedirs(output_dir, exist_ok=True)
+        with file_lock(os.path.join(output_dir, LOCK_DIR, 'master_data')):
+            # Another process may have finished while we waited for the lock
+            state = self._master_data_state(output_dir)
+            if state == 'complete' and self._load_master_data(output_dir):
                 return
-                
-            except Exception as e:
-                print(f"Error loading master data: {e}")
-                print("Generating new master data...")
-        
-        # Generate new master data if loading failed or files don't exist
-        print("Generating new master data...")
-        self._generate_stores()
-        self._generate_products()
-        self._generate_customers()
-        
-        # Save the newly generated data
-        self.save_master_data(output_dir)
+            # Files written before markers existed are adopted if they load cleanly
+            if state is None and all(os.path.exists(os.path.join(output_dir, name)) for name in MASTER_DATA_FILES) \
+                    and self._load_master_data(output_dir):
+                self._write_master_data_marker(output_dir, complete=True)
+                return
+            
+            # Generate new master data if loading failed or files don't exist
+            print("Generating new master data...")
+            self._generate_stores()
+            self._generate_products()
+            self._generate_customers()
+            
+            # Save the newly generated data
+            self.save_master_data(output_dir)
+    
+    def _load_master_data(self, output_dir):
+        """Load stores, products and customers from output_dir; False if any file can't be read."""
+        print("Loading existing master data...")
+        try:
+            # Load existing data
+            stores_df = pd.read_parquet(f'{output_dir}/stores.parquet')
+            products_df = pd.read_parquet(f'{output_dir}/products.parquet')
+            customers_df = pd.read_parquet(f'{output_dir}/customers.parquet')
+        except Exception as e:
+            print(f"Error loading master data: {e}")
+            return False
+        
+        # Convert back to dictionaries
+        self.stores = stores_df.to_dict('records')
+        self.products = products_df.to_dict('records')
+        self.customers = customers_df.to_dict('records')
+        
+        print(f"Loaded {len(self.stores)} stores, {len(self.products)} products, {len(self.customers)} customers")
+        return True
+    
+    def _master_data_state(self, output_dir):
+        """'complete', 'writing' (a save started but never finished) or None when there is no marker."""
+        try:
+            with open(os.path.join(output_dir, MASTER_DATA_MARKER), encoding='utf-8') as f:
+                return 'complete' if json.load(f).get('complete') else 'writing'
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            return 'writing'
+    
+    def _write_master_data_marker(self, output_dir, complete):
+        """Record whether the master data in output_dir is being written or complete."""
+        write_json(os.path.join(output_dir, MASTER_DATA_MARKER), {
+            'complete': complete,
+            'files': list(MASTER_DATA_FILES),
+            'stores': len(self.stores),
+            'products': len(self.products),
+            'customers': len(self.customers),
+            'updated_at': datetime.now().isoformat()
+        }, indent=2)
     
     def _generate_stores(self):
         """Generate store location data with duplicates and missing information."""
@@ -576,8 +627,14 @@ class RetailDataGenerator:
     
     def generate_daily_transactions(self, date: datetime) -> List[Dict]:
         """Generate transactions for a specific date with extensive quality issues."""
-        transactions = []
+        return [txn for batch in self.iter_daily_transaction_batches(date) for txn in batch]
+    
+    def iter_daily_transaction_batches(self, date: datetime, batch_size: int = None):
+        """Yield a day's transactions in batches of batch_size (None: the whole day as one batch).
         
+        Duplicates are drawn from, and appended to, the batch they copy, so the
+        duplicate rate holds per batch and batches can be written as they come.
+        """
         # Adjust transaction volume based on day of week
         day_multipliers = {
             0: 1.2,  # Monday
@@ -590,41 +647,44 @@ class RetailDataGenerator:
         }
         
         daily_volume = int(self.daily_transactions * day_multipliers[date.weekday()])
-        
-        for i in range(daily_volume):
-            # Select random customer and store
-            customer = random.choice(self.customers)
-            store = random.choice(self.stores)
-            
-            # Generate transaction
-            transaction = self._generate_single_transaction(date, customer, store, i+1)
-            transactions.append(transaction)
-        
-        # Add duplicate transactions (15% duplicate rate)
-        if self.add_noise:
-            num_duplicate_transactions = int(len(transactions) * self.noise_config['duplicate_transactions'])
-            for _ in range(num_duplicate_transactions):
-                original = random.choice(transactions)
-                duplicate = original.copy()
-                
-                # Create slight variations for duplicate transactions
-                duplicate['transaction_id'] = f"DUP{duplicate['transaction_id']}"
-                
-                # Timestamp variation (duplicate might be recorded later)
-                if duplicate['datetime']:
-                    original_dt = datetime.strptime(duplicate['datetime'], '%Y-%m-%d %H:%M:%S')
-                    new_dt = original_dt + timedelta(minutes=random.randint(1, 30))
-                    duplicate['datetime'] = new_dt.strftime('%Y-%m-%d %H:%M:%S')
-                    duplicate['time'] = new_dt.strftime('%H:%M:%S')
+        batch_size = batch_size or max(daily_volume, 1)
+        
+        for batch_start in range(0, daily_volume, batch_size):
+            transactions = []
+            for i in range(batch_start, min(batch_start + batch_size, daily_volume)):
+                # Select random customer and store
+                customer = random.choice(self.customers)
+                store = random.choice(self.stores)
                 
-                # Sometimes duplicates have different status
-                if random.random() < 0.3:
-                    duplicate['status'] = 'Failed'
-                
-                transactions.append(duplicate)
-                self.duplicate_transactions.append((original['transaction_id'], duplicate['transaction_id']))
-        
-        return transactions
+                # Generate transaction
+                transaction = self._generate_single_transaction(date, customer, store, i+1)
+                transactions.append(transaction)
+            
+            # Add duplicate transactions (15% duplicate rate)
+            if self.add_noise:
+                num_duplicate_transactions = int(len(transactions) * self.noise_config['duplicate_transactions'])
+                for _ in range(num_duplicate_transactions):
+                    original = random.choice(transactions)
+                    duplicate = original.copy()
+                    
+                    # Create slight variations for duplicate transactions
+                    duplicate['transaction_id'] = f"DUP{duplicate['transaction_id']}"
+                    
+                    # Timestamp variation (duplicate might be recorded later)
+                    if duplicate['datetime']:
+                        original_dt = datetime.strptime(duplicate['datetime'], '%Y-%m-%d %H:%M:%S')
+                        new_dt = original_dt + timedelta(minutes=random.randint(1, 30))
+                        duplicate['datetime'] = new_dt.strftime('%Y-%m-%d %H:%M:%S')
+                        duplicate['time'] = new_dt.strftime('%H:%M:%S')
+                    
+                    # Sometimes duplicates have different status
+                    if random.random() < 0.3:
+                        duplicate['status'] = 'Failed'
+                    
+                    transactions.append(duplicate)
+                    self.duplicate_transactions.append((original['transaction_id'], duplicate['transaction_id']))
+            
+            yield transactions
     
     def _generate_single_transaction(self, date: datetime, customer: Dict, store: Dict, transaction_num: int) -> Dict:
         """Generate a single transaction with realistic data quality issues."""
@@ -771,24 +831,27 @@ class RetailDataGenerator:
         return random.choice(codes)
     
     def save_master_data(self, output_dir='retail_data_v2'):
-        """Save master data (stores, products, customers) to Parquet files."""
+        """Save master data (stores, products, customers) to Parquet files.
+        
+        Each file is replaced atomically. The marker is set to 'writing' first
+        and to complete last, so a crash part-way never leaves a mix of old and
+        new files that looks complete. Callers hold the master data lock.
+        """
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
+        self._write_master_data_marker(output_dir, complete=False)
         
         # Save stores
         if self.stores:
-            stores_df = pd.DataFrame(self.stores)
-            stores_df.to_parquet(f'{output_dir}/stores.parquet', index=False)
+            write_parquet(pd.DataFrame(self.stores), f'{output_dir}/stores.parquet')
         
         # Save products
         if self.products:
-            products_df = pd.DataFrame(self.products)
-            products_df.to_parquet(f'{output_dir}/products.parquet', index=False)
+            write_parquet(pd.DataFrame(self.products), f'{output_dir}/products.parquet')
         
         # Save customers
         if self.customers:
-            customers_df = pd.DataFrame(self.customers)
-            customers_df.to_parquet(f'{output_dir}/customers.parquet', index=False)
+            write_parquet(pd.DataFrame(self.customers), f'{output_dir}/customers.parquet')
         
         # Save quality issues summary
         quality_report = {
@@ -801,8 +864,8 @@ class RetailDataGenerator:
             'generation_timestamp': datetime.now().isoformat()
         }
         
-        with open(f'{output_dir}/data_quality_report.json', 'w') as f:
-            json.dump(quality_report, f, indent=2)
+        write_json(f'{output_dir}/data_quality_report.json', quality_report, indent=2)
+        self._write_master_data_marker(output_dir, complete=True)
         
         print(f"Master data saved to {output_dir}/ directory")
         print(f"Generated {len(self.stores)} stores, {len(self.products)} products, {len(self.customers)} customers")
@@ -817,30 +880,179 @@ class RetailDataGenerator:
         self.duplicate_customers = []
         self.duplicate_products = []
         
-        self._generate_stores()
-        self._generate_products()
-        self._generate_customers()
-        
-        self.save_master_data(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+        with file_lock(os.path.join(output_dir, LOCK_DIR, 'master_data')):
+            self._generate_stores()
+            self._generate_products()
+            self._generate_customers()
+            
+            self.save_master_data(output_dir)
     
-    def generate_and_save_daily_data(self, date: datetime, output_dir='retail_data_v2'):
-        """Generate and save transaction data for a specific date."""
+    def generate_and_save_daily_data(self, date: datetime, output_dir='retail_data_v2', layout='flat', rollup_dir=None,
+                                     sketch_dir=None):
+        """Generate and save transaction data for a specific date.
+        
+        layout 'flat' writes transactions_{date}.parquet, 'partitioned' writes
+        transactions/transaction_date={date}/store_id={store}/ partitions and
+        'normalized' writes separate header and line-item files under normalized/.
+        Rollups go to rollup_dir (default output_dir/rollups) and sketches to
+        sketch_dir (default output_dir); point both at the shared data dir when
+        output_dir is a per-run staging directory.
+        """
+        rollup_dir = rollup_dir or os.path.join(output_dir, ROLLUP_DIR)
+        sketch_dir = sketch_dir or output_dir
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout '{layout}', expected one of {LAYOUTS}")
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
         
         # Check if data for this date already exists
         date_str = date.strftime('%Y-%m-%d')
-        transactions_file = f'{output_dir}/transactions_{date_str}.parquet'
+        if layout == 'partitioned':
+            transactions_file = partition_dir(output_dir, date_str)
+        elif layout == 'normalized':
+            transactions_file = normalized_files(output_dir, date_str)[0]
+        else:
+            transactions_file = f'{output_dir}/transactions_{date_str}.parquet'
         
-        if os.path.exists(transactions_file):
-            print(f"Transaction data for {date_str} already exists. Skipping generation.")
-            print(f"To regenerate, delete {transactions_file} first.")
-            return []
+        summary_file = f'{output_dir}/daily_summary_{date_str}.json'
         
-        transactions = self.generate_daily_transactions(date)
+        # One generator per day at a time; concurrent runs for other days proceed in parallel
+        with file_lock(os.path.join(output_dir, LOCK_DIR, f'daily_{date_str}')):
+            # The summary is written last and marks the day complete; a day whose
+            # transactions exist without it was interrupted and is generated again.
+            # Days of compacted months live in the compacted files, even once pruned.
+            if os.path.exists(transactions_file) and os.path.exists(summary_file) or \
+                    layout == 'flat' and is_compacted(output_dir, date_str):
+                print(f"Transaction data for {date_str} already exists. Skipping generation.")
+                print(f"To regenerate, delete {transactions_file} first.")
+                return []
+        
+            transactions = self.generate_daily_transactions(date)
+        
+            # Save detailed transactions
+            transactions_df = self.transactions_to_dataframe(transactions)
+            if not transactions_df.empty:
+                if layout == 'partitioned':
+                    write_partitioned_transactions(transactions_df, output_dir, date_str)
+                elif layout == 'normalized':
+                    headers_df, items_df = self.normalize_transactions(transactions)
+                    write_normalized_transactions(headers_df, items_df, output_dir, date_str)
+                else:
+                    write_flat_transactions(transactions_df, transactions_file)
+                # Mergeable distinct-count sketches, so multi-day counts don't rescan transactions
+                save_daily_sketches(build_daily_sketches(transactions_df), sketch_dir, date_str)
+                # Day/week/month rollups for multi-day reporting without reading transaction files
+                ingest_daily_rollup(transactions_df, date, rollup_dir)
+        
+            # Save summary data with quality metrics
+            summary = self.daily_summary(transactions, date_str)
+        
+            write_json(summary_file, summary, indent=2, default=str)
+        
+            print(f"Generated {len(transactions)} transactions for {date_str}")
+            print(f"Total revenue: ${summary['total_revenue']:,.2f}")
+            print(f"Data quality issues: {summary['duplicate_transactions']} duplicates, {summary['failed_transactions']} failed, {summary['missing_timestamps']} missing timestamps")
+            print(f"Files saved: {transactions_file}, {summary_file}")
+        
+            return transactions
+    
+    def daily_summary(self, transactions: List[Dict], date_str: str) -> Dict:
+        """Summary of a day's transactions with quality metrics (written to daily_summary_{date}.json)."""
+        return {
+            'date': date_str,
+            'total_transactions': len(transactions),
+            'total_revenue': sum(txn['total_amount'] for txn in transactions if isinstance(txn['total_amount'], (int, float))),
+            'total_items_sold': sum(txn['items_count'] for txn in transactions if isinstance(txn['items_count'], (int, float))),
+            'unique_customers': len(set(txn['customer_id'] for txn in transactions if txn['customer_id'])),
+            'duplicate_transactions': len(self.duplicate_transactions),
+            'failed_transactions': len([t for t in transactions if t['status'] == 'Failed']),
+            'refunded_transactions': len([t for t in transactions if t['status'] == 'Refunded']),
+            'missing_timestamps': len([t for t in transactions if not t['datetime']]),
+            'missing_cashier_ids': len([t for t in transactions if not t['cashier_id']]),
+            'negative_quantities': len([t for t in transactions for item in t['items'] if item['quantity'] < 0]),
+            'payment_method_breakdown': self._get_payment_breakdown(transactions),
+            'category_breakdown': self._get_category_breakdown(transactions),
+            'top_products': self._get_top_products(transactions)
+        }
+    
+    def generate_and_upload_daily_data(self, date: datetime, bucket: str, key_prefix='data/raw', output_dir='retail_data_v2',
+                                       rollup_dir=None, sketch_dir=None, s3=None, batch_size=DEFAULT_BATCH_SIZE,
+                                       queue_depth=DEFAULT_QUEUE_DEPTH, upload_threads=DEFAULT_UPLOAD_THREADS):
+        """Pipelined generate -> write -> upload of a day: part files are uploaded while later batches are generated.
+        
+        The day is written as transactions_{date}/part-NNNN.parquet and uploaded
+        under {key_prefix}/transactions/{date}/. Sketches and rollups are built as
+        in generate_and_save_daily_data; the summary is written and uploaded last
+        and marks the day complete, locally and in S3. A regenerated day replaces
+        everything under its S3 prefix, so parts left by a failed attempt go too.
+        """
+        rollup_dir = rollup_dir or os.path.join(output_dir, ROLLUP_DIR)
+        sketch_dir = sketch_dir or output_dir
+        if s3 is None:
+            import boto3
+            s3 = boto3.client('s3')
+        os.makedirs(output_dir, exist_ok=True)
         
-        # Save detailed transactions
-        # Flatten transaction data for Parquet
+        date_str = date.strftime('%Y-%m-%d')
+        day_prefix = f'{key_prefix}/transactions/{date_str}'
+        parts_dir = part_files_dir(output_dir, date_str)
+        summary_file = f'{output_dir}/daily_summary_{date_str}.json'
+        
+        with file_lock(os.path.join(output_dir, LOCK_DIR, f'daily_{date_str}')):
+            if os.path.isdir(parts_dir) and os.path.exists(summary_file) or is_compacted(output_dir, date_str):
+                print(f"Transaction data for {date_str} already exists. Skipping generation.")
+                print(f"To regenerate, delete {parts_dir} first.")
+                return []
+            
+            # The day is incomplete until its summary is written again
+            if os.path.exists(summary_file):
+                os.remove(summary_file)
+            stale = delete_prefix(s3, bucket, f'{day_prefix}/')
+            if stale:
+                print(f"Removed {stale} objects left in s3://{bucket}/{day_prefix}/ by an earlier attempt")
+            
+            transactions, transactions_df, timings = upload_transaction_parts(
+                self.iter_daily_transaction_batches(date, batch_size), self.transactions_to_dataframe,
+                output_dir, date_str, bucket, day_prefix, s3, queue_depth, upload_threads)
+            if not transactions_df.empty:
+                save_daily_sketches(build_daily_sketches(transactions_df), sketch_dir, date_str)
+                ingest_daily_rollup(transactions_df, date, rollup_dir)
+            
+            summary = self.daily_summary(transactions, date_str)
+            write_json(summary_file, summary, indent=2, default=str)
+            s3.upload_file(summary_file, bucket, f'{day_prefix}/{os.path.basename(summary_file)}')
+            
+            print(f"Generated {len(transactions)} transactions for {date_str}")
+            print(f"Total revenue: ${summary['total_revenue']:,.2f}")
+            print(f"Uploaded {len(os.listdir(parts_dir))} part files and the summary to s3://{bucket}/{day_prefix}/")
+            print(f"Stage time: generate {timings['generate']:.2f}s, write {timings['write']:.2f}s, "
+                  f"upload {timings['upload']:.2f}s; wall {timings['total']:.2f}s")
+            
+            return transactions
+    
+    def replay_daily_transactions(self, date: datetime, events_per_second: float = None):
+        """Yield a day's transactions in timestamp order, paced at events_per_second.
+        
+        Ordering uses the recorded timestamp, so records delayed by
+        _introduce_timestamp_issues (and late DUP copies) arrive when their
+        timestamp says, possibly after midnight. Transactions without a
+        timestamp are emitted last. events_per_second=None replays as fast as possible.
+        """
+        transactions = self.generate_daily_transactions(date)
+        # 'YYYY-MM-DD HH:MM:SS' strings sort chronologically
+        transactions.sort(key=lambda txn: (txn['datetime'] is None, txn['datetime'] or ''))
+        
+        started = time.perf_counter()
+        for i, txn in enumerate(transactions):
+            if events_per_second:
+                delay = started + i / events_per_second - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            yield txn
+    
+    def flatten_transactions(self, transactions: List[Dict]) -> List[Dict]:
+        """Flatten transactions to one row per line item for Parquet."""
         flattened_transactions = []
         for txn in transactions:
             base_txn = {k: v for k, v in txn.items() if k != 'items'}
@@ -860,42 +1072,40 @@ class RetailDataGenerator:
                     'line_total': 0
                 })
                 flattened_transactions.append(base_txn)
+        return flattened_transactions
+    
+    def normalize_transactions(self, transactions: List[Dict]):
+        """Split transactions into a header DataFrame (one row per transaction) and
+        a line-item DataFrame (one row per item, keyed by transaction_id and line_number).
         
-        if flattened_transactions:
-            transactions_df = pd.DataFrame(flattened_transactions)
-            # Handle datetime conversion with missing values
-            transactions_df['datetime'] = pd.to_datetime(transactions_df['datetime'], errors='coerce')
-            transactions_df['date'] = pd.to_datetime(transactions_df['date'], errors='coerce')
-            transactions_df.to_parquet(transactions_file, index=False)
-        
-        # Save summary data with quality metrics
-        summary_file = f'{output_dir}/daily_summary_{date_str}.json'
-        summary = {
-            'date': date_str,
-            'total_transactions': len(transactions),
-            'total_revenue': sum(txn['total_amount'] for txn in transactions if isinstance(txn['total_amount'], (int, float))),
-            'total_items_sold': sum(txn['items_count'] for txn in transactions if isinstance(txn['items_count'], (int, float))),
-            'unique_customers': len(set(txn['customer_id'] for txn in transactions if txn['customer_id'])),
-            'duplicate_transactions': len(self.duplicate_transactions),
-            'failed_transactions': len([t for t in transactions if t['status'] == 'Failed']),
-            'refunded_transactions': len([t for t in transactions if t['status'] == 'Refunded']),
-            'missing_timestamps': len([t for t in transactions if not t['datetime']]),
-            'missing_cashier_ids': len([t for t in transactions if not t['cashier_id']]),
-            'negative_quantities': len([t for t in transactions for item in t['items'] if item['quantity'] < 0]),
-            'payment_method_breakdown': self._get_payment_breakdown(transactions),
-            'category_breakdown': self._get_category_breakdown(transactions),
-            'top_products': self._get_top_products(transactions)
-        }
-        
-        with open(summary_file, 'w', encoding='utf-8') as f:
-            json.dump(summary, f, indent=2, default=str)
-        
-        print(f"Generated {len(transactions)} transactions for {date_str}")
-        print(f"Total revenue: ${summary['total_revenue']:,.2f}")
-        print(f"Data quality issues: {summary['duplicate_transactions']} duplicates, {summary['failed_transactions']} failed, {summary['missing_timestamps']} missing timestamps")
-        print(f"Files saved: {transactions_file}, {summary_file}")
-        
-        return transactions
+        Transactions without items keep their header row and have no line items.
+        """
+        headers = []
+        items = []
+        for txn in transactions:
+            headers.append({k: v for k, v in txn.items() if k != 'items'})
+            for line_number, item in enumerate(txn['items'], start=1):
+                items.append({'transaction_id': txn['transaction_id'], 'line_number': line_number, **item})
+        
+        headers_df = pd.DataFrame(headers)
+        if not headers_df.empty:
+            headers_df['datetime'] = pd.to_datetime(headers_df['datetime'], errors='coerce')
+            headers_df['date'] = pd.to_datetime(headers_df['date'], errors='coerce')
+        items_df = pd.DataFrame(items, columns=['transaction_id', 'line_number', 'product_id', 'product_name',
+                                                'category', 'quantity', 'unit_price', 'discount_percent', 'line_total'])
+        return headers_df, items_df
+    
+    def transactions_to_dataframe(self, transactions: List[Dict]) -> pd.DataFrame:
+        """Build the flattened line-item DataFrame written to transactions_{date}.parquet."""
+        flattened_transactions = self.flatten_transactions(transactions)
+        if not flattened_transactions:
+            return pd.DataFrame()
+        
+        transactions_df = pd.DataFrame(flattened_transactions)
+        # Handle datetime conversion with missing values
+        transactions_df['datetime'] = pd.to_datetime(transactions_df['datetime'], errors='coerce')
+        transactions_df['date'] = pd.to_datetime(transactions_df['date'], errors='coerce')
+        return transactions_df
     
     def _get_payment_breakdown(self, transactions):
         """Get payment method breakdown."""
@@ -938,18 +1148,29 @@ class RetailDataGenerator:
                                reverse=True)
         return dict(sorted_products[:top_n])
 
-def generate_transactions(year, month, date):
-    """Main function to demonstrate the enhanced data generator with realistic quality issues."""
+def generate_transactions(year, month, date, layout='flat', output_dir='retail_data_v2', master_dir=None, rollup_dir=None,
+                          upload_bucket=None, upload_prefix='data/raw', sketch_dir=None):
+    """Main function to demonstrate the enhanced data generator with realistic quality issues.
+    
+    Daily files go to output_dir; master data is read from master_dir
+    (default output_dir), so concurrent runs can each use their own output_dir.
+    With upload_bucket, the day is generated in pipelined mode and uploaded
+    to s3://upload_bucket/upload_prefix/transactions/{date}/ as it is written.
+    """
     print("Initializing Enhanced Retail Data Generator with Realistic Quality Issues...")
     print("=" * 70)
     
     # Initialize with noise enabled for realistic data quality issues
-    generator = RetailDataGenerator(add_noise=True)
+    generator = RetailDataGenerator(add_noise=True, master_dir=master_dir or output_dir)
     
     # Generate data for specified date
     print(f"\nGenerating transaction data for {year}-{month}-{date}...")
     data_date = datetime(int(year), int(month), int(date))
-    generator.generate_and_save_daily_data(data_date)
+    if upload_bucket:
+        generator.generate_and_upload_daily_data(data_date, upload_bucket, upload_prefix, output_dir, rollup_dir, sketch_dir)
+    else:
+        generator.generate_and_save_daily_data(data_date, output_dir, layout=layout, rollup_dir=rollup_dir,
+                                               sketch_dir=sketch_dir)
     
     print("\nData generation complete!")
     print("=" * 70)
@@ -993,16 +1214,30 @@ def generate_transactions(year, month, date):
     print("  - data_quality_report.json (quality metrics)")
     
     print("\n📁 Daily Data (generated each run):")
-    print(f"  - transactions_{data_date.strftime('%Y-%m-%d')}.parquet (daily transactions)")
+    if upload_bucket:
+        print(f"  - transactions_{data_date.strftime('%Y-%m-%d')}/part-*.parquet (daily transactions, uploaded as written)")
+    elif layout == 'partitioned':
+        print(f"  - transactions/transaction_date={data_date.strftime('%Y-%m-%d')}/store_id=*/part-0.parquet (daily transactions)")
+    elif layout == 'normalized':
+        print(f"  - normalized/transactions/transactions_{data_date.strftime('%Y-%m-%d')}.parquet (one row per transaction)")
+        print(f"  - normalized/transaction_items/transaction_items_{data_date.strftime('%Y-%m-%d')}.parquet (one row per line item)")
+    else:
+        print(f"  - transactions_{data_date.strftime('%Y-%m-%d')}.parquet (daily transactions)")
     print(f"  - daily_summary_{data_date.strftime('%Y-%m-%d')}.json (daily analytics)")
+    print(f"  - daily_sketches_{data_date.strftime('%Y-%m-%d')}.npz (distinct-count sketches)")
+    print("  - rollups/{day,week,month}/*.parquet (revenue rollups by store, category, payment, status)")
     
     print("\n" + "=" * 70)
     print("Usage Examples:")
-    print("import pandas as pd")
     print("import json")
+    print("from transaction_dataset import load_transactions")
     print("")
-    print("# Load transaction data")
-    print(f"df = pd.read_parquet('retail_data_v2/transactions_{data_date.strftime('%Y-%m-%d')}.parquet')")
+    print("# Load transaction data (only the requested days, columns and stores are read)")
+    layout_arg = ", layout='partitioned'" if layout == 'partitioned' else ''
+    print(f"df = load_transactions('{data_date.strftime('%Y-%m-%d')}', '{data_date.strftime('%Y-%m-%d')}'{layout_arg})")
+    print(f"store_sales = load_transactions('{data_date.strftime('%Y-%m-01')}', '{data_date.strftime('%Y-%m-%d')}',")
+    print("                                columns=['transaction_id', 'product_id', 'quantity', 'line_total'],")
+    print(f"                                filters=[('store_id', '=', 'ST001')]{layout_arg})")
     print("")
     print("# Load quality report")
     print("with open('retail_data_v2/data_quality_report.json') as f:")
@@ -1018,4 +1253,23 @@ def generate_transactions(year, month, date):
     print("timestamp_issues = df[df['datetime'].isnull()]")
 
 if __name__ == "__main__":
-    generate_transactions(sys.argv[1], sys.argv[2], sys.argv[3])
\ No newline at end of file
+    # Usage: python data_generator_2.py YYYY MM DD [flat|partitioned|normalized]
+    #            [--output-dir DIR] [--master-dir DIR] [--rollup-dir DIR] [--sketch-dir DIR]
+    #            [--upload-bucket BUCKET [--upload-prefix PREFIX]]
+    parser = argparse.ArgumentParser(description='Generate one day of retail transactions')
+    parser.add_argument('year')
+    parser.add_argument('month')
+    parser.add_argument('day')
+    parser.add_argument('layout', nargs='?', default='flat', choices=LAYOUTS)
+    parser.add_argument('--output-dir', default='retail_data_v2', help="Where the day's files are written")
+    parser.add_argument('--master-dir', default=None, help='Shared master data directory (default: output dir)')
+    parser.add_argument('--rollup-dir', default=None, help='Shared rollup store (default: <output dir>/rollups)')
+    parser.add_argument('--sketch-dir', default=None, help='Where daily sketches are kept (default: output dir)')
+    parser.add_argument('--upload-bucket', default=None,
+                        help='Pipelined mode: upload part files to this S3 bucket while the day is generated (flat layout only)')
+    parser.add_argument('--upload-prefix', default='data/raw', help='S3 key prefix for --upload-bucket')
+    args = parser.parse_args()
+    if args.upload_bucket and args.layout != 'flat':
+        parser.error('--upload-bucket only supports the flat layout')
+    generate_transactions(args.year, args.month, args.day, args.layout, args.output_dir, args.master_dir, args.rollup_dir,
+                          args.upload_bucket, args.upload_prefix, args.sketch_dir)
\ No newline at end of file
@@ -1,17 +1,351 @@
-import boto3
-import great_expectations as gx
+import argparse
+import glob
+import json
 import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
-ge_url = "/mnt/d/Projects/Project-2-End-to-End-Retail-Analytics-Pipeline/great_expectations"
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import yaml
 
-context = gx.data_context.FileDataContext.create(ge_url)
+from compaction import DAILY_PATTERN, transaction_files
+from master_index import ForeignKeyIndex, ID_PREFIXES
+from parquet_layout import with_partition_columns
 
-datasource_name = "retailitics_raw_data"
-bucket_name = "ete-retailitics-storage-bucket"
-boto3_options = {"region_name":"ap-southeast-2"}
+DEFAULT_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dbt_retailitics_project',
+                                   'models', 'staging', 'schema.yml')
+DEFAULT_BATCH_SIZE = 256 * 1024  # rows per streamed batch
 
-datasource = context.add
+# Generated files behind each staging model
+MODEL_FILES = {
+    'stg_customers': ['customers.parquet'],
+    'stg_products': ['products.parquet'],
+    'stg_stores': ['stores.parquet'],
+    'stg_retail_transactions': [DAILY_PATTERN, 'transactions/**/*.parquet'],
+    'stg_transaction_headers': ['normalized/transactions/transactions_*.parquet'],
+    'stg_transaction_items': ['normalized/transaction_items/transaction_items_*.parquet'],
+}
 
-asset_name = "retail_analytics_asset"
-s3_prefix = "ete-retailitics-storage-bucket/data/raw/transactions"
-batching_regex = r"transactions_(\d{4}-\d{2}-\d{2})\.parquet"
\ No newline at end of file
+# Staging columns that are renamed from a raw column
+_TRANSACTION_RAW_COLUMNS = {
+    'transaction_date': 'date',
+    'transaction_time': 'time',
+    'transaction_datetime': 'datetime',
+}
+RAW_COLUMNS = {
+    'stg_retail_transactions': _TRANSACTION_RAW_COLUMNS,
+    'stg_transaction_headers': _TRANSACTION_RAW_COLUMNS,
+}
+
+_REF = re.compile(r"ref\(\s*['\"](\w+)['\"]\s*\)")
+
+
+def _original_transaction_id(batch):
+    return pc.replace_substring_regex(batch.column('transaction_id'), '^(DUP)+', '')
+
+
+def _transaction_partition_date(batch):
+    day = pc.utf8_slice_codeunits(_original_transaction_id(batch), 3, 11)
+    return pc.cast(pc.strptime(day, format='%Y%m%d', unit='s', error_is_null=True), pa.date32())
+
+
+# Staging columns computed in SQL, reproduced from the raw columns they depend on
+DERIVED_COLUMNS = {
+    'stg_retail_transactions': {
+        'original_transaction_id': (['transaction_id'], _original_transaction_id),
+        'transaction_partition_date': (['transaction_id'], _transaction_partition_date),
+    },
+    'stg_transaction_headers': {
+        'original_transaction_id': (['transaction_id'], _original_transaction_id),
+        'transaction_partition_date': (['transaction_id'], _transaction_partition_date),
+    },
+    'stg_transaction_items': {
+        'transaction_partition_date': (['transaction_id'], _transaction_partition_date),
+    },
+}
+
+
+def load_column_rules(schema_file=DEFAULT_SCHEMA_FILE):
+    """Read the column_rules tests declared for each model in a dbt schema.yml"""
+    with open(schema_file, encoding='utf-8') as f:
+        schema = yaml.safe_load(f)
+
+    specs = {}
+    for model in schema.get('models', []):
+        for test in model.get('tests', []) or []:
+            if isinstance(test, dict) and 'column_rules' in test:
+                spec = dict(test['column_rules'])
+                spec.setdefault('row_count', None)
+                specs[model['name']] = spec
+    return specs
+
+
+def model_files(data_dir, model):
+    """List the Parquet files behind a staging model"""
+    files = []
+    for pattern in MODEL_FILES[model]:
+        if pattern == DAILY_PATTERN:
+            # Daily or compacted files, whichever the compaction manifest points at
+            files.extend(transaction_files(data_dir))
+            continue
+        files.extend(glob.glob(os.path.join(data_dir, pattern), recursive=True))
+    return sorted(set(files))
+
+
+def _iter_rules(spec):
+    """Yield (column, rule_name, options) for every rule in a column_rules spec"""
+    for column_name, column_rules in spec['rules'].items():
+        for rule in column_rules:
+            if isinstance(rule, str):
+                yield column_name, rule, None
+            else:
+                rule_name, options = next(iter(rule.items()))
+                yield column_name, rule_name, options
+
+
+def load_reference_sets(data_dir, specs):
+    """Build a ForeignKeyIndex of the parent keys for every relationships rule"""
+    reference_sets = {}
+    for spec in specs.values():
+        for _, rule_name, options in _iter_rules(spec):
+            if rule_name != 'relationships':
+                continue
+            match = _REF.search(str(options['to']))
+            if not match:
+                raise ValueError(f"Unsupported relationships target: {options['to']}")
+            parent = match.group(1)
+            ref_key = (parent, options['field'])
+            if ref_key in reference_sets:
+                continue
+            raw_field = RAW_COLUMNS.get(parent, {}).get(options['field'], options['field'])
+            chunks = [pq.read_table(path, columns=[raw_field]).column(raw_field) for path in model_files(data_dir, parent)]
+            values = pa.chunked_array(chunks) if chunks else pa.array([], pa.string())
+            reference_sets[ref_key] = ForeignKeyIndex(values, ID_PREFIXES.get(options['field']))
+    return reference_sets
+
+
+def _column(batch, model, column_name):
+    """Get a staging column from a raw batch (renamed or derived as in the dbt model)"""
+    derived = DERIVED_COLUMNS.get(model, {}).get(column_name)
+    if derived:
+        return derived[1](batch)
+    return batch.column(RAW_COLUMNS.get(model, {}).get(column_name, column_name))
+
+
+def _source_columns(model, column_name):
+    """Raw columns a staging column is read or derived from"""
+    derived = DERIVED_COLUMNS.get(model, {}).get(column_name)
+    if derived:
+        return derived[0]
+    return [RAW_COLUMNS.get(model, {}).get(column_name, column_name)]
+
+
+def _raw_columns(model, spec, schema):
+    """Raw columns needed to evaluate a spec, restricted to those present in the file"""
+    needed = {spec['key_column']}
+    for column_name, _, _ in _iter_rules(spec):
+        needed.update(_source_columns(model, column_name))
+    return [name for name in schema.names if name in needed]
+
+
+def _accepted_values_mask(values, accepted):
+    """Rows holding a value outside the accepted list (nulls pass, as in dbt)"""
+    try:
+        value_set = pa.array(accepted).cast(values.type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        values = pc.cast(values, pa.string())
+        value_set = pa.array([str(v).lower() if isinstance(v, bool) else str(v) for v in accepted])
+    return pc.and_(pc.is_valid(values), pc.invert(pc.is_in(values, value_set=value_set)))
+
+
+def _failure_mask(batch, model, column_name, rule_name, options, reference_sets):
+    """Boolean mask of rows failing a rule, or None for rules checked after the scan"""
+    values = _column(batch, model, column_name)
+    if rule_name == 'not_null':
+        return pc.is_null(values)
+    if rule_name == 'accepted_values':
+        mask = _accepted_values_mask(values, options)
+    elif rule_name == 'between':
+        mask = pc.or_(pc.less(values, options['min_value']), pc.greater(values, options['max_value']))
+    elif rule_name == 'relationships':
+        parent = _REF.search(str(options['to'])).group(1)
+        return pa.array(reference_sets[(parent, options['field'])].orphans(values))
+    elif rule_name == 'unique':
+        return None
+    else:
+        raise ValueError(f"Unknown rule '{rule_name}' on {column_name}")
+    return pc.fill_null(mask, False)
+
+
+def _merge_keys(result, keys):
+    """Fold failing keys into the first/last failing key of a rule"""
+    if len(keys) == 0:
+        return
+    bounds = pc.min_max(pc.cast(keys, pa.string()))
+    low, high = bounds['min'].as_py(), bounds['max'].as_py()
+    if low is not None and (result['first_failing_key'] is None or low < result['first_failing_key']):
+        result['first_failing_key'] = low
+    if high is not None and (result['last_failing_key'] is None or high > result['last_failing_key']):
+        result['last_failing_key'] = high
+
+
+def validate_file(path, model, spec, reference_sets, batch_size=DEFAULT_BATCH_SIZE):
+    """Stream a Parquet file in batches and count failures for every rule in the spec.
+
+    Unique rules need every value of the column, so their values are collected
+    and checked once the file has been read.
+    """
+    started = time.perf_counter()
+    parquet_file = pq.ParquetFile(path)
+    columns = _raw_columns(model, spec, parquet_file.schema_arrow)
+    rules = list(_iter_rules(spec))
+    results = [{'column_name': column_name, 'rule_name': rule_name, 'failures': 0,
+                'first_failing_key': None, 'last_failing_key': None}
+               for column_name, rule_name, _ in rules]
+    unique_values = {column_name: [] for column_name, rule_name, _ in rules if rule_name == 'unique'}
+    key_chunks = []
+    rows = 0
+
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        # Hive-partitioned files carry store_id in their path instead of a column
+        batch = with_partition_columns(batch, path)
+        rows += batch.num_rows
+        keys = batch.column(spec['key_column'])
+        if unique_values:
+            key_chunks.append(keys)
+        for result, (column_name, rule_name, options) in zip(results, rules):
+            if not set(_source_columns(model, column_name)).issubset(batch.schema.names):
+                # A column missing from the file fails not_null for every row and is skipped otherwise
+                if rule_name == 'not_null':
+                    result['failures'] += batch.num_rows
+                    _merge_keys(result, keys)
+                continue
+            if rule_name == 'unique':
+                unique_values[column_name].append(_column(batch, model, column_name))
+                continue
+            mask = _failure_mask(batch, model, column_name, rule_name, options, reference_sets)
+            failures = pc.sum(mask).as_py() or 0
+            if failures:
+                result['failures'] += failures
+                _merge_keys(result, pc.filter(keys, mask))
+
+    for result, (column_name, rule_name, _) in zip(results, rules):
+        if rule_name != 'unique' or not unique_values[column_name]:
+            continue
+        values = pa.chunked_array(unique_values[column_name]).combine_chunks()
+        counts = pc.value_counts(pc.drop_null(values))
+        duplicated = pc.filter(counts.field('values'), pc.greater(counts.field('counts'), 1))
+        if len(duplicated):
+            mask = pc.is_in(values, value_set=duplicated)
+            result['failures'] = pc.sum(mask).as_py()
+            _merge_keys(result, pc.filter(pa.chunked_array(key_chunks).combine_chunks(), mask))
+
+    return {
+        'path': path,
+        'rows': rows,
+        'rules': results,
+        'seconds': round(time.perf_counter() - started, 4),
+    }
+
+
+def _combine(model, spec, file_results):
+    """Combine per-file results into the model report"""
+    rules = {}
+    for file_result in file_results:
+        for result in file_result['rules']:
+            key = (result['column_name'], result['rule_name'])
+            if key not in rules:
+                rules[key] = dict(result)
+                continue
+            combined = rules[key]
+            combined['failures'] += result['failures']
+            for field, pick in (('first_failing_key', min), ('last_failing_key', max)):
+                candidates = [k for k in (combined[field], result[field]) if k is not None]
+                combined[field] = pick(candidates) if candidates else None
+
+    rows = sum(f['rows'] for f in file_results)
+    failures = [r for r in rules.values() if r['failures'] > 0]
+    row_count = spec.get('row_count')
+    if row_count and not row_count['min_value'] <= rows <= row_count['max_value']:
+        failures.append({'column_name': None, 'rule_name': 'row_count', 'failures': rows,
+                         'first_failing_key': None, 'last_failing_key': None})
+
+    return {
+        'model': model,
+        'rows': rows,
+        'passed': not failures,
+        'failures': failures,
+        'files': [{'path': f['path'], 'rows': f['rows'], 'seconds': f['seconds'],
+                   'failed_rules': sum(1 for r in f['rules'] if r['failures'] > 0)}
+                  for f in file_results],
+    }
+
+
+def validate_data(data_dir='retail_data_v2', schema_file=DEFAULT_SCHEMA_FILE, models=None, workers=None,
+                  batch_size=DEFAULT_BATCH_SIZE):
+    """Validate the generated files against the column rules of the staging models.
+
+    Files are validated in parallel; unique rules are evaluated per file, so
+    duplicates spread across daily transaction files are not reported.
+    """
+    started = time.perf_counter()
+    specs = load_column_rules(schema_file)
+    if models:
+        specs = {model: spec for model, spec in specs.items() if model in models}
+    reference_sets = load_reference_sets(data_dir, specs)
+
+    jobs = [(path, model) for model in specs for path in model_files(data_dir, model)]
+    if workers == 1 or len(jobs) <= 1:
+        file_results = [validate_file(path, model, specs[model], reference_sets, batch_size)
+                        for path, model in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(validate_file, path, model, specs[model], reference_sets, batch_size)
+                       for path, model in jobs]
+            file_results = [future.result() for future in futures]
+
+    model_reports = []
+    for model, spec in specs.items():
+        results = [r for (_, job_model), r in zip(jobs, file_results) if job_model == model]
+        model_reports.append(_combine(model, spec, results))
+
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'data_dir': data_dir,
+        'schema_file': schema_file,
+        'passed': all(report['passed'] for report in model_reports),
+        'seconds': round(time.perf_counter() - started, 4),
+        'models': model_reports,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Validate generated Parquet files against the dbt staging column rules')
+    parser.add_argument('--data-dir', default='retail_data_v2')
+    parser.add_argument('--schema', default=DEFAULT_SCHEMA_FILE, help='dbt schema.yml with column_rules tests')
+    parser.add_argument('--output', default=None, help='JSON report path (default: <data-dir>/validation_report.json)')
+    parser.add_argument('--models', nargs='*', help='Only validate these staging models')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--gate', action='store_true', help='Exit with status 1 when any rule fails')
+    args = parser.parse_args()
+
+    report = validate_data(args.data_dir, args.schema, args.models, args.workers)
+    output = args.output or os.path.join(args.data_dir, 'validation_report.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, default=str)
+
+    for model_report in report['models']:
+        status = 'passed' if model_report['passed'] else f"{len(model_report['failures'])} failing rules"
+        print(f"{model_report['model']}: {model_report['rows']:,} rows in {len(model_report['files'])} files, {status}")
+        for failure in model_report['failures']:
+            print(f"  {failure['column_name']}.{failure['rule_name']}: {failure['failures']:,} "
+                  f"(e.g. {failure['first_failing_key']})")
+    print(f"Report written to {output} ({report['seconds']}s)")
+
+    if args.gate and not report['passed']:
+        sys.exit(1)
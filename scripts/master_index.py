@@ -0,0 +1,355 @@
+import argparse
+import glob
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+CUSTOMER_PREFIX = 'CUST'
+CUSTOMER_ID_DIGITS = 6
+MAX_CUSTOMER_CODE = 10 ** CUSTOMER_ID_DIGITS - 1
+
+
+def encode_customer_ids(customer_ids):
+    """Encode CUST000123 style IDs as integers (-1 for anything that doesn't match)"""
+    codes = np.full(len(customer_ids), -1, dtype=np.int64)
+    for i, customer_id in enumerate(customer_ids):
+        if customer_id and customer_id.startswith(CUSTOMER_PREFIX) and customer_id[len(CUSTOMER_PREFIX):].isdigit():
+            codes[i] = int(customer_id[len(CUSTOMER_PREFIX):])
+    return codes
+
+
+def decode_customer_id(code):
+    """Turn an integer customer code back into a CUST000123 style ID"""
+    return f'{CUSTOMER_PREFIX}{code:0{CUSTOMER_ID_DIGITS}d}'
+
+
+class CustomerIdIndex:
+    """Columnar index of master-data customer IDs for sampling realistic foreign keys.
+
+    The IDs are read once from customers.parquet, integer-encoded and cached as
+    a .npy file that is memory-mapped on later loads, so many generator
+    processes can share it without each holding a copy.
+    """
+
+    def __init__(self, codes, orphan_rate=0.05):
+        """Wrap an array of integer customer codes"""
+        if len(codes) == 0:
+            raise ValueError("Customer ID index is empty")
+        self.codes = codes
+        self.orphan_rate = orphan_rate
+        self.max_code = int(np.max(codes))
+        if orphan_rate and self.max_code >= MAX_CUSTOMER_CODE:
+            raise ValueError(f"No {CUSTOMER_ID_DIGITS}-digit customer codes left above {self.max_code} for orphan IDs")
+
+    @classmethod
+    def from_parquet(cls, customers_file='retail_data_v2/customers.parquet', cache_file=None, orphan_rate=0.05):
+        """Load the index from the master customers file, building the .npy cache if needed"""
+        if cache_file is None:
+            cache_file = os.path.join(os.path.dirname(customers_file), 'customer_ids.npy')
+
+        if (not os.path.exists(cache_file) or
+                os.path.getmtime(cache_file) < os.path.getmtime(customers_file)):
+            table = pq.read_table(customers_file, columns=['customer_id'], memory_map=True)
+            codes = encode_customer_ids(table.column('customer_id').to_pylist())
+            codes = np.unique(codes[codes >= 0]).astype(np.int32)
+            tmp_file = f'{cache_file}.{os.getpid()}.tmp.npy'
+            np.save(tmp_file, codes)
+            os.replace(tmp_file, cache_file)
+
+        return cls(np.load(cache_file, mmap_mode='r'), orphan_rate)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _orphan_code(self):
+        """An ID that is guaranteed not to exist in the master data, within the ID width"""
+        return random.randint(self.max_code + 1, MAX_CUSTOMER_CODE)
+
+    def sample_one(self):
+        """Sample a single customer ID, returning an orphan at the configured rate"""
+        if random.random() < self.orphan_rate:
+            return decode_customer_id(self._orphan_code())
+        return decode_customer_id(int(self.codes[random.randrange(len(self.codes))]))
+
+    def sample(self, n):
+        """Vectorized sampling of n customer IDs (orphans included at the configured rate)"""
+        codes = np.asarray(self.codes[np.random.randint(0, len(self.codes), size=n)], dtype=np.int64)
+        orphans = np.random.random(n) < self.orphan_rate
+        codes[orphans] = np.random.randint(self.max_code + 1, MAX_CUSTOMER_CODE + 1, size=int(orphans.sum()))
+        return [decode_customer_id(code) for code in codes.tolist()]
+
+
+# ID prefixes of the keys referenced by transactions
+ID_PREFIXES = {
+    'customer_id': CUSTOMER_PREFIX,
+    'product_id': 'PRD',
+    'store_id': 'ST',
+    'cashier_id': 'EMP',
+}
+
+# Master file holding each foreign key
+FOREIGN_KEY_FILES = {
+    'customer_id': 'customers.parquet',
+    'product_id': 'products.parquet',
+    'store_id': 'stores.parquet',
+}
+
+
+def encode_ids(ids, prefix):
+    """Vectorized version of encode_customer_ids for any PREFIX000123 style key (Arrow array or list)"""
+    if not isinstance(ids, (pa.Array, pa.ChunkedArray)):
+        ids = pa.array(ids, pa.string())
+    digits = pc.utf8_slice_codeunits(ids, len(prefix))
+    valid = pc.and_(pc.starts_with(ids, prefix),
+                    pc.and_(pc.utf8_is_digit(digits), pc.less_equal(pc.utf8_length(digits), 18)))
+    codes = pc.cast(pc.if_else(pc.fill_null(valid, False), digits, '-1'), pa.int64())
+    return np.asarray(codes.to_numpy(zero_copy_only=False), dtype=np.int64)
+
+
+def _mix64(values):
+    """SplitMix64 finalizer, used to derive Bloom filter hashes from integer codes"""
+    with np.errstate(over='ignore'):
+        z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+class BloomFilter:
+    """Bloom filter over integer codes, sized for a target false-positive rate"""
+
+    def __init__(self, capacity, fp_rate=0.01):
+        capacity = max(int(capacity), 1)
+        self.num_bits = max(64, int(math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.fp_rate = fp_rate
+        self.bits = np.zeros((self.num_bits + 63) // 64, dtype=np.uint64)
+
+    def _positions(self, codes):
+        """Bit positions of every code, one column per hash function (double hashing)"""
+        h1 = _mix64(np.asarray(codes, dtype=np.int64))
+        h2 = _mix64(h1) | np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def add(self, codes):
+        positions = self._positions(codes).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(6), np.uint64(1) << (positions & np.uint64(63)))
+
+    def might_contain(self, codes):
+        """False means definitely absent, True means present up to the false-positive rate"""
+        positions = self._positions(codes)
+        words = self.bits[positions >> np.uint64(6)]
+        return ((words >> (positions & np.uint64(63))) & np.uint64(1)).astype(bool).all(axis=1)
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+
+class ForeignKeyIndex:
+    """Set of master-data keys for probing transaction foreign keys in vectorized batches.
+
+    Keys matching the ID prefix are integer-encoded and kept as a sorted array
+    probed with np.searchsorted. With bloom_fp_rate set, a Bloom filter is kept
+    instead, trading exactness (orphans can be missed at that rate) for a few
+    bits per key on very large tables. Keys that don't fit the prefix pattern
+    are kept in an Arrow array and matched with pc.is_in.
+    """
+
+    def __init__(self, keys, prefix=None, bloom_fp_rate=None):
+        """Build the index from an Arrow array or list of key strings"""
+        if not isinstance(keys, (pa.Array, pa.ChunkedArray)):
+            keys = pa.array(keys, pa.string())
+        keys = pc.unique(pc.drop_null(keys))
+        if isinstance(keys, pa.ChunkedArray):
+            keys = keys.combine_chunks()
+
+        self.prefix = prefix
+        if prefix:
+            codes = encode_ids(keys, prefix)
+            self.other_keys = pc.filter(keys, pa.array(codes < 0))
+            codes = np.unique(codes[codes >= 0])
+        else:
+            self.other_keys = keys
+            codes = np.empty(0, dtype=np.int64)
+
+        self.size = len(codes) + len(self.other_keys)
+        self.codes = None
+        self.bloom = None
+        if bloom_fp_rate:
+            self.bloom = BloomFilter(len(codes), bloom_fp_rate)
+            self.bloom.add(codes)
+        else:
+            self.codes = codes
+
+    @classmethod
+    def from_parquet(cls, path, column, prefix=None, bloom_fp_rate=None):
+        """Build the index from one column of a master-data Parquet file"""
+        table = pq.read_table(path, columns=[column], memory_map=True)
+        return cls(table.column(column), prefix, bloom_fp_rate)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def exact(self):
+        return self.bloom is None
+
+    @property
+    def nbytes(self):
+        encoded = self.bloom.nbytes if self.bloom is not None else self.codes.nbytes
+        return encoded + self.other_keys.nbytes
+
+    def contains(self, ids):
+        """Boolean numpy mask of the ids found in the index (nulls are not found)"""
+        if not isinstance(ids, (pa.Array, pa.ChunkedArray)):
+            ids = pa.array(ids, pa.string())
+        found = np.zeros(len(ids), dtype=bool)
+
+        if self.prefix:
+            codes = encode_ids(ids, self.prefix)
+            encoded = codes >= 0
+            probes = codes[encoded]
+            if self.bloom is not None:
+                found[encoded] = self.bloom.might_contain(probes)
+            elif len(self.codes):
+                positions = np.minimum(np.searchsorted(self.codes, probes), len(self.codes) - 1)
+                found[encoded] = self.codes[positions] == probes
+        else:
+            encoded = np.zeros(len(ids), dtype=bool)
+
+        if len(self.other_keys):
+            rest = ~encoded
+            found[rest] = pc.is_in(pc.filter(ids, pa.array(rest)), value_set=self.other_keys) \
+                .to_numpy(zero_copy_only=False)
+        return found
+
+    def orphans(self, ids):
+        """Boolean numpy mask of non-null ids missing from the index"""
+        if not isinstance(ids, (pa.Array, pa.ChunkedArray)):
+            ids = pa.array(ids, pa.string())
+        present = pc.is_valid(ids).to_numpy(zero_copy_only=False)
+        return present & ~self.contains(ids)
+
+
+def load_foreign_key_indexes(data_dir='retail_data_v2', columns=None, bloom_fp_rate=None, bloom_columns=('customer_id',)):
+    """Build a ForeignKeyIndex per transaction foreign key from the master Parquet files.
+
+    bloom_fp_rate switches the columns in bloom_columns (by default the
+    customer table, the only one that grows large) to a Bloom filter.
+    """
+    indexes = {}
+    for column in columns or FOREIGN_KEY_FILES:
+        rate = bloom_fp_rate if column in bloom_columns else None
+        indexes[column] = ForeignKeyIndex.from_parquet(os.path.join(data_dir, FOREIGN_KEY_FILES[column]), column,
+                                                       ID_PREFIXES.get(column), rate)
+    return indexes
+
+
+def _transaction_days(transaction_ids):
+    """YYYYMMDD day of each transaction, taken from the TXNYYYYMMDD###### id (DUP prefixes removed)"""
+    original = pc.replace_substring_regex(transaction_ids, '^(DUP)+', '')
+    return pc.utf8_slice_codeunits(original, 3, 11)
+
+
+def _count_by_day(days, mask=None):
+    """Count rows per YYYY-MM-DD day (ids without a date are counted as 'unknown')"""
+    if mask is not None:
+        days = pc.filter(days, pa.array(mask))
+    counts = pc.value_counts(days)
+    result = {}
+    for day, count in zip(counts.field('values').to_pylist(), counts.field('counts').to_pylist()):
+        key = f'{day[:4]}-{day[4:6]}-{day[6:]}' if day and len(day) == 8 and day.isdigit() else 'unknown'
+        result[key] = result.get(key, 0) + count
+    return result
+
+
+def count_orphans(path, indexes, batch_size=256 * 1024):
+    """Stream a transactions file and count orphaned foreign keys per day and column"""
+    from parquet_layout import with_partition_columns
+
+    parquet_file = pq.ParquetFile(path)
+    columns = [c for c in ['transaction_id', *indexes] if c in parquet_file.schema_arrow.names]
+    rows_per_day = {}
+    orphans_per_day = {}
+
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        batch = with_partition_columns(batch, path, indexes)
+        days = _transaction_days(batch.column('transaction_id'))
+        for day, count in _count_by_day(days).items():
+            rows_per_day[day] = rows_per_day.get(day, 0) + count
+        for column, index in indexes.items():
+            if column not in batch.schema.names:
+                continue
+            mask = index.orphans(batch.column(column))
+            if not mask.any():
+                continue
+            for day, count in _count_by_day(days, mask).items():
+                day_orphans = orphans_per_day.setdefault(day, {})
+                day_orphans[column] = day_orphans.get(column, 0) + count
+
+    return {'path': path, 'rows_per_day': rows_per_day, 'orphans_per_day': orphans_per_day}
+
+
+def check_referential_integrity(data_dir='retail_data_v2', files=None, workers=None, bloom_fp_rate=None):
+    """Probe transaction files against the master-data indexes and report orphans per day and column"""
+    from compaction import transaction_files
+
+    started = time.perf_counter()
+    indexes = load_foreign_key_indexes(data_dir, bloom_fp_rate=bloom_fp_rate)
+    if files is None:
+        files = sorted(transaction_files(data_dir) +
+                       glob.glob(os.path.join(data_dir, 'transactions', '**', '*.parquet'), recursive=True))
+
+    if workers == 1 or len(files) <= 1:
+        results = [count_orphans(path, indexes) for path in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(count_orphans, files, [indexes] * len(files)))
+
+    per_day = {}
+    per_column = {column: 0 for column in indexes}
+    for result in results:
+        for day, rows in result['rows_per_day'].items():
+            per_day.setdefault(day, {'rows': 0, **{column: 0 for column in indexes}})['rows'] += rows
+        for day, day_orphans in result['orphans_per_day'].items():
+            for column, count in day_orphans.items():
+                per_day[day][column] += count
+                per_column[column] += count
+
+    return {
+        'files': len(files),
+        'rows': sum(day['rows'] for day in per_day.values()),
+        'per_column': per_column,
+        'per_day': dict(sorted(per_day.items())),
+        'indexes': {column: {'keys': len(index), 'exact': index.exact, 'bytes': index.nbytes}
+                    for column, index in indexes.items()},
+        'seconds': round(time.perf_counter() - started, 4),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Report orphaned foreign keys in generated transaction files')
+    parser.add_argument('--data-dir', default='retail_data_v2')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--bloom-fp-rate', type=float, default=None,
+                        help='Use a Bloom filter with this false-positive rate for customer IDs')
+    args = parser.parse_args()
+
+    report = check_referential_integrity(args.data_dir, workers=args.workers, bloom_fp_rate=args.bloom_fp_rate)
+    print(f"{report['rows']:,} rows in {report['files']} files ({report['seconds']}s)")
+    for column, info in report['indexes'].items():
+        kind = 'exact' if info['exact'] else 'bloom'
+        print(f"  {column}: {report['per_column'][column]:,} orphans ({info['keys']:,} keys, {kind}, {info['bytes']:,} bytes)")
+    for day, counts in report['per_day'].items():
+        orphans = ', '.join(f'{column}={counts[column]:,}' for column in report['per_column'])
+        print(f"  {day}: {counts['rows']:,} rows, {orphans}")
@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import json
 import random
@@ -5,7 +6,15 @@ from faker import Faker
 from datetime import datetime, timedelta
 import uuid
 import numpy as np
+import io
 import os
+import re
+import time
+from contextlib import ExitStack
+import pyarrow as pa
+import pyarrow.parquet as pq
+from atomic_io import atomic_output
+from master_index import CustomerIdIndex
 
 # Initialize Faker
 fake = Faker()
@@ -14,10 +23,174 @@ random.seed(42)
 np.random.seed(42)
 
 # Create output directory
-os.makedirs('online_data/raw', exist_ok=True)
+OUTPUT_DIR = 'online_data/raw'
+os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def generate_google_analytics_data(num_records=5000):
+# Output formats: 'raw' keeps the messy CSV/JSON files for malformed-data testing,
+# 'parquet' writes typed columnar files for bulk loads, 'both' writes both
+OUTPUT_FORMATS = ('raw', 'parquet', 'both')
+
+# Typed Arrow schemas for the Parquet outputs. Schema-drift extra fields are
+# declared as nullable columns so every file has the same layout.
+GOOGLE_ANALYTICS_SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('s')),
+    ('user_id', pa.string()),
+    ('session_id', pa.string()),
+    ('page_url', pa.string()),
+    ('page_views', pa.int64()),
+    ('bounce_rate', pa.float64()),
+    ('session_duration_seconds', pa.int64()),
+    ('utm_source', pa.string()),
+    ('device_type', pa.string()),
+    ('conversion_event', pa.string()),
+    ('revenue', pa.float64()),
+    ('browser_version', pa.string()),  # schema drift
+    ('country', pa.string()),          # schema drift
+    ('city', pa.string()),             # schema drift
+])
+
+SUPPORT_TICKET_SCHEMA = pa.schema([
+    ('ticket_id', pa.string()),
+    ('customer_id', pa.string()),
+    ('created_at', pa.timestamp('s')),
+    ('status', pa.string()),
+    ('priority', pa.string()),
+    ('category', pa.string()),
+    ('subject', pa.string()),
+    ('description', pa.string()),
+    ('resolution_time_hours', pa.int64()),
+    ('agent_id', pa.string()),
+])
+
+CHAT_MESSAGE_TYPE = pa.struct([
+    ('sender', pa.string()),
+    ('message', pa.string()),
+    ('timestamp', pa.timestamp('s')),
+])
+
+CHAT_TRANSCRIPT_SCHEMA = pa.schema([
+    ('chat_id', pa.string()),
+    ('customer_id', pa.string()),
+    ('chat_start', pa.timestamp('s')),
+    ('duration_minutes', pa.int64()),
+    ('messages', pa.list_(CHAT_MESSAGE_TYPE)),
+    ('satisfaction_score', pa.int64()),
+])
+
+SOCIAL_MEDIA_SCHEMA = pa.schema([
+    ('post_id', pa.string()),
+    ('user_id', pa.string()),
+    ('platform', pa.string()),
+    ('posted_at', pa.timestamp('s')),
+    ('post_type', pa.string()),
+    ('post_content', pa.string()),
+    ('hashtags', pa.list_(pa.string())),
+    ('likes', pa.int64()),
+    ('shares', pa.int64()),
+    ('comments', pa.int64()),
+    ('reach', pa.int64()),
+    ('impressions', pa.int64()),
+    ('sentiment', pa.string()),
+    ('location', pa.string()),            # schema drift
+    ('audience_age_range', pa.string()),  # schema drift
+    ('engagement_rate', pa.float64()),    # schema drift
+])
+
+def _text_type(arrow_type):
+    """Swap timestamp types for strings so formatted timestamps can be loaded before casting"""
+    if pa.types.is_timestamp(arrow_type):
+        return pa.string()
+    if pa.types.is_list(arrow_type):
+        return pa.list_(_text_type(arrow_type.value_type))
+    if pa.types.is_struct(arrow_type):
+        return pa.struct([pa.field(f.name, _text_type(f.type)) for f in arrow_type])
+    return arrow_type
+
+def _check_output_format(output_format):
+    """Validate the requested output format"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, got {output_format!r}")
+
+def write_parquet(records, schema, path):
+    """Write generated records to a zstd-compressed Parquet file with a fixed schema"""
+    text_schema = pa.schema([pa.field(f.name, _text_type(f.type)) for f in schema])
+    # from_pylist drops unknown keys and fills missing drift fields with nulls
+    table = pa.Table.from_pylist(records, schema=text_schema).cast(schema)
+    with atomic_output(path) as tmp_path:
+        pq.write_table(table, tmp_path, compression='zstd')
+    return table
+
+# Daily volumes for partitioned runs, derived from the default rolling windows
+# (e.g. 5000 Google Analytics records over 90 days)
+DAILY_VOLUMES = {
+    'google_analytics': 5000 // 90,
+    'support_tickets': 2000 // 180,
+    'chats': 1500 // 90,
+    'social_media': 3000 // 60,
+}
+
+# Files written per source and format; partitions add a _YYYY-MM-DD suffix
+SOURCE_FILES = {
+    'google_analytics': {
+        'raw': [('google_analytics_data', 'csv')],
+        'parquet': [('google_analytics_data', 'parquet')],
+    },
+    'customer_service': {
+        'raw': [('customer_service_tickets', 'json'), ('customer_service_chats', 'jsonl')],
+        'parquet': [('customer_service_tickets', 'parquet'), ('customer_service_chats', 'parquet')],
+    },
+    'social_media': {
+        'raw': [('social_media_data', 'csv'), ('social_media_sample', 'json')],
+        'parquet': [('social_media_data', 'parquet')],
+    },
+}
+
+def _output_path(output_dir, stem, extension, partition_date=None):
+    """Build an output file path, mirroring the transactions_YYYY-MM-DD.parquet convention for partitions"""
+    if partition_date is None:
+        return f'{output_dir}/{stem}.{extension}'
+    return f"{output_dir}/{stem}_{partition_date.strftime('%Y-%m-%d')}.{extension}"
+
+def _customer_id(customer_index=None):
+    """Pick a well-formed customer ID, sampled from the retail master data when linkage is enabled"""
+    if customer_index is None:
+        return f"user_{random.randint(10000, 99999)}"
+    return customer_index.sample_one()
+
+def _day_bounds(partition_date):
+    """Return the first and last second of a partition date"""
+    day_start = datetime(partition_date.year, partition_date.month, partition_date.day)
+    return day_start, day_start + timedelta(days=1) - timedelta(seconds=1)
+
+def _offset_days(offset):
+    """Number of days in a '+Nd' offset such as '+30d'"""
+    match = re.fullmatch(r'\+(\d+)d', offset)
+    if match is None:
+        raise ValueError(f"Expected an offset like '+30d', got {offset!r}")
+    return int(match.group(1))
+
+def _event_timestamp(partition_date, window_start, future_end, is_future):
+    """Draw an event timestamp from the rolling window, or from a single day when partitioned.
+
+    Future-dated records (data errors) are placed after the partition date but
+    stay in that date's partition, like late records in the daily transaction files.
+    """
+    if partition_date is None:
+        if is_future:
+            return fake.date_time_between(start_date='now', end_date=future_end)
+        return fake.date_time_between(start_date=window_start, end_date='now')
+    
+    day_start, day_end = _day_bounds(partition_date)
+    if is_future:
+        future_days = _offset_days(future_end)
+        return fake.date_time_between(start_date=day_end, end_date=day_end + timedelta(days=future_days))
+    return fake.date_time_between(start_date=day_start, end_date=day_end)
+
+def generate_google_analytics_data(num_records=5000, output_format='raw', output_dir=OUTPUT_DIR, partition_date=None,
+                                   customer_index=None):
     """Generate messy Google Analytics web traffic data"""
+    _check_output_format(output_format)
+    os.makedirs(output_dir, exist_ok=True)
     
     ga_data = []
     
@@ -35,10 +208,7 @@ def generate_google_analytics_data(num_records=5000):
         # Introduce various data quality issues
         
         # Random timestamp with some future dates (data error)
-        if random.random() < 0.02:  # 2% future dates
-            timestamp = fake.date_time_between(start_date='now', end_date='+30d')
-        else:
-            timestamp = fake.date_time_between(start_date='-90d', end_date='now')
+        timestamp = _event_timestamp(partition_date, '-90d', '+30d', random.random() < 0.02)  # 2% future dates
         
         # Sometimes missing user_id or malformed
         if random.random() < 0.05:  # 5% missing user_id
@@ -46,7 +216,7 @@ def generate_google_analytics_data(num_records=5000):
         elif random.random() < 0.03:  # 3% malformed user_id
             user_id = f"user_{random.randint(1, 99999)}_malformed_"
         else:
-            user_id = f"user_{random.randint(10000, 99999)}"
+            user_id = _customer_id(customer_index)
         
         # Session ID - sometimes missing or duplicated
         if random.random() < 0.02:  # 2% missing session_id
@@ -118,14 +288,26 @@ def generate_google_analytics_data(num_records=5000):
         ga_data.append(record)
     
     # Save as CSV with some encoding issues
-    df = pd.DataFrame(ga_data)
-    df.to_csv('online_data/raw/google_analytics_data.csv', index=False, encoding='utf-8')
+    if output_format in ('raw', 'both'):
+        df = pd.DataFrame(ga_data)
+        with atomic_output(_output_path(output_dir, 'google_analytics_data', 'csv', partition_date)) as tmp_path:
+            df.to_csv(tmp_path, index=False, encoding='utf-8')
+    if output_format in ('parquet', 'both'):
+        write_parquet(ga_data, GOOGLE_ANALYTICS_SCHEMA, _output_path(output_dir, 'google_analytics_data', 'parquet', partition_date))
     
     print(f"Generated {len(ga_data)} Google Analytics records")
     return ga_data
 
-def generate_customer_service_data(num_tickets=2000, num_chats=1500):
-    """Generate messy customer service data"""
+def generate_customer_service_data(num_tickets=2000, num_chats=1500, output_format='raw', batched_chats=False,
+                                   output_dir=OUTPUT_DIR, partition_date=None, customer_index=None):
+    """Generate messy customer service data.
+
+    With batched_chats=True the chat transcripts are streamed to disk by the
+    batched chat engine and the number of chats written is returned instead
+    of the chat records.
+    """
+    _check_output_format(output_format)
+    os.makedirs(output_dir, exist_ok=True)
     
     # Support Tickets
     tickets = []
@@ -135,10 +317,7 @@ def generate_customer_service_data(num_tickets=2000, num_chats=1500):
     
     for i in range(num_tickets):
         # Random timestamp with some future dates
-        if random.random() < 0.01:  # 1% future dates
-            created_at = fake.date_time_between(start_date='now', end_date='+7d')
-        else:
-            created_at = fake.date_time_between(start_date='-180d', end_date='now')
+        created_at = _event_timestamp(partition_date, '-180d', '+7d', random.random() < 0.01)  # 1% future dates
         
         # Customer ID - sometimes missing or inconsistent format
         if random.random() < 0.08:  # 8% missing customer_id
@@ -150,7 +329,7 @@ def generate_customer_service_data(num_tickets=2000, num_chats=1500):
                 f"{random.randint(10000, 99999)}"
             ])
         else:
-            customer_id = f"user_{random.randint(10000, 99999)}"
+            customer_id = _customer_id(customer_index)
         
         # Ticket ID - sometimes duplicated
         if random.random() < 0.005:  # 0.5% duplicate ticket_id
@@ -210,25 +389,36 @@ def generate_customer_service_data(num_tickets=2000, num_chats=1500):
         tickets.append(ticket)
     
     # Save tickets as JSON with some malformed records
-    with open('online_data/raw/customer_service_tickets.json', 'w') as f:
-        for i, ticket in enumerate(tickets):
-            if random.random() < 0.005:  # 0.5% malformed JSON
-                # Create malformed JSON by missing quotes or brackets
-                malformed = str(ticket).replace("'", '"')
-                f.write(malformed + '\n')
-            else:
-                json.dump(ticket, f)
-                f.write('\n')
+    if output_format in ('raw', 'both'):
+        with atomic_output(_output_path(output_dir, 'customer_service_tickets', 'json', partition_date)) as tmp_path, \
+                open(tmp_path, 'w') as f:
+            for i, ticket in enumerate(tickets):
+                if random.random() < 0.005:  # 0.5% malformed JSON
+                    # Create malformed JSON by missing quotes or brackets
+                    malformed = str(ticket).replace("'", '"')
+                    f.write(malformed + '\n')
+                else:
+                    json.dump(ticket, f)
+                    f.write('\n')
+    if output_format in ('parquet', 'both'):
+        write_parquet(tickets, SUPPORT_TICKET_SCHEMA, _output_path(output_dir, 'customer_service_tickets', 'parquet', partition_date))
     
     # Chat Transcripts
+    if batched_chats:
+        chats = generate_chat_transcripts_batched(num_chats, output_format=output_format,
+                                                  output_dir=output_dir, partition_date=partition_date,
+                                                  customer_index=customer_index)
+        print(f"Generated {len(tickets)} support tickets and {chats} chat transcripts")
+        return tickets, chats
+    
     chats = []
     
     for i in range(num_chats):
         chat_id = f"chat_{uuid.uuid4().hex[:10]}"
-        customer_id = f"user_{random.randint(10000, 99999)}" if random.random() < 0.9 else None
+        customer_id = _customer_id(customer_index) if random.random() < 0.9 else None
         
         # Chat timestamp
-        chat_start = fake.date_time_between(start_date='-90d', end_date='now')
+        chat_start = _event_timestamp(partition_date, '-90d', None, False)
         
         # Generate conversation
         messages = []
@@ -266,16 +456,180 @@ def generate_customer_service_data(num_tickets=2000, num_chats=1500):
         chats.append(chat)
     
     # Save chats as JSONL
-    with open('online_data/raw/customer_service_chats.jsonl', 'w') as f:
-        for chat in chats:
-            json.dump(chat, f)
-            f.write('\n')
+    if output_format in ('raw', 'both'):
+        with atomic_output(_output_path(output_dir, 'customer_service_chats', 'jsonl', partition_date)) as tmp_path, \
+                open(tmp_path, 'w') as f:
+            for chat in chats:
+                json.dump(chat, f)
+                f.write('\n')
+    if output_format in ('parquet', 'both'):
+        write_parquet(chats, CHAT_TRANSCRIPT_SCHEMA, _output_path(output_dir, 'customer_service_chats', 'parquet', partition_date))
     
     print(f"Generated {len(tickets)} support tickets and {len(chats)} chat transcripts")
     return tickets, chats
 
-def generate_social_media_data(num_posts=3000):
+def _build_chat_batch(num_chats, num_sentences, num_long_texts, window_start, window_seconds, customer_index=None):
+    """Draw one batch of chats as flat numpy arrays (one entry per chat or per message).
+
+    Message text is returned as indices into a combined pool laid out as
+    [empty string, sentences..., long texts...].
+    """
+    # Message counts are drawn up front; offsets index each chat's messages
+    counts = np.random.randint(2, 21, size=num_chats)
+    offsets = np.zeros(num_chats + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    total_messages = int(offsets[-1])
+    chat_index = np.repeat(np.arange(num_chats), counts)
+    
+    # Chat start times spread over the generation window
+    chat_start = window_start + np.random.randint(0, window_seconds, size=num_chats).astype('timedelta64[s]')
+    
+    # Message timestamps are cumulative 1-5 minute gaps from the chat start
+    gaps = np.random.randint(1, 6, size=total_messages).astype(np.int64)
+    gaps[offsets[:-1]] = 0
+    elapsed = np.cumsum(gaps)
+    elapsed -= elapsed[offsets[:-1]][chat_index]
+    msg_timestamp = chat_start[chat_index] + (elapsed * 60).astype('timedelta64[s]')
+    
+    # Message text index into the pool
+    roll = np.random.random(total_messages)
+    message_index = 1 + np.random.randint(0, num_sentences, size=total_messages)
+    long_mask = (roll >= 0.02) & (roll < 0.03)  # 1% very long messages
+    message_index[long_mask] = 1 + num_sentences + np.random.randint(0, num_long_texts, size=int(long_mask.sum()))
+    message_index[roll < 0.02] = 0  # 2% empty messages
+    
+    has_customer = np.random.random(num_chats) < 0.9
+    if customer_index is None:
+        customer_ids = [f"user_{code}" for code in np.random.randint(10000, 100000, size=num_chats).tolist()]
+    else:
+        customer_ids = customer_index.sample(num_chats)
+    has_duration = np.random.random(num_chats) < 0.8
+    has_score = np.random.random(num_chats) < 0.6
+    
+    return {
+        'offsets': offsets,
+        'chat_id': np.random.randint(0, 16 ** 10, size=num_chats, dtype=np.int64),
+        'customer_id': [customer_id if present else None
+                        for customer_id, present in zip(customer_ids, has_customer.tolist())],
+        'chat_start': chat_start,
+        'duration_minutes': np.where(has_duration, np.random.randint(5, 61, size=num_chats), -1),
+        'satisfaction_score': np.where(has_score, np.random.randint(1, 6, size=num_chats), -1),
+        'sender': np.random.randint(0, 2, size=total_messages),
+        'message_index': message_index,
+        'timestamp': msg_timestamp,
+    }
+
+def _format_timestamps(values):
+    """Format datetime64[s] values as 'YYYY-MM-DD HH:MM:SS' strings in bulk"""
+    return [ts.replace('T', ' ') for ts in np.datetime_as_string(values, unit='s').tolist()]
+
+def _write_chat_batch_jsonl(batch, json_pool, f, buffer):
+    """Render a chat batch as JSONL into a reusable buffer and flush it to f"""
+    senders = ('"customer"', '"agent"')
+    offsets = batch['offsets'].tolist()
+    # Pool entries are JSON-encoded once, so messages are assembled without json.dumps
+    messages = [
+        f'{{"sender": {senders[sender]}, "message": {text}, "timestamp": "{ts}"}}'
+        for sender, text, ts in zip(batch['sender'].tolist(),
+                                    json_pool[batch['message_index']].tolist(),
+                                    _format_timestamps(batch['timestamp']))
+    ]
+    chat_start = _format_timestamps(batch['chat_start'])
+    customer_ids = [f'"{customer_id}"' if customer_id is not None else 'null'
+                    for customer_id in batch['customer_id']]
+    
+    buffer.seek(0)
+    buffer.truncate()
+    for i, (chat_id, duration, score) in enumerate(zip(
+            batch['chat_id'].tolist(), batch['duration_minutes'].tolist(),
+            batch['satisfaction_score'].tolist())):
+        buffer.write(
+            f'{{"chat_id": "chat_{chat_id:010x}", '
+            f'"customer_id": {customer_ids[i]}, '
+            f'"chat_start": "{chat_start[i]}", '
+            f'"duration_minutes": {duration if duration >= 0 else "null"}, '
+            f'"messages": [{", ".join(messages[offsets[i]:offsets[i + 1]])}], '
+            f'"satisfaction_score": {score if score >= 0 else "null"}}}\n'
+        )
+    f.write(buffer.getvalue())
+
+def _chat_batch_to_arrow(batch, text_pool):
+    """Build an Arrow table with messages as list<struct> straight from the batch arrays"""
+    num_chats = len(batch['chat_id'])
+    messages = pa.StructArray.from_arrays([
+        pa.array(np.array(['customer', 'agent'])[batch['sender']]),
+        pa.array(text_pool[batch['message_index']], type=pa.string()),
+        pa.array(batch['timestamp'], type=pa.timestamp('s')),
+    ], fields=list(CHAT_MESSAGE_TYPE))
+    return pa.table({
+        'chat_id': pa.array([f"chat_{chat_id:010x}" for chat_id in batch['chat_id'].tolist()]),
+        'customer_id': pa.array(batch['customer_id'], type=pa.string()),
+        'chat_start': pa.array(batch['chat_start'], type=pa.timestamp('s')),
+        'duration_minutes': pa.array(batch['duration_minutes'], mask=batch['duration_minutes'] < 0),
+        'messages': pa.ListArray.from_arrays(pa.array(batch['offsets'], type=pa.int32()), messages),
+        'satisfaction_score': pa.array(batch['satisfaction_score'], mask=batch['satisfaction_score'] < 0),
+    }, schema=CHAT_TRANSCRIPT_SCHEMA) if num_chats else CHAT_TRANSCRIPT_SCHEMA.empty_table()
+
+def generate_chat_transcripts_batched(num_chats=1500, output_format='raw', batch_size=100000,
+                                      sentence_pool_size=5000, long_text_pool_size=200,
+                                      output_dir=OUTPUT_DIR, partition_date=None, customer_index=None):
+    """Generate chat transcripts in bulk with numpy and stream them to disk.
+
+    Message text is drawn from pre-generated Faker pools by index, so Faker is
+    only called pool-size times regardless of how many chats are generated.
+    Returns the number of chats written.
+    """
+    _check_output_format(output_format)
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+    
+    # Pre-generated text pool: empty message, short sentences, very long messages
+    text_pool = np.array(
+        [''] +
+        [fake.sentence(nb_words=random.randint(3, 20)) for _ in range(sentence_pool_size)] +
+        [fake.text(max_nb_chars=1000) for _ in range(long_text_pool_size)],
+        dtype=object
+    )
+    # JSON-encode each pool entry once for the JSONL writer
+    json_pool = np.array([json.dumps(text) for text in text_pool], dtype=object)
+    
+    # Chats start within the last 90 days, or within the partition date
+    if partition_date is None:
+        window_start = np.datetime64(datetime.now().replace(microsecond=0), 's') - np.timedelta64(90, 'D')
+        window_seconds = 90 * 24 * 3600
+    else:
+        window_start = np.datetime64(_day_bounds(partition_date)[0], 's')
+        window_seconds = 24 * 3600
+    
+    jsonl_path = _output_path(output_dir, 'customer_service_chats', 'jsonl', partition_date)
+    parquet_path = _output_path(output_dir, 'customer_service_chats', 'parquet', partition_date)
+    buffer = io.StringIO()
+    
+    # Files are streamed to temp paths and renamed into place once complete
+    with ExitStack() as stack:
+        jsonl_file = (stack.enter_context(open(stack.enter_context(atomic_output(jsonl_path)), 'w'))
+                      if output_format in ('raw', 'both') else None)
+        parquet_writer = (stack.enter_context(pq.ParquetWriter(stack.enter_context(atomic_output(parquet_path)),
+                                                               CHAT_TRANSCRIPT_SCHEMA, compression='zstd'))
+                          if output_format in ('parquet', 'both') else None)
+        for batch_start in range(0, num_chats, batch_size):
+            batch = _build_chat_batch(min(batch_size, num_chats - batch_start), sentence_pool_size,
+                                      long_text_pool_size, window_start, window_seconds, customer_index)
+            if jsonl_file is not None:
+                _write_chat_batch_jsonl(batch, json_pool, jsonl_file, buffer)
+            if parquet_writer is not None:
+                parquet_writer.write_table(_chat_batch_to_arrow(batch, text_pool))
+    
+    elapsed = time.perf_counter() - started
+    rate = num_chats / elapsed * 60 if elapsed > 0 else 0
+    print(f"Chat engine: {num_chats} chats in {elapsed:.2f}s ({rate:,.0f} chats/minute)")
+    return num_chats
+
+def generate_social_media_data(num_posts=3000, output_format='raw', output_dir=OUTPUT_DIR, partition_date=None,
+                               customer_index=None):
     """Generate messy social media engagement data"""
+    _check_output_format(output_format)
+    os.makedirs(output_dir, exist_ok=True)
     
     social_data = []
     platforms = ['facebook', 'twitter', 'instagram', 'linkedin', 'tiktok', 'Facebook', 'TWITTER', None]
@@ -299,13 +653,10 @@ def generate_social_media_data(num_posts=3000):
                 f"USER{random.randint(1000, 9999)}"
             ])
         else:
-            user_id = f"user_{random.randint(10000, 99999)}"
+            user_id = _customer_id(customer_index)
         
         # Timestamp issues
-        if random.random() < 0.015:  # 1.5% future dates
-            posted_at = fake.date_time_between(start_date='now', end_date='+14d')
-        else:
-            posted_at = fake.date_time_between(start_date='-60d', end_date='now')
+        posted_at = _event_timestamp(partition_date, '-60d', '+14d', random.random() < 0.015)  # 1.5% future dates
         
         # Engagement metrics with various issues
         # Likes - sometimes negative or missing
@@ -402,56 +753,115 @@ def generate_social_media_data(num_posts=3000):
         social_data.append(record)
     
     # Save as CSV with mixed delimiters (some commas in content cause issues)
-    df = pd.DataFrame(social_data)
-    df.to_csv('online_data/raw/social_media_data.csv', index=False, encoding='utf-8')
-    
-    # Also save a portion as JSON with some malformed records
-    json_sample = random.sample(social_data, len(social_data) // 3)
-    with open('online_data/raw/social_media_sample.json', 'w') as f:
-        f.write('[\n')
-        for i, record in enumerate(json_sample):
-            if random.random() < 0.008:  # 0.8% malformed JSON
-                # Create malformed JSON
-                malformed = str(record).replace("'", '"').replace('None', 'null')
-                f.write(f'  {malformed}')
-            else:
-                json.dump(record, f, indent=2)
-            
-            if i < len(json_sample) - 1:
-                f.write(',\n')
-            else:
-                f.write('\n')
-        f.write(']\n')
+    if output_format in ('raw', 'both'):
+        df = pd.DataFrame(social_data)
+        with atomic_output(_output_path(output_dir, 'social_media_data', 'csv', partition_date)) as tmp_path:
+            df.to_csv(tmp_path, index=False, encoding='utf-8')
+        
+        # Also save a portion as JSON with some malformed records
+        json_sample = random.sample(social_data, len(social_data) // 3)
+        with atomic_output(_output_path(output_dir, 'social_media_sample', 'json', partition_date)) as tmp_path, \
+                open(tmp_path, 'w') as f:
+            f.write('[\n')
+            for i, record in enumerate(json_sample):
+                if random.random() < 0.008:  # 0.8% malformed JSON
+                    # Create malformed JSON
+                    malformed = str(record).replace("'", '"').replace('None', 'null')
+                    f.write(f'  {malformed}')
+                else:
+                    json.dump(record, f, indent=2)
+                
+                if i < len(json_sample) - 1:
+                    f.write(',\n')
+                else:
+                    f.write('\n')
+            f.write(']\n')
+    if output_format in ('parquet', 'both'):
+        # hashtags keep their list type instead of a stringified Python list
+        write_parquet(social_data, SOCIAL_MEDIA_SCHEMA, _output_path(output_dir, 'social_media_data', 'parquet', partition_date))
     
     print(f"Generated {len(social_data)} social media posts")
     return social_data
 
-def main():
+def _partition_files(source, partition_date, output_format, output_dir):
+    """List the files a source writes for one partition date"""
+    formats = ('raw', 'parquet') if output_format == 'both' else (output_format,)
+    return [_output_path(output_dir, stem, extension, partition_date)
+            for fmt in formats
+            for stem, extension in SOURCE_FILES[source][fmt]]
+
+def generate_daily_partitions(start_date, end_date, output_format='raw', batched_chats=False,
+                              output_dir=OUTPUT_DIR, customer_index=None):
+    """Generate one partition per event date, skipping dates whose files already exist.
+
+    Each date gets a single day of data per source, so a daily run only pays
+    for the new day and loaders can pick up new partitions only. Every file is
+    written to a temp path and renamed into place, so a file that exists is
+    complete and an interrupted date is generated again.
+    Returns the list of (source, date) partitions that were generated.
+    """
+    _check_output_format(output_format)
+    os.makedirs(output_dir, exist_ok=True)
+    generated = []
+    
+    partition_date = start_date
+    while partition_date <= end_date:
+        for source in SOURCE_FILES:
+            files = _partition_files(source, partition_date, output_format, output_dir)
+            if all(os.path.exists(path) for path in files):
+                continue
+            
+            if source == 'google_analytics':
+                generate_google_analytics_data(DAILY_VOLUMES['google_analytics'], output_format,
+                                               output_dir, partition_date, customer_index)
+            elif source == 'customer_service':
+                generate_customer_service_data(DAILY_VOLUMES['support_tickets'], DAILY_VOLUMES['chats'],
+                                               output_format, batched_chats, output_dir, partition_date,
+                                               customer_index)
+            else:
+                generate_social_media_data(DAILY_VOLUMES['social_media'], output_format,
+                                           output_dir, partition_date, customer_index)
+            generated.append((source, partition_date.strftime('%Y-%m-%d')))
+        partition_date += timedelta(days=1)
+    
+    print(f"Generated {len(generated)} new partitions between "
+          f"{start_date.strftime('%Y-%m-%d')} and {end_date.strftime('%Y-%m-%d')}")
+    return generated
+
+def main(output_format='raw', batched_chats=False, customer_index=None):
     """Generate all messy data sources"""
+    _check_output_format(output_format)
     print("🚀 Generating messy retail data sources...")
     print("=" * 50)
     
     # Generate Google Analytics data
     print("📊 Generating Google Analytics data...")
-    ga_data = generate_google_analytics_data(5000)
+    ga_data = generate_google_analytics_data(5000, output_format, customer_index=customer_index)
     
     # Generate Customer Service data
     print("🎧 Generating Customer Service data...")
-    tickets, chats = generate_customer_service_data(2000, 1500)
+    tickets, chats = generate_customer_service_data(2000, 1500, output_format, batched_chats,
+                                                    customer_index=customer_index)
     
     # Generate Social Media data
     print("📱 Generating Social Media data...")
-    social_data = generate_social_media_data(3000)
+    social_data = generate_social_media_data(3000, output_format, customer_index=customer_index)
     
     print("=" * 50)
     print("✅ Data generation complete!")
     print("\nGenerated files:")
     print("📁 online_data/raw/")
-    print("  ├── google_analytics_data.csv")
-    print("  ├── customer_service_tickets.json")
-    print("  ├── customer_service_chats.jsonl")
-    print("  ├── social_media_data.csv")
-    print("  └── social_media_sample.json")
+    if output_format in ('raw', 'both'):
+        print("  ├── google_analytics_data.csv")
+        print("  ├── customer_service_tickets.json")
+        print("  ├── customer_service_chats.jsonl")
+        print("  ├── social_media_data.csv")
+        print("  ├── social_media_sample.json")
+    if output_format in ('parquet', 'both'):
+        print("  ├── google_analytics_data.parquet")
+        print("  ├── customer_service_tickets.parquet")
+        print("  ├── customer_service_chats.parquet (messages as list<struct>)")
+        print("  ├── social_media_data.parquet (hashtags as list<string>)")
     
     print("\n🚨 Data Quality Issues Introduced:")
     print("• Missing values (5-10% across different fields)")
@@ -467,4 +877,29 @@ def main():
     print("\n🎯 Perfect for testing your dbt data quality framework!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate messy online data sources")
+    parser.add_argument('output_format', nargs='?', default='raw', choices=OUTPUT_FORMATS)
+    parser.add_argument('--batched-chats', action='store_true',
+                        help="Use the batched chat engine for chat transcripts")
+    parser.add_argument('--daily', nargs='+', metavar='YYYY-MM-DD',
+                        help="Write daily partitions for a start date (and optional end date), "
+                             "generating only missing dates")
+    parser.add_argument('--link-customers', metavar='CUSTOMERS_PARQUET',
+                        help="Sample customer IDs from the retail master data (e.g. retail_data_v2/customers.parquet)")
+    parser.add_argument('--orphan-rate', type=float, default=0.05,
+                        help="Share of linked customer IDs that have no master record (default 0.05)")
+    args = parser.parse_args()
+    
+    customer_index = None
+    if args.link_customers:
+        customer_index = CustomerIdIndex.from_parquet(args.link_customers, orphan_rate=args.orphan_rate)
+        print(f"Linking customer IDs to {len(customer_index)} master customers "
+              f"({args.orphan_rate:.0%} orphans)")
+    
+    if args.daily:
+        start = datetime.strptime(args.daily[0], '%Y-%m-%d')
+        end = datetime.strptime(args.daily[-1], '%Y-%m-%d')
+        generate_daily_partitions(start, end, args.output_format, args.batched_chats,
+                                  customer_index=customer_index)
+    else:
+        main(args.output_format, args.batched_chats, customer_index)
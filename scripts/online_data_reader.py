@@ -0,0 +1,248 @@
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# orjson is much faster than the standard library parser but is optional
+try:
+    import orjson
+    _loads = orjson.loads
+    PARSER_NAME = 'orjson'
+except ImportError:
+    _loads = json.loads
+    PARSER_NAME = 'json'
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB per worker chunk
+
+# Repairs for the malformation patterns written by online_data_generator.py:
+# str(record).replace("'", '"') leaves Python literals, turns apostrophes inside
+# words into double quotes and keeps repr escapes such as \xa0
+_PYTHON_LITERALS = re.compile(r'(?<=[:\[,] )(None|True|False)(?=[,\]}])|(?<=\[)(None|True|False)(?=[,\]])')
+_INNER_QUOTE = re.compile(r'(?<=[A-Za-z])"(?=[A-Za-z])')
+_HEX_ESCAPE = re.compile(r'(?<!\\)\\x([0-9a-fA-F]{2})')
+_LITERAL_MAP = {'None': 'null', 'True': 'true', 'False': 'false'}
+
+
+def repair_record(text):
+    """Rewrite a malformed Python-repr style record into valid JSON text"""
+    text = _PYTHON_LITERALS.sub(lambda m: _LITERAL_MAP[m.group(0)], text)
+    text = _INNER_QUOTE.sub("'", text)
+    text = _HEX_ESCAPE.sub(r'\\u00\1', text)
+    return text
+
+
+def detect_format(path):
+    """Return 'array' for bracketed JSON arrays and 'jsonl' for one record per line"""
+    with open(path, 'rb') as f:
+        head = f.read(64).lstrip()
+    return 'array' if head.startswith(b'[') else 'jsonl'
+
+
+def _is_record_start(line, file_format):
+    """Check whether a line starts a new record"""
+    if file_format == 'jsonl':
+        return bool(line.strip())
+    # json.dump(indent=2) opens records with a bare '{', malformed records are
+    # written on a single line indented by two spaces
+    return line.rstrip() == b'{' or line.startswith(b'  {')
+
+
+def _iter_raw_records(f, start, end, file_format):
+    """Yield (offset, raw_bytes) for every record starting inside [start, end)"""
+    offset = start
+    if start > 0:
+        # Align to the next newline boundary
+        f.seek(start - 1)
+        if f.read(1) != b'\n':
+            offset += len(f.readline())
+    f.seek(offset)
+
+    buffer = None
+    buffer_offset = 0
+    for line in iter(f.readline, b''):
+        line_offset = offset
+        offset += len(line)
+
+        if buffer is not None:
+            if not _is_record_start(line, file_format):
+                buffer.append(line)
+                if line.rstrip().rstrip(b',') == b'}':
+                    yield buffer_offset, b''.join(buffer).rstrip().rstrip(b',')
+                    buffer = None
+                    if offset >= end:
+                        return
+                continue
+            # A new record starts before the buffered one closed (truncated
+            # record, e.g. in concatenated files): yield it as it is
+            yield buffer_offset, b''.join(buffer)
+            buffer = None
+
+        if not _is_record_start(line, file_format):
+            continue
+        if line_offset >= end:
+            return
+
+        if file_format == 'array' and line.rstrip() == b'{':
+            buffer = [line]
+            buffer_offset = line_offset
+        else:
+            yield line_offset, line.strip().rstrip(b',')
+
+    if buffer is not None:
+        # Truncated record at end of file
+        yield buffer_offset, b''.join(buffer)
+
+
+def _parse_record(raw):
+    """Parse one raw record, repairing it if needed; returns (record, repaired)"""
+    try:
+        return _loads(raw), False
+    except ValueError:
+        pass
+    return _loads(repair_record(raw.decode('utf-8', errors='replace'))), True
+
+
+def _split_run_on(raw):
+    """Split a line holding a truncated or unterminated record followed by a whole one.
+
+    Returns (head, record, repaired) for the first '{' whose rest of the line
+    parses, or None. Concatenated files produce these lines when a file does
+    not end with a newline.
+    """
+    start = raw.find(b'{', 1)
+    while start != -1:
+        try:
+            return (raw[:start], *_parse_record(raw[start:]))
+        except ValueError:
+            start = raw.find(b'{', start + 1)
+    return None
+
+
+def _quarantine_entry(offset, raw, error):
+    return {
+        'offset': offset,
+        'length': len(raw),
+        'error': str(error),
+        'raw': raw.decode('utf-8', errors='replace')
+    }
+
+
+def _parse_chunk(path, start, end, file_format):
+    """Parse one chunk of a file, returning records, repair count and quarantined lines"""
+    records = []
+    quarantined = []
+    repaired = 0
+
+    with open(path, 'rb') as f:
+        for offset, raw in _iter_raw_records(f, start, end, file_format):
+            try:
+                record, was_repaired = _parse_record(raw)
+                records.append(record)
+                repaired += was_repaired
+                continue
+            except ValueError as e:
+                error = e
+
+            split = _split_run_on(raw)
+            if split is None:
+                quarantined.append(_quarantine_entry(offset, raw, error))
+                continue
+
+            head, record, was_repaired = split
+            try:
+                head_record, head_repaired = _parse_record(head)
+                records.append(head_record)
+                repaired += head_repaired
+            except ValueError as e:
+                quarantined.append(_quarantine_entry(offset, head, e))
+            records.append(record)
+            repaired += was_repaired
+
+    return records, repaired, quarantined
+
+
+def _chunk_ranges(file_size, chunk_size):
+    """Split a file into byte ranges of roughly chunk_size bytes"""
+    return [(start, min(start + chunk_size, file_size))
+            for start in range(0, file_size, chunk_size)] or [(0, 0)]
+
+
+def read_tolerant_json(path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, quarantine_path=None):
+    """Read a possibly malformed JSONL or JSON array file in parallel chunks.
+
+    Records that cannot be parsed even after repair are written to a quarantine
+    file (default: <path>.quarantine.jsonl) together with their byte offset.
+    Returns the parsed records and a stats dictionary.
+    """
+    started = time.perf_counter()
+    file_format = detect_format(path)
+    file_size = os.path.getsize(path)
+    ranges = _chunk_ranges(file_size, chunk_size)
+
+    if len(ranges) == 1 or workers == 1:
+        results = [_parse_chunk(path, start, end, file_format) for start, end in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_parse_chunk, path, start, end, file_format)
+                       for start, end in ranges]
+            results = [future.result() for future in futures]
+
+    records = []
+    quarantined = []
+    repaired = 0
+    for chunk_records, chunk_repaired, chunk_quarantined in results:
+        records.extend(chunk_records)
+        repaired += chunk_repaired
+        quarantined.extend(chunk_quarantined)
+
+    if quarantine_path is None:
+        quarantine_path = f'{path}.quarantine.jsonl'
+    if quarantined:
+        with open(quarantine_path, 'w', encoding='utf-8') as f:
+            for entry in quarantined:
+                json.dump(entry, f)
+                f.write('\n')
+    elif os.path.exists(quarantine_path):
+        os.remove(quarantine_path)
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        'path': path,
+        'format': file_format,
+        'parser': PARSER_NAME,
+        'bytes': file_size,
+        'chunks': len(ranges),
+        'records': len(records),
+        'repaired': repaired,
+        'quarantined': len(quarantined),
+        'quarantine_path': quarantine_path if quarantined else None,
+        'seconds': round(elapsed, 4),
+        'mb_per_s': round(file_size / (1024 * 1024) / elapsed, 2) if elapsed > 0 else None
+    }
+    return records, stats
+
+
+def benchmark(paths, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, repeat=3):
+    """Report reader throughput in MB/s for each file (best of `repeat` runs)"""
+    results = []
+    for path in paths:
+        best = None
+        for _ in range(repeat):
+            _, stats = read_tolerant_json(path, workers=workers, chunk_size=chunk_size)
+            if best is None or stats['seconds'] < best['seconds']:
+                best = stats
+        results.append(best)
+        print(f"{path}: {best['records']} records, {best['repaired']} repaired, "
+              f"{best['quarantined']} quarantined, {best['mb_per_s']} MB/s ({best['parser']})")
+    return results
+
+
+if __name__ == "__main__":
+    # Usage: python online_data_reader.py [file ...]
+    files = sys.argv[1:] or [
+        'online_data/raw/customer_service_tickets.json',
+        'online_data/raw/social_media_sample.json',
+    ]
+    benchmark(files)
@@ -0,0 +1,145 @@
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+LAYOUTS = ('flat', 'partitioned', 'normalized')
+TRANSACTIONS_DIR = 'transactions'
+NORMALIZED_DIR = 'normalized'
+TRANSACTION_ITEMS_DIR = 'transaction_items'
+PARTITION_COLUMN = 'transaction_date'
+HIVE_NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+DEFAULT_ROW_GROUP_SIZE = 128 * 1024  # rows
+DEFAULT_ZSTD_LEVEL = 6
+# Repeated strings that compress far better dictionary-encoded; ids and free text stay plain
+DICTIONARY_COLUMNS = [
+    'store_id', 'store_name', 'cashier_id', 'payment_method', 'status', 'promotion_code',
+    'refund_reason', 'product_id', 'product_name', 'category', 'time',
+]
+
+
+def sort_by_datetime(table):
+    """Sort rows by transaction datetime; rows without a timestamp go last"""
+    if 'datetime' not in table.column_names or table.num_rows == 0:
+        return table
+    return table.take(pc.sort_indices(table, sort_keys=[('datetime', 'ascending')]))
+
+
+def write_transactions_file(table, path, row_group_size=DEFAULT_ROW_GROUP_SIZE, compression_level=DEFAULT_ZSTD_LEVEL,
+                            dictionary_columns=DICTIONARY_COLUMNS):
+    """Write one Parquet file with the tuned settings, via a temp file and rename"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    pq.write_table(
+        table,
+        tmp_path,
+        row_group_size=row_group_size,
+        compression='zstd',
+        compression_level=compression_level,
+        use_dictionary=[c for c in dictionary_columns if c in table.column_names],
+        write_statistics=True,
+        write_page_index=True,
+    )
+    os.replace(tmp_path, path)
+
+
+def write_flat_transactions(transactions_df, path, row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                            compression_level=DEFAULT_ZSTD_LEVEL, dictionary_columns=DICTIONARY_COLUMNS):
+    """Write a day's transactions as one sorted, zstd-compressed file with statistics and page indexes"""
+    table = sort_by_datetime(pa.Table.from_pandas(transactions_df, preserve_index=False))
+    write_transactions_file(table, path, row_group_size, compression_level, dictionary_columns)
+    return [path]
+
+
+def partition_dir(output_dir, date_str):
+    return os.path.join(output_dir, TRANSACTIONS_DIR, f'{PARTITION_COLUMN}={date_str}')
+
+
+def write_partitioned_transactions(transactions_df, output_dir, date_str, row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                                   compression_level=DEFAULT_ZSTD_LEVEL, dictionary_columns=DICTIONARY_COLUMNS):
+    """Write a day's transactions as transactions/transaction_date=YYYY-MM-DD/store_id=.../part-0.parquet.
+
+    The partition columns are encoded in the path (Hive style) and dropped from
+    the files; rows are sorted by datetime inside each file. The day's
+    directory is built next to the final location and swapped in, so readers
+    never see a half-written day.
+    """
+    table = pa.Table.from_pandas(transactions_df, preserve_index=False)
+    final_dir = partition_dir(output_dir, date_str)
+    # Dot-prefixed siblings are skipped by glob-based readers while the day is being replaced
+    parent_dir, day_dir = os.path.split(final_dir)
+    tmp_dir = os.path.join(parent_dir, f'.{day_dir}.{os.getpid()}.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    store_ids = table.column('store_id')
+    written = []
+    for store_id in pc.unique(store_ids).to_pylist():
+        mask = pc.is_null(store_ids) if store_id is None else pc.fill_null(pc.equal(store_ids, store_id), False)
+        store_table = sort_by_datetime(table.filter(mask).drop_columns(['store_id']))
+        store_dir = f'store_id={HIVE_NULL_PARTITION if store_id is None else store_id}'
+        os.makedirs(os.path.join(tmp_dir, store_dir), exist_ok=True)
+        write_transactions_file(store_table, os.path.join(tmp_dir, store_dir, 'part-0.parquet'),
+                                row_group_size, compression_level, dictionary_columns)
+        written.append(os.path.join(final_dir, store_dir, 'part-0.parquet'))
+
+    if os.path.exists(final_dir):
+        old_dir = os.path.join(parent_dir, f'.{day_dir}.{os.getpid()}.old')
+        os.replace(final_dir, old_dir)
+        os.replace(tmp_dir, final_dir)
+        shutil.rmtree(old_dir)
+    else:
+        os.replace(tmp_dir, final_dir)
+    return sorted(written)
+
+
+def normalized_files(output_dir, date_str):
+    """Header and line-item file paths of a day in the normalized layout"""
+    return (
+        os.path.join(output_dir, NORMALIZED_DIR, TRANSACTIONS_DIR, f'transactions_{date_str}.parquet'),
+        os.path.join(output_dir, NORMALIZED_DIR, TRANSACTION_ITEMS_DIR, f'transaction_items_{date_str}.parquet'),
+    )
+
+
+def write_normalized_transactions(headers_df, items_df, output_dir, date_str, row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                                  compression_level=DEFAULT_ZSTD_LEVEL, dictionary_columns=DICTIONARY_COLUMNS):
+    """Write a day as normalized/transactions (one row per transaction) and
+    normalized/transaction_items (one row per line item, keyed by transaction_id and line_number).
+
+    Headers are sorted by datetime and items by transaction id, so a day's
+    items for one transaction sit together. The items file is written first:
+    a day counts as present once its header file exists.
+    """
+    headers_path, items_path = normalized_files(output_dir, date_str)
+    for path in (headers_path, items_path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    items = pa.Table.from_pandas(items_df, preserve_index=False)
+    if items.num_rows:
+        items = items.take(pc.sort_indices(items, sort_keys=[('transaction_id', 'ascending'),
+                                                             ('line_number', 'ascending')]))
+    write_transactions_file(items, items_path, row_group_size, compression_level, dictionary_columns)
+
+    headers = sort_by_datetime(pa.Table.from_pandas(headers_df, preserve_index=False))
+    write_transactions_file(headers, headers_path, row_group_size, compression_level, dictionary_columns)
+    return [headers_path, items_path]
+
+
+def partition_values(path):
+    """key=value partition segments of a Hive-style path (the null partition maps to None)"""
+    values = {}
+    for segment in os.path.normpath(path).split(os.sep)[:-1]:
+        key, sep, value = segment.partition('=')
+        if sep:
+            values[key] = None if value == HIVE_NULL_PARTITION else value
+    return values
+
+
+def with_partition_columns(batch, path, columns=None):
+    """Add the partition values of path to a record batch as constant string columns"""
+    for key, value in partition_values(path).items():
+        if key in batch.schema.names or (columns is not None and key not in columns):
+            continue
+        batch = batch.append_column(key, pa.array([value] * batch.num_rows, pa.string()))
+    return batch
@@ -0,0 +1,157 @@
+import os
+import queue
+import shutil
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from parquet_layout import sort_by_datetime, write_transactions_file
+
+DEFAULT_BATCH_SIZE = 500  # transactions per part file
+DEFAULT_QUEUE_DEPTH = 2  # items a stage may have waiting before the stage feeding it blocks
+DEFAULT_UPLOAD_THREADS = 4
+# Parts over the threshold are sent as multipart uploads, several chunks at a time
+# (boto3 TransferConfig arguments; boto3 is only imported once an upload starts)
+TRANSFER_SETTINGS = {'multipart_threshold': 8 * 1024 * 1024, 'multipart_chunksize': 8 * 1024 * 1024,
+                     'max_concurrency': 4}
+
+
+def part_files_dir(output_dir, date_str):
+    """Directory of a day's part files in pipelined mode (transactions_{date}/part-NNNN.parquet)"""
+    return os.path.join(output_dir, f'transactions_{date_str}')
+
+
+def delete_prefix(s3, bucket, prefix):
+    """Delete every object under an S3 prefix, returning the number deleted"""
+    deleted = 0
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+        objects = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+        if objects:
+            s3.delete_objects(Bucket=bucket, Delete={'Objects': objects})
+            deleted += len(objects)
+    return deleted
+
+
+class _Stage:
+    """Worker threads draining a bounded queue; put() blocks while the queue is full.
+
+    After a failure the workers keep draining without handling items, so an
+    upstream stage never blocks on a dead one; the error is raised on the next
+    put() and on close().
+    """
+
+    _DONE = object()
+
+    def __init__(self, name, handler, threads=1, depth=DEFAULT_QUEUE_DEPTH):
+        self.handler = handler
+        self.queue = queue.Queue(maxsize=depth)
+        self.error = None
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        self._closed = False
+        self.threads = [threading.Thread(target=self._run, name=f'{name}-{i}', daemon=True) for i in range(threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is self._DONE:
+                return
+            if self.error is not None:
+                continue
+            started = time.perf_counter()
+            try:
+                self.handler(item)
+            except BaseException as exc:
+                self.error = self.error or exc
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - started
+
+    def put(self, item):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(item)
+
+    def close(self, raise_error=True):
+        if not self._closed:
+            self._closed = True
+            for _ in self.threads:
+                self.queue.put(self._DONE)
+            for thread in self.threads:
+                thread.join()
+        if raise_error and self.error is not None:
+            raise self.error
+
+
+def upload_transaction_parts(batches, to_dataframe, output_dir, date_str, bucket, key_prefix, s3=None,
+                             queue_depth=DEFAULT_QUEUE_DEPTH, upload_threads=DEFAULT_UPLOAD_THREADS,
+                             transfer_config=None):
+    """Write each batch of transactions as a part file and upload it while later batches are generated.
+
+    Generation runs in the calling thread, writing in one thread and uploads
+    in upload_threads threads, connected by queues of queue_depth items: a
+    slow upload stalls the writer and then the generator instead of piling
+    up batches in memory. Parts go to {key_prefix}/transactions_{date}/part-NNNN.parquet.
+    Returns the day's transactions and line-item DataFrame, plus the seconds
+    spent per stage and in total. transfer_config defaults to a boto3
+    TransferConfig built from TRANSFER_SETTINGS.
+    """
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+
+    s3 = s3 or boto3.client('s3')
+    transfer_config = transfer_config or TransferConfig(**TRANSFER_SETTINGS)
+    parts_dir = part_files_dir(output_dir, date_str)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir)
+
+    transactions, frames = [], []
+
+    def upload(item):
+        path, key = item
+        s3.upload_file(path, bucket, key, Config=transfer_config)
+
+    def write(item):
+        part, batch = item
+        transactions_df = to_dataframe(batch)
+        if transactions_df.empty:
+            return
+        path = os.path.join(parts_dir, f'part-{part:04d}.parquet')
+        write_transactions_file(sort_by_datetime(pa.Table.from_pandas(transactions_df, preserve_index=False)), path)
+        frames.append(transactions_df)
+        uploader.put((path, f'{key_prefix}/{os.path.relpath(path, output_dir).replace(os.sep, "/")}'))
+
+    started = time.perf_counter()
+    generate_seconds = 0.0
+    uploader = _Stage('upload', upload, upload_threads, queue_depth)
+    writer = _Stage('write', write, 1, queue_depth)
+    try:
+        batches = iter(batches)
+        part = 0
+        while True:
+            batch_started = time.perf_counter()
+            batch = next(batches, None)
+            generate_seconds += time.perf_counter() - batch_started
+            if batch is None:
+                break
+            transactions.extend(batch)
+            writer.put((part, batch))
+            part += 1
+        writer.close()
+        uploader.close()
+    except BaseException:
+        writer.close(raise_error=False)
+        uploader.close(raise_error=False)
+        raise
+
+    transactions_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    timings = {
+        'generate': generate_seconds,
+        'write': writer.busy_seconds,
+        'upload': uploader.busy_seconds,  # summed over the upload threads
+        'total': time.perf_counter() - started,
+    }
+    return transactions, transactions_df, timings
@@ -0,0 +1,201 @@
+import argparse
+import os
+from datetime import timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from atomic_io import LOCK_DIR, file_lock
+from compaction import transaction_files
+
+ROLLUP_DIR = 'rollups'
+DIMENSIONS = ['store_id', 'category', 'payment_method', 'status']
+METRICS = ['transactions', 'line_items', 'quantity', 'revenue']
+GRAINS = ('day', 'week', 'month')
+
+ROLLUP_SCHEMA = pa.schema([
+    ('period_start', pa.date32()),
+    ('store_id', pa.string()),
+    ('category', pa.string()),
+    ('payment_method', pa.string()),
+    ('status', pa.string()),
+    # Distinct transactions in the group; a transaction spans several categories,
+    # so this metric is not additive across categories
+    ('transactions', pa.int64()),
+    ('line_items', pa.int64()),
+    ('quantity', pa.int64()),
+    ('revenue', pa.float64()),
+])
+
+
+def period_start(date, grain):
+    """First day of the day/week (Monday)/month containing date"""
+    if grain == 'day':
+        return date
+    if grain == 'week':
+        return date - timedelta(days=date.weekday())
+    if grain == 'month':
+        return date.replace(day=1)
+    raise ValueError(f"Unknown grain '{grain}', expected one of {GRAINS}")
+
+
+def period_end(start, grain):
+    """Last day of the period starting at start"""
+    if grain == 'day':
+        return start
+    if grain == 'week':
+        return start + timedelta(days=6)
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def rollup_file(rollup_dir, grain, start):
+    return os.path.join(rollup_dir, grain, f"{grain}_{start.strftime('%Y-%m-%d')}.parquet")
+
+
+def build_daily_rollup(transactions_df, date):
+    """Aggregate a day's line items by store, category, payment method and status"""
+    df = transactions_df[['transaction_id', 'quantity', 'line_total'] + DIMENSIONS].copy()
+    df[DIMENSIONS] = df[DIMENSIONS].fillna('Unknown').astype(str)
+    # Negative quantities (returns) come with negative line totals, so both
+    # measures are net: units and revenue always move together
+    df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce')
+    df['line_total'] = pd.to_numeric(df['line_total'], errors='coerce')
+
+    rollup = df.groupby(DIMENSIONS, sort=True).agg(
+        transactions=('transaction_id', 'nunique'),
+        line_items=('transaction_id', 'size'),
+        quantity=('quantity', 'sum'),
+        revenue=('line_total', 'sum'),
+    ).reset_index()
+    rollup.insert(0, 'period_start', pd.Timestamp(date).date())
+    return rollup
+
+
+def _write(rollup, path):
+    """Write a rollup file atomically (temp file, then rename)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(rollup, schema=ROLLUP_SCHEMA, preserve_index=False)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+def _read(paths):
+    if not paths:
+        return pd.DataFrame(columns=ROLLUP_SCHEMA.names)
+    return pa.concat_tables([pq.read_table(path, schema=ROLLUP_SCHEMA) for path in paths]).to_pandas()
+
+
+def _daily_files(rollup_dir, start, end):
+    """Daily rollup files for the days in [start, end] that have been ingested"""
+    paths = []
+    day = start
+    while day <= end:
+        path = rollup_file(rollup_dir, 'day', day)
+        if os.path.exists(path):
+            paths.append(path)
+        day += timedelta(days=1)
+    return paths
+
+
+def _lock_path(rollup_dir, grain, start):
+    """Lock for one week or month rollup, in the .locks dir of the data dir holding the rollup store"""
+    data_dir = os.path.dirname(os.path.abspath(rollup_dir))
+    return os.path.join(data_dir, LOCK_DIR, f"rollup_{grain}_{start.strftime('%Y-%m-%d')}")
+
+
+def _rebuild(rollup_dir, grain, date):
+    """Recompute the week or month rollup containing date from its daily files.
+
+    The lock makes concurrent generators rebuild a period one at a time, so a
+    rebuild that missed another process's day can't overwrite one that saw it.
+    """
+    start = period_start(date, grain)
+    path = rollup_file(rollup_dir, grain, start)
+    with file_lock(_lock_path(rollup_dir, grain, start)):
+        daily = _read(_daily_files(rollup_dir, start, period_end(start, grain)))
+        rollup = daily.groupby(DIMENSIONS, sort=True)[METRICS].sum().reset_index()
+        rollup.insert(0, 'period_start', start)
+        _write(rollup, path)
+
+
+def ingest_daily_rollup(transactions_df, date, rollup_dir=os.path.join('retail_data_v2', ROLLUP_DIR)):
+    """Store a day's rollup and refresh the week and month rollups that contain it.
+
+    Daily files are only ever added (re-ingesting a day replaces its own file),
+    and a refresh reads at most a month of small daily files.
+    """
+    date = pd.Timestamp(date).date()
+    _write(build_daily_rollup(transactions_df, date), rollup_file(rollup_dir, 'day', date))
+    for grain in ('week', 'month'):
+        _rebuild(rollup_dir, grain, date)
+
+
+def _cover(start, end, grains):
+    """Greedily cover [start, end] with whole periods of the given grains (coarsest first)"""
+    plan = []
+    day = start
+    while day <= end:
+        for grain in grains:
+            if period_start(day, grain) == day and period_end(day, grain) <= end:
+                plan.append((grain, day))
+                day = period_end(day, grain) + timedelta(days=1)
+                break
+    return plan
+
+
+def _plan(start, end):
+    """Cover [start, end] with few rollup files: whole months, with the gaps around them in weeks and days"""
+    months = [(grain, day) for grain, day in _cover(start, end, ('month', 'day')) if grain == 'month']
+    plan = []
+    gap_start = start
+    for _, month_start in months:
+        plan.extend(_cover(gap_start, month_start - timedelta(days=1), ('week', 'day')))
+        plan.append(('month', month_start))
+        gap_start = period_end(month_start, 'month') + timedelta(days=1)
+    plan.extend(_cover(gap_start, end, ('week', 'day')))
+    return plan
+
+
+def query_rollup(start_date, end_date, dimensions=('category',), rollup_dir=os.path.join('retail_data_v2', ROLLUP_DIR)):
+    """Metrics for [start_date, end_date] grouped by the given dimensions, read from the rollup files"""
+    start = pd.Timestamp(start_date).date()
+    end = pd.Timestamp(end_date).date()
+    paths = [rollup_file(rollup_dir, grain, day) for grain, day in _plan(start, end)]
+    paths = [path for path in paths if os.path.exists(path)]
+    rollup = _read(paths)
+    if rollup.empty:
+        return pd.DataFrame(columns=list(dimensions) + METRICS)
+    return rollup.groupby(list(dimensions), sort=True)[METRICS].sum().reset_index()
+
+
+def backfill(data_dir='retail_data_v2', rollup_dir=None):
+    """Build the rollup store from the existing flat transaction files (daily or compacted)"""
+    rollup_dir = rollup_dir or os.path.join(data_dir, ROLLUP_DIR)
+    columns = ['transaction_id', 'quantity', 'line_total'] + DIMENSIONS
+    for path in transaction_files(data_dir):
+        df = pd.read_parquet(path, columns=columns)
+        # Compacted files hold whole days; a row's day is the date in its TXNYYYYMMDD id
+        days = pd.to_datetime(df['transaction_id'].str.replace(r'^(DUP)+', '', regex=True).str[3:11],
+                              format='%Y%m%d', errors='coerce')
+        for day, day_df in df.groupby(days):
+            ingest_daily_rollup(day_df, day, rollup_dir)
+        print(f"Ingested {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Query or backfill the daily/weekly/monthly rollup store')
+    parser.add_argument('--data-dir', default='retail_data_v2')
+    parser.add_argument('--backfill', action='store_true', help='Build rollups from existing transaction files')
+    parser.add_argument('--start', help='YYYY-MM-DD')
+    parser.add_argument('--end', help='YYYY-MM-DD')
+    parser.add_argument('--by', nargs='+', default=['category'], choices=DIMENSIONS)
+    args = parser.parse_args()
+
+    rollup_dir = os.path.join(args.data_dir, ROLLUP_DIR)
+    if args.backfill:
+        backfill(args.data_dir, rollup_dir)
+    if args.start and args.end:
+        print(query_rollup(args.start, args.end, args.by, rollup_dir).to_string(index=False))
@@ -0,0 +1,193 @@
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from master_index import ID_PREFIXES, encode_ids
+
+DEFAULT_PRECISION = 14  # 16384 registers, ~0.8% standard error
+SKETCH_COLUMNS = ('customer_id', 'product_id', 'cashier_id')
+
+
+def _hash_values(values):
+    """Stable 64-bit hashes of non-null values (pandas hash_array uses a fixed key)"""
+    values = pd.Series(values, dtype=object).dropna().astype(str).to_numpy(dtype=object)
+    return pd.util.hash_array(values)
+
+
+def _leading_zeros(words):
+    """Vectorized count of leading zero bits in uint64 words (64 for zero)"""
+    words = words.astype(np.uint64)
+    all_zero = words == 0
+    zeros = np.zeros(len(words), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        empty = (words >> np.uint64(64 - shift)) == 0
+        zeros[empty] += shift
+        words = np.where(empty, words << np.uint64(shift), words)
+    zeros[all_zero] = 64
+    return zeros
+
+
+class HyperLogLog:
+    """Mergeable HyperLogLog sketch for approximate distinct counts"""
+
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values):
+        """Add an iterable of values (nulls are ignored)"""
+        hashes = _hash_values(values)
+        if len(hashes) == 0:
+            return self
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # Rank of the first set bit after the index bits; the guard bit caps it at 64 - precision + 1
+        rest = (hashes << np.uint64(self.precision)) | np.uint64(1 << (self.precision - 1))
+        ranks = _leading_zeros(rest) + 1
+        np.maximum.at(self.registers, index, ranks)
+        return self
+
+    def merge(self, other):
+        """Union with another sketch of the same precision, in place"""
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog sketches with precision {self.precision} and {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        """Estimated number of distinct values"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and empty:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * np.log(m / empty)
+        return int(round(estimate))
+
+
+class IdBitmap:
+    """Exact set of integer-encoded IDs (PREFIX000123 -> bit 123) stored as a packed bitmap"""
+
+    def __init__(self, prefix, bits=None):
+        self.prefix = prefix
+        self.bits = bits if bits is not None else np.zeros(0, dtype=np.uint8)
+
+    def add(self, ids):
+        """Add IDs; values that don't match the prefix pattern are skipped and their count returned"""
+        codes = encode_ids(list(ids), self.prefix)
+        valid = codes[codes >= 0]
+        if len(valid):
+            dense = np.unpackbits(self.bits)
+            size = max(len(dense), int(valid.max()) + 1)
+            if size > len(dense):
+                dense = np.concatenate([dense, np.zeros(size - len(dense), dtype=np.uint8)])
+            dense[valid] = 1
+            self.bits = np.packbits(dense)
+        return int(np.count_nonzero(codes < 0))
+
+    def merge(self, other):
+        """Union with another bitmap, in place"""
+        if len(other.bits) > len(self.bits):
+            self.bits = np.concatenate([self.bits, np.zeros(len(other.bits) - len(self.bits), dtype=np.uint8)])
+        self.bits[:len(other.bits)] |= other.bits
+        return self
+
+    def count(self):
+        return int(np.unpackbits(self.bits).sum())
+
+
+def build_daily_sketches(transactions_df, columns=SKETCH_COLUMNS, precision=DEFAULT_PRECISION):
+    """Build a HyperLogLog sketch and, for prefixed ID columns, an exact bitmap per column"""
+    sketches = {}
+    for column in columns:
+        if column not in transactions_df.columns:
+            continue
+        values = transactions_df[column].dropna().unique()
+        sketches[column] = {'hll': HyperLogLog(precision).add(values)}
+        if column in ID_PREFIXES:
+            bitmap = IdBitmap(ID_PREFIXES[column])
+            sketches[column]['unencoded'] = bitmap.add(values)
+            sketches[column]['bitmap'] = bitmap
+    return sketches
+
+
+def sketch_file(output_dir, date_str):
+    return os.path.join(output_dir, f'daily_sketches_{date_str}.npz')
+
+
+def save_daily_sketches(sketches, output_dir, date_str):
+    """Write a day's sketches to daily_sketches_{date}.npz (written to a temp file, then renamed)"""
+    arrays = {}
+    for column, column_sketches in sketches.items():
+        arrays[f'{column}__hll'] = column_sketches['hll'].registers
+        if 'bitmap' in column_sketches:
+            arrays[f'{column}__bitmap'] = column_sketches['bitmap'].bits
+            arrays[f'{column}__unencoded'] = np.array(column_sketches['unencoded'])
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = sketch_file(output_dir, date_str)
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_daily_sketches(output_dir, date_str):
+    """Read the sketches saved for one day"""
+    sketches = {}
+    with np.load(sketch_file(output_dir, date_str)) as data:
+        for name in data.files:
+            column, kind = name.split('__')
+            column_sketches = sketches.setdefault(column, {})
+            if kind == 'hll':
+                registers = data[name]
+                column_sketches['hll'] = HyperLogLog(int(np.log2(len(registers))), registers)
+            elif kind == 'bitmap':
+                column_sketches['bitmap'] = IdBitmap(ID_PREFIXES[column], data[name])
+            else:
+                column_sketches[kind] = int(data[name])
+    return sketches
+
+
+def distinct_count(output_dir, start_date, end_date, column='customer_id', exact=True):
+    """Distinct values of a column over a date range, merged from the per-day sketches.
+
+    exact uses the bitmaps, which only cover IDs matching the column's prefix
+    (e.g. INVALID#### product IDs are left out); otherwise the HyperLogLog
+    estimate is returned. Days without a sketch file are skipped.
+    """
+    merged = None
+    days = 0
+    current = start_date
+    while current <= end_date:
+        date_str = current.strftime('%Y-%m-%d')
+        current += timedelta(days=1)
+        if not os.path.exists(sketch_file(output_dir, date_str)):
+            continue
+        column_sketches = load_daily_sketches(output_dir, date_str).get(column)
+        if column_sketches is None:
+            continue
+        sketch = column_sketches['bitmap' if exact else 'hll']
+        merged = sketch if merged is None else merged.merge(sketch)
+        days += 1
+
+    return {'column': column, 'days': days, 'exact': exact, 'distinct': merged.count() if merged else 0}
+
+
+if __name__ == "__main__":
+    # Usage: python sketches.py START END [--column customer_id] [--approximate]
+    parser = argparse.ArgumentParser(description='Distinct counts over a date range from the daily sketches')
+    parser.add_argument('start', help='YYYY-MM-DD')
+    parser.add_argument('end', help='YYYY-MM-DD')
+    parser.add_argument('--column', default='customer_id', choices=SKETCH_COLUMNS)
+    parser.add_argument('--approximate', action='store_true', help='Use the HyperLogLog sketches')
+    parser.add_argument('--output-dir', default='retail_data_v2')
+    args = parser.parse_args()
+
+    result = distinct_count(args.output_dir, datetime.strptime(args.start, '%Y-%m-%d'),
+                            datetime.strptime(args.end, '%Y-%m-%d'), args.column, not args.approximate)
+    kind = 'exact' if result['exact'] else 'approximate'
+    print(f"{result['distinct']:,} distinct {args.column} over {result['days']} days ({kind})")
@@ -0,0 +1,141 @@
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from compaction import file_day, load_manifest, transaction_files
+from parquet_layout import HIVE_NULL_PARTITION, PARTITION_COLUMN, TRANSACTIONS_DIR
+
+DEFAULT_BATCH_SIZE = 128 * 1024  # rows per streamed batch
+
+PARTITIONING = ds.HivePartitioning(
+    pa.schema([(PARTITION_COLUMN, pa.string()), ('store_id', pa.string())]),
+    null_fallback=HIVE_NULL_PARTITION,
+)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _id_day():
+    """Expression for the YYYYMMDD day embedded in TXNYYYYMMDD###### ids (DUP prefixes removed)"""
+    return pc.utf8_slice_codeunits(pc.replace_substring_regex(pc.field('transaction_id'), '^(DUP)+', ''), 3, 11)
+
+
+def _to_expression(filters):
+    """Accept a pyarrow Expression or pandas/pyarrow style DNF filters ([('store_id', '=', 'ST001')])"""
+    if filters is None or isinstance(filters, pc.Expression):
+        return filters
+    return pq.filters_to_expression(filters)
+
+
+def _flat_dataset(data_dir, start, end):
+    """Dataset over the flat files covering [start, end], with the row filter the compacted files need.
+
+    Daily files (and the part files of pipelined days) are picked by the date
+    in their path, so days outside the range are never opened. Compacted files
+    are picked by month and filtered on the day in the transaction id; the
+    date column is filtered as well so row groups outside the range are
+    skipped using their statistics.
+    """
+    compacted = {os.path.join(data_dir, path): entry['month']
+                 for entry in load_manifest(data_dir)['months'] for path in entry['files']}
+    first_month, last_month = start.strftime('%Y-%m'), end.strftime('%Y-%m')
+    files = []
+    for path in transaction_files(data_dir):
+        day = file_day(path)
+        if day:
+            if start <= _as_date(day) <= end:
+                files.append(path)
+        elif path in compacted and first_month <= compacted[path] <= last_month:
+            files.append(path)
+    if not files:
+        return None, None
+
+    schema = pa.unify_schemas([pq.read_schema(path) for path in files], promote_options='permissive')
+    row_filter = None
+    if any(path in compacted for path in files):
+        in_range = ((pc.field('date') >= pa.scalar(datetime.combine(start, datetime.min.time()), pa.timestamp('us')))
+                    & (pc.field('date') < pa.scalar(datetime.combine(end + timedelta(days=1), datetime.min.time()),
+                                                      pa.timestamp('us'))))
+        row_filter = ((in_range | pc.field('date').is_null())
+                      & (_id_day() >= start.strftime('%Y%m%d')) & (_id_day() <= end.strftime('%Y%m%d')))
+    return ds.dataset(files, schema=schema, format='parquet'), row_filter
+
+
+def _partitioned_dataset(data_dir, start, end):
+    """Dataset over the Hive-partitioned layout; days and stores outside the filter are pruned by path"""
+    root = os.path.join(data_dir, TRANSACTIONS_DIR)
+    if not os.path.isdir(root):
+        return None, None
+    dataset = ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+    row_filter = ((pc.field(PARTITION_COLUMN) >= start.strftime('%Y-%m-%d'))
+                  & (pc.field(PARTITION_COLUMN) <= end.strftime('%Y-%m-%d')))
+    return dataset, row_filter
+
+
+def transaction_dataset(start, end, data_dir='retail_data_v2', layout='flat'):
+    """The pyarrow dataset and day filter for [start, end] in the given layout ('flat' or 'partitioned')"""
+    start, end = _as_date(start), _as_date(end)
+    if layout == 'partitioned':
+        return _partitioned_dataset(data_dir, start, end)
+    if layout == 'flat':
+        return _flat_dataset(data_dir, start, end)
+    raise ValueError(f"Unknown layout '{layout}', expected 'flat' or 'partitioned'")
+
+
+def load_transactions(start, end, columns=None, filters=None, data_dir='retail_data_v2', layout='flat',
+                      stream=False, batch_size=DEFAULT_BATCH_SIZE, use_threads=True):
+    """Read the line items of [start, end] (inclusive) with column and predicate pushdown.
+
+    filters is a pyarrow Expression or DNF list such as [('store_id', '=', 'ST001')];
+    it is combined with the date range, so only the matching partitions, files
+    and row groups are read. Returns a DataFrame, or with stream=True an
+    iterator of record batches for ranges too large to hold in memory.
+    """
+    dataset, row_filter = transaction_dataset(start, end, data_dir, layout)
+    user_filter = _to_expression(filters)
+    if user_filter is not None:
+        row_filter = user_filter if row_filter is None else row_filter & user_filter
+
+    if dataset is None:
+        if stream:
+            return iter(())
+        return pd.DataFrame(columns=columns)
+
+    if stream:
+        return dataset.to_batches(columns=columns, filter=row_filter, batch_size=batch_size, use_threads=use_threads)
+    return dataset.to_table(columns=columns, filter=row_filter, use_threads=use_threads).to_pandas()
+
+
+if __name__ == "__main__":
+    # Usage: python transaction_dataset.py START END [--store ST001] [--columns ...]
+    parser = argparse.ArgumentParser(description='Read transactions for a date range with filter pushdown')
+    parser.add_argument('start', help='YYYY-MM-DD')
+    parser.add_argument('end', help='YYYY-MM-DD')
+    parser.add_argument('--data-dir', default='retail_data_v2')
+    parser.add_argument('--layout', default='flat', choices=['flat', 'partitioned'])
+    parser.add_argument('--store', help='Only this store_id')
+    parser.add_argument('--columns', nargs='*', default=['transaction_id', 'store_id', 'product_id', 'line_total'])
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    filters = [('store_id', '=', args.store)] if args.store else None
+    rows = 0
+    revenue = 0.0
+    for batch in load_transactions(args.start, args.end, args.columns, filters, args.data_dir, args.layout, stream=True):
+        rows += batch.num_rows
+        if 'line_total' in batch.schema.names:
+            revenue += pc.sum(batch.column('line_total')).as_py() or 0
+    print(f"{rows:,} line items, revenue {revenue:,.2f} ({time.perf_counter() - started:.2f}s)")
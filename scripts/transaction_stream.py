@@ -0,0 +1,232 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+
+from data_generator_2 import RetailDataGenerator
+
+
+class MicroBatchFileSink(ABC):
+    """Base class for sinks that rotate micro-batch files by event count or age.
+
+    Files are written under a temporary name and renamed when the batch is
+    closed, so downstream loaders only ever see complete files.
+    """
+
+    extension = None
+
+    def __init__(self, output_dir='stream_data', prefix='transactions', batch_events=1000, batch_seconds=10):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.batch_events = batch_events
+        self.batch_seconds = batch_seconds
+        self.buffer = []
+        self.batch_started = None
+        self.sequence = 0
+        self.files_written = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, txn):
+        """Add a transaction to the current batch, rotating when the batch is full or old"""
+        if self.batch_started is None:
+            self.batch_started = time.monotonic()
+        self.buffer.append(txn)
+        if (len(self.buffer) >= self.batch_events or
+                time.monotonic() - self.batch_started >= self.batch_seconds):
+            self.rotate()
+
+    def rotate(self):
+        """Close the current batch file"""
+        if not self.buffer:
+            return
+        path = os.path.join(self.output_dir, f'{self.prefix}_{self.sequence:06d}.{self.extension}')
+        tmp_path = f'{path}.inprogress'
+        self._write_batch(self.buffer, tmp_path)
+        os.replace(tmp_path, path)
+        self.files_written.append(path)
+        self.sequence += 1
+        self.buffer = []
+        self.batch_started = None
+
+    @abstractmethod
+    def _write_batch(self, transactions, path):
+        """Write one batch of transactions to path"""
+
+    def close(self):
+        """Flush the last partial batch"""
+        self.rotate()
+
+
+class NDJSONSink(MicroBatchFileSink):
+    """Rotating NDJSON micro-batch files with nested line items."""
+
+    extension = 'ndjson'
+
+    def _write_batch(self, transactions, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for txn in transactions:
+                f.write(json.dumps(txn, default=str))
+                f.write('\n')
+
+
+class ParquetSink(MicroBatchFileSink):
+    """Rotating Parquet micro-batch files, flattened to one row per line item like the daily files."""
+
+    extension = 'parquet'
+
+    def __init__(self, generator, **kwargs):
+        super().__init__(**kwargs)
+        self.generator = generator
+
+    def _write_batch(self, transactions, path):
+        self.generator.transactions_to_dataframe(transactions).to_parquet(path, index=False)
+
+
+class QueueSink:
+    """Push transactions onto a local queue; a full bounded queue blocks the replay (back-pressure)."""
+
+    def __init__(self, target_queue=None, maxsize=10000):
+        self.queue = target_queue if target_queue is not None else queue.Queue(maxsize=maxsize)
+        self.files_written = []
+
+    def write(self, txn):
+        self.queue.put(txn)
+
+    def close(self):
+        """Signal the end of the stream to consumers"""
+        self.queue.put(None)
+
+
+def consume_queue(source_queue, handle=None):
+    """Drain a QueueSink's queue until the end of the stream, returning the number of events consumed"""
+    consumed = 0
+    while True:
+        txn = source_queue.get()
+        if txn is None:
+            return consumed
+        if handle is not None:
+            handle(txn)
+        consumed += 1
+
+
+class SocketSink:
+    """Send transactions as NDJSON lines over a local TCP socket."""
+
+    def __init__(self, host='localhost', port=9999):
+        self.connection = socket.create_connection((host, port))
+        self.files_written = []
+
+    def write(self, txn):
+        self.connection.sendall((json.dumps(txn, default=str) + '\n').encode('utf-8'))
+
+    def close(self):
+        self.connection.close()
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def stream_transactions(generator, date, sink, events_per_second=None):
+    """Replay a day's transactions into a sink and report throughput and lag metrics.
+
+    Pacing lag is how far each event was emitted behind its scheduled time at
+    the requested rate. Late events are transactions whose recorded timestamp
+    falls after the replayed day (delayed, batched or future-dated records).
+    """
+    day_end = date + timedelta(days=1)
+    pacing_lags = []
+    late_events = 0
+    max_lateness = 0.0
+    events = 0
+
+    started = None
+    for txn in generator.replay_daily_transactions(date, events_per_second):
+        emitted = time.perf_counter()
+        if started is None:
+            # The day is generated before the first event, so the clock starts here
+            started = emitted
+        if events_per_second:
+            pacing_lags.append(max(0.0, emitted - (started + events / events_per_second)))
+        if txn['datetime']:
+            lateness = (datetime.strptime(txn['datetime'], '%Y-%m-%d %H:%M:%S') - day_end).total_seconds()
+            if lateness >= 0:
+                late_events += 1
+                max_lateness = max(max_lateness, lateness)
+        sink.write(txn)
+        events += 1
+    sink.close()
+    elapsed = time.perf_counter() - started if started is not None else 0.0
+
+    metrics = {
+        'date': date.strftime('%Y-%m-%d'),
+        'events': events,
+        'seconds': round(elapsed, 3),
+        'target_events_per_second': events_per_second,
+        'events_per_second': round(events / elapsed, 1) if elapsed > 0 else None,
+        'pacing_lag_ms_avg': round(1000 * sum(pacing_lags) / len(pacing_lags), 3) if pacing_lags else 0.0,
+        'pacing_lag_ms_p99': round(1000 * _percentile(pacing_lags, 99), 3),
+        'pacing_lag_ms_max': round(1000 * max(pacing_lags, default=0.0), 3),
+        'late_events': late_events,
+        'max_event_lateness_seconds': max_lateness,
+        'files_written': len(sink.files_written),
+    }
+
+    print(f"Streamed {events} transactions for {metrics['date']} in {metrics['seconds']}s "
+          f"({metrics['events_per_second']} events/s)")
+    print(f"Pacing lag: avg {metrics['pacing_lag_ms_avg']} ms, p99 {metrics['pacing_lag_ms_p99']} ms, "
+          f"max {metrics['pacing_lag_ms_max']} ms")
+    print(f"Late events: {late_events} (max {max_lateness / 3600:.1f} h after the day closed)")
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a day's retail transactions as a time-ordered stream")
+    parser.add_argument('date', help="Day to replay (YYYY-MM-DD)")
+    parser.add_argument('--rate', type=float, default=None, help="Events per second (default: unthrottled)")
+    parser.add_argument('--sink', choices=['ndjson', 'parquet', 'queue', 'socket'], default='ndjson')
+    parser.add_argument('--output-dir', default='stream_data')
+    parser.add_argument('--batch-events', type=int, default=1000)
+    parser.add_argument('--batch-seconds', type=float, default=10)
+    parser.add_argument('--queue-size', type=int, default=10000,
+                        help="Bound of the in-process queue drained by a consumer thread (queue sink)")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9999)
+    args = parser.parse_args()
+
+    replay_date = datetime.strptime(args.date, '%Y-%m-%d')
+    generator = RetailDataGenerator(add_noise=True)
+    batch_options = {
+        'output_dir': args.output_dir,
+        'prefix': f"transactions_{args.date}",
+        'batch_events': args.batch_events,
+        'batch_seconds': args.batch_seconds,
+    }
+    if args.sink == 'ndjson':
+        output_sink = NDJSONSink(**batch_options)
+    elif args.sink == 'parquet':
+        output_sink = ParquetSink(generator, **batch_options)
+    elif args.sink == 'queue':
+        output_sink = QueueSink(maxsize=args.queue_size)
+    else:
+        output_sink = SocketSink(args.host, args.port)
+
+    consumer, consumed = None, []
+    if args.sink == 'queue':
+        consumer = threading.Thread(target=lambda: consumed.append(consume_queue(output_sink.queue)), daemon=True)
+        consumer.start()
+
+    result = stream_transactions(generator, replay_date, output_sink, args.rate)
+    if consumer is not None:
+        consumer.join()
+        result['events_consumed'] = consumed[0]
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The DAG modules and scripts import their siblings by bare name, as Airflow and `python scripts/...` do
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(ROOT, 'dags'), os.path.join(ROOT, 'scripts')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,211 @@
+import json
+import multiprocessing
+import os
+from datetime import date, datetime
+
+import boto3
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from moto import mock_aws
+
+import compaction
+
+TODAY = date(2025, 3, 15)
+BUCKET = 'compaction-test'
+
+
+def _write_day(data_dir, date_str, rows=3):
+    df = pd.DataFrame({
+        'transaction_id': [f'{date_str}-{i}' for i in range(rows)],
+        'datetime': [f'{date_str}T{10 + i:02d}:00:00' for i in range(rows)],
+        'total_amount': [float(i) for i in range(rows)],
+    })
+    df.to_parquet(os.path.join(data_dir, f'transactions_{date_str}.parquet'), index=False)
+    with open(os.path.join(data_dir, f'daily_summary_{date_str}.json'), 'w', encoding='utf-8') as f:
+        json.dump({'date': date_str, 'total_transactions': rows}, f)
+
+
+def _compact(args):
+    data_dir, month = args
+    compaction.compact_month(data_dir, month, today=TODAY)
+
+
+def test_compact_month_switches_readers_to_compacted_files(tmp_path):
+    data_dir = str(tmp_path)
+    for day in ('2025-01-01', '2025-01-02', '2025-02-01'):
+        _write_day(data_dir, day)
+
+    entry = compaction.compact_month(data_dir, '2025-01', today=TODAY)
+
+    assert entry['rows'] == 6
+    assert entry['daily_files'] == ['transactions_2025-01-01.parquet', 'transactions_2025-01-02.parquet']
+    files = compaction.transaction_files(data_dir)
+    assert [os.path.relpath(path, data_dir) for path in files] == sorted(
+        entry['files'] + ['transactions_2025-02-01.parquet'])
+    assert sum(pq.read_metadata(path).num_rows for path in files) == 9
+    assert compaction.load_manifest(data_dir)['version'] == 1
+    assert not [name for name in os.listdir(data_dir) if name.endswith('.tmp')]
+
+
+def test_concurrent_compactions_keep_every_month(tmp_path):
+    data_dir = str(tmp_path)
+    months = ['2024-10', '2024-11', '2024-12', '2025-01']
+    for month in months:
+        _write_day(data_dir, f'{month}-01')
+
+    with multiprocessing.get_context('spawn').Pool(len(months)) as pool:
+        pool.map(_compact, [(data_dir, month) for month in months])
+
+    manifest = compaction.load_manifest(data_dir)
+    assert [entry['month'] for entry in manifest['months']] == months
+    assert manifest['version'] == len(months)
+
+
+def test_pruned_days_are_not_generated_again(tmp_path):
+    from data_generator_2 import RetailDataGenerator
+
+    data_dir = str(tmp_path)
+    _write_day(data_dir, '2025-01-01')
+    compaction.compact_month(data_dir, '2025-01', today=TODAY, prune=True)
+
+    assert not os.path.exists(os.path.join(data_dir, 'transactions_2025-01-01.parquet'))
+    assert os.path.exists(os.path.join(data_dir, 'daily_summary_2025-01-01.json'))
+    assert compaction.is_compacted(data_dir, '2025-01-01')
+    assert not compaction.is_compacted(data_dir, '2025-01-02')
+
+    # The day is found in the compacted files before any generator state is needed
+    generator = RetailDataGenerator.__new__(RetailDataGenerator)
+    assert generator.generate_and_save_daily_data(datetime(2025, 1, 1), data_dir) == []
+    assert not os.path.exists(os.path.join(data_dir, 'transactions_2025-01-01.parquet'))
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for key, value in {'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+                       'AWS_DEFAULT_REGION': 'us-east-1'}.items():
+        monkeypatch.setenv(key, value)
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def _upload_day(s3, tmp_path, date_str):
+    day_dir = tmp_path / date_str
+    day_dir.mkdir()
+    _write_day(str(day_dir), date_str)
+    for name in os.listdir(day_dir):
+        s3.upload_file(str(day_dir / name), BUCKET, f'{compaction.S3_PREFIX}/{date_str}/{name}')
+
+
+def _keys(s3):
+    return sorted(obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET).get('Contents', []))
+
+
+def test_compact_s3_month(s3, tmp_path):
+    for day in ('2025-01-01', '2025-01-02', '2025-02-01'):
+        _upload_day(s3, tmp_path, day)
+    assert compaction.closed_s3_months(BUCKET, s3=s3, today=TODAY) == ['2025-01', '2025-02']
+
+    entry = compaction.compact_s3_month(BUCKET, '2025-01', s3=s3, prune=True, today=TODAY)
+
+    prefix = compaction.S3_PREFIX
+    manifest = json.loads(s3.get_object(Bucket=BUCKET, Key=f'{prefix}/{compaction.MANIFEST_FILE}')['Body'].read())
+    assert [e['month'] for e in manifest['months']] == ['2025-01']
+    assert entry['rows'] == 6
+    keys = _keys(s3)
+    for path in entry['files'] + [entry['daily_summaries']]:
+        assert f'{prefix}/{path}' in keys
+    # Pruned: the daily transaction objects are gone, the summaries and other months stay
+    assert f'{prefix}/2025-01-01/transactions_2025-01-01.parquet' not in keys
+    assert f'{prefix}/2025-01-01/daily_summary_2025-01-01.json' in keys
+    assert f'{prefix}/2025-02-01/transactions_2025-02-01.parquet' in keys
+    assert compaction.closed_s3_months(BUCKET, s3=s3, today=TODAY) == ['2025-02']
+    assert compaction.compact_s3_month(BUCKET, '2025-01', s3=s3, today=TODAY) is None
+
+
+def test_compact_s3_month_fails_when_the_manifest_changes(s3, tmp_path, monkeypatch):
+    _upload_day(s3, tmp_path, '2025-01-01')
+    _upload_day(s3, tmp_path, '2025-02-01')
+    compact_month = compaction.compact_month
+
+    def compact_month_racing_another_compaction(*args, **kwargs):
+        monkeypatch.setattr(compaction, 'compact_month', compact_month)
+        compaction.compact_s3_month(BUCKET, '2025-02', s3=s3, today=TODAY)
+        return compact_month(*args, **kwargs)
+
+    monkeypatch.setattr(compaction, 'compact_month', compact_month_racing_another_compaction)
+    with pytest.raises(RuntimeError, match='changed while 2025-01 was compacted'):
+        compaction.compact_s3_month(BUCKET, '2025-01', s3=s3, today=TODAY)
+
+    manifest = json.loads(s3.get_object(Bucket=BUCKET, Key=f'{compaction.S3_PREFIX}/{compaction.MANIFEST_FILE}')['Body'].read())
+    assert [e['month'] for e in manifest['months']] == ['2025-02']
+    assert not [key for key in _keys(s3) if '/compacted/2025-01/' in key]
+
+
+def _write_parts(data_dir, date_str, parts=2, complete=True):
+    parts_dir = os.path.join(data_dir, f'transactions_{date_str}')
+    os.makedirs(parts_dir)
+    for part in range(parts):
+        _write_day(parts_dir, date_str)
+        os.replace(os.path.join(parts_dir, f'transactions_{date_str}.parquet'),
+                   os.path.join(parts_dir, f'part-{part:04d}.parquet'))
+        os.remove(os.path.join(parts_dir, f'daily_summary_{date_str}.json'))
+    if complete:
+        with open(os.path.join(data_dir, f'daily_summary_{date_str}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'date': date_str}, f)
+
+
+def test_pipelined_days_are_read_once_complete(tmp_path):
+    data_dir = str(tmp_path)
+    _write_day(data_dir, '2025-01-01')
+    _write_parts(data_dir, '2025-01-02')
+    _write_parts(data_dir, '2025-01-03', complete=False)
+
+    files = [os.path.relpath(path, data_dir) for path in compaction.transaction_files(data_dir)]
+    assert files == ['transactions_2025-01-01.parquet',
+                     os.path.join('transactions_2025-01-02', 'part-0000.parquet'),
+                     os.path.join('transactions_2025-01-02', 'part-0001.parquet')]
+    assert compaction.closed_months(data_dir, TODAY) == ['2025-01']
+    assert compaction.file_day(compaction.transaction_files(data_dir)[-1]) == '2025-01-02'
+
+    entry = compaction.compact_month(data_dir, '2025-01', today=TODAY, prune=True)
+    assert entry['rows'] == 9
+    assert entry['daily_files'] == ['transactions_2025-01-01.parquet', 'transactions_2025-01-02/part-0000.parquet',
+                                    'transactions_2025-01-02/part-0001.parquet']
+    assert compaction.is_compacted(data_dir, '2025-01-02')
+    assert not os.path.exists(os.path.join(data_dir, 'transactions_2025-01-02'))
+    # The incomplete day was neither compacted nor pruned
+    assert not compaction.is_compacted(data_dir, '2025-01-03')
+    assert len(os.listdir(os.path.join(data_dir, 'transactions_2025-01-03'))) == 2
+
+
+def test_flat_dataset_reads_part_files(tmp_path):
+    import transaction_dataset
+
+    data_dir = str(tmp_path)
+    _write_day(data_dir, '2025-01-01')
+    _write_parts(data_dir, '2025-01-02')
+    dataset, row_filter = transaction_dataset.transaction_dataset('2025-01-02', '2025-01-02', data_dir)
+    assert dataset.count_rows(filter=row_filter) == 6
+
+
+def test_compact_s3_month_with_pipelined_days(s3, tmp_path):
+    prefix = compaction.S3_PREFIX
+    _upload_day(s3, tmp_path, '2025-01-01')
+    for date_str, complete in (('2025-01-02', True), ('2025-01-03', False)):
+        _write_parts(str(tmp_path), date_str, complete=complete)
+        for part in range(2):
+            name = f'transactions_{date_str}/part-{part:04d}.parquet'
+            s3.upload_file(str(tmp_path / name), BUCKET, f'{prefix}/{date_str}/{name}')
+        if complete:
+            s3.upload_file(str(tmp_path / f'daily_summary_{date_str}.json'), BUCKET,
+                           f'{prefix}/{date_str}/daily_summary_{date_str}.json')
+
+    entry = compaction.compact_s3_month(BUCKET, '2025-01', s3=s3, prune=True, today=TODAY)
+
+    assert entry['rows'] == 9
+    keys = _keys(s3)
+    assert f'{prefix}/2025-01-02/transactions_2025-01-02/part-0000.parquet' not in keys
+    assert f'{prefix}/2025-01-03/transactions_2025-01-03/part-0000.parquet' in keys
@@ -0,0 +1,108 @@
+import textwrap
+
+import pandas as pd
+import pytest
+
+from data_validation import load_column_rules, validate_data
+
+SCHEMA = textwrap.dedent("""
+    version: 2
+
+    models:
+      - name: stg_customers
+        tests:
+          - column_rules:
+              name: stg_customers_column_rules
+              key_column: customer_id
+              rules:
+                customer_id: [not_null, unique]
+                email: [not_null]
+                loyalty_member:
+                  - accepted_values: [true, false]
+              row_count: {min_value: 1, max_value: 10}
+
+      - name: stg_retail_transactions
+        tests:
+          - column_rules:
+              name: stg_retail_transactions_column_rules
+              key_column: transaction_id
+              rules:
+                transaction_id: [not_null]
+                transaction_partition_date: [not_null]
+                transaction_datetime: [not_null]
+                customer_id:
+                  - relationships: {to: ref('stg_customers'), field: customer_id}
+                payment_method:
+                  - accepted_values: ['cash', 'credit_card']
+                quantity:
+                  - between: {min_value: 1, max_value: 100}
+              row_count: {min_value: 100, max_value: 1000}
+""")
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    pd.DataFrame({
+        'customer_id': ['CUST000001', 'CUST000002', 'CUST000002', 'CUST000003'],
+        'email': ['a@example.com', None, 'b@example.com', 'c@example.com'],
+        'loyalty_member': [True, False, True, None],
+    }).to_parquet(tmp_path / 'customers.parquet', index=False)
+
+    pd.DataFrame({
+        'transaction_id': ['TXN20250101000001', 'TXN20250101000002', 'DUPTXN20250101000002', 'TXNBROKEN'],
+        'datetime': pd.to_datetime(['2025-01-01 10:00', None, '2025-01-01 10:20', '2025-01-01 11:00']),
+        'customer_id': ['CUST000001', 'CUST000009', 'CUST000002', None],
+        'payment_method': ['cash', 'Cash', None, 'credit_card'],
+        'quantity': [1, -2, 3, 101],
+    }).to_parquet(tmp_path / 'transactions_2025-01-01.parquet', index=False)
+
+    schema_file = tmp_path / 'schema.yml'
+    schema_file.write_text(SCHEMA, encoding='utf-8')
+    return tmp_path
+
+
+def _failures(report):
+    return {model['model']: {(f['column_name'], f['rule_name']): (f['failures'], f['first_failing_key'],
+                                                                   f['last_failing_key'])
+                             for f in model['failures']}
+            for model in report['models']}
+
+
+@pytest.mark.parametrize('batch_size', [1, 1024])
+def test_failing_column_rules(data_dir, batch_size):
+    report = validate_data(str(data_dir), str(data_dir / 'schema.yml'), workers=1, batch_size=batch_size)
+
+    assert not report['passed']
+    assert _failures(report) == {
+        'stg_customers': {
+            ('customer_id', 'unique'): (2, 'CUST000002', 'CUST000002'),
+            ('email', 'not_null'): (1, 'CUST000002', 'CUST000002'),
+        },
+        'stg_retail_transactions': {
+            ('transaction_partition_date', 'not_null'): (1, 'TXNBROKEN', 'TXNBROKEN'),
+            ('transaction_datetime', 'not_null'): (1, 'TXN20250101000002', 'TXN20250101000002'),
+            ('customer_id', 'relationships'): (1, 'TXN20250101000002', 'TXN20250101000002'),
+            ('payment_method', 'accepted_values'): (1, 'TXN20250101000002', 'TXN20250101000002'),
+            ('quantity', 'between'): (2, 'TXN20250101000002', 'TXNBROKEN'),
+            (None, 'row_count'): (4, None, None),
+        },
+    }
+
+
+def test_passing_model(data_dir):
+    report = validate_data(str(data_dir), str(data_dir / 'schema.yml'), models=['stg_customers'], workers=1)
+    assert report['models'][0]['rows'] == 4
+
+    pd.DataFrame({
+        'customer_id': ['CUST000001', 'CUST000002'],
+        'email': ['a@example.com', 'b@example.com'],
+        'loyalty_member': [True, None],
+    }).to_parquet(data_dir / 'customers.parquet', index=False)
+    report = validate_data(str(data_dir), str(data_dir / 'schema.yml'), models=['stg_customers'], workers=1)
+    assert report['passed'] and report['models'][0]['failures'] == []
+
+
+def test_repo_schema_rules_load():
+    specs = load_column_rules()
+    assert {'stg_customers', 'stg_retail_transactions'} <= set(specs)
+    assert specs['stg_retail_transactions']['key_column'] == 'transaction_id'
@@ -0,0 +1,71 @@
+"""The deferred EC2 waits of the upload DAGs, run against a moto server.
+
+mock_aws does not patch aiobotocore, which the triggers use, so the DAG's own
+sensors are deferred and their triggers polled against moto's standalone
+server instead. Skipped unless Airflow's amazon provider, aiobotocore and
+moto[server] are installed.
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiobotocore')
+pytest.importorskip('airflow.providers.amazon.aws.sensors.ec2')
+server = pytest.importorskip('moto.server')
+
+import boto3  # noqa: E402
+from airflow.exceptions import TaskDeferred  # noqa: E402
+
+import retail_tasks  # noqa: E402
+import upload_to_s3  # noqa: E402
+import upload_to_s3_windowed  # noqa: E402
+
+
+@pytest.fixture
+def moto_server(monkeypatch):
+    moto = server.ThreadedMotoServer(port=0, verbose=False)
+    moto.start()
+    host, port = moto.get_host_and_port()
+    for key, value in {'AWS_ENDPOINT_URL': f'http://{host}:{port}', 'AWS_ACCESS_KEY_ID': 'testing',
+                       'AWS_SECRET_ACCESS_KEY': 'testing', 'AWS_DEFAULT_REGION': retail_tasks.REGION,
+                       'AIRFLOW_CONN_AWS_DEFAULT': 'aws://'}.items():
+        monkeypatch.setenv(key, value)
+    yield
+    moto.stop()
+
+
+@pytest.fixture
+def instance_id(moto_server):
+    ec2 = boto3.client('ec2', region_name=retail_tasks.REGION)
+    image_id = ec2.describe_images()['Images'][0]['ImageId']
+    return ec2.run_instances(ImageId=image_id, MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
+
+
+def _first_event(trigger):
+    async def run():
+        async for event in trigger.run():
+            return event.payload
+    return asyncio.run(asyncio.wait_for(run(), timeout=30))
+
+
+def _deferred_trigger(dag, task_id, instance_id):
+    sensor = dag.get_task(task_id)
+    sensor.instance_id = instance_id
+    sensor.poke_interval = 1
+    with pytest.raises(TaskDeferred) as deferred:
+        sensor.execute(context={})
+    return deferred.value.trigger
+
+
+def test_sensors_defer_and_fire_on_target_state(instance_id):
+    ec2 = boto3.client('ec2', region_name=retail_tasks.REGION)
+
+    assert retail_tasks.stop_instance(instance_id, ec2=ec2, wait=False) == 'instance stopping'
+    trigger = _deferred_trigger(upload_to_s3_windowed.dag, 'wait_for_ec2_stopped', instance_id)
+    assert (trigger.target_state, trigger.region_name) == ('stopped', retail_tasks.REGION)
+    assert _first_event(trigger)['status'] == 'success'
+
+    assert retail_tasks.start_instance(instance_id, ec2=ec2, wait=False) == 'instance starting'
+    trigger = _deferred_trigger(upload_to_s3.dag, 'wait_for_ec2_running', instance_id)
+    assert trigger.target_state == 'running'
+    assert _first_event(trigger)['status'] == 'success'
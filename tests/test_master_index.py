@@ -0,0 +1,118 @@
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import compaction
+from master_index import (CUSTOMER_PREFIX, MAX_CUSTOMER_CODE, BloomFilter, CustomerIdIndex, ForeignKeyIndex,
+                          check_referential_integrity, decode_customer_id, encode_customer_ids)
+
+
+@pytest.mark.parametrize('max_code', [1200, 950000, MAX_CUSTOMER_CODE - 1])
+def test_orphans_keep_the_id_width_and_never_match(max_code):
+    codes = np.array([1, 2, max_code], dtype=np.int32)
+    index = CustomerIdIndex(codes, orphan_rate=1.0)
+
+    ids = index.sample(500) + [index.sample_one() for _ in range(100)]
+    assert all(len(customer_id) == len(CUSTOMER_PREFIX) + 6 for customer_id in ids)
+    decoded = encode_customer_ids(ids)
+    assert (decoded > max_code).all() and (decoded <= MAX_CUSTOMER_CODE).all()
+
+
+def test_no_room_for_orphans():
+    codes = np.array([1, MAX_CUSTOMER_CODE], dtype=np.int32)
+    with pytest.raises(ValueError):
+        CustomerIdIndex(codes, orphan_rate=0.05)
+    assert len(CustomerIdIndex(codes, orphan_rate=0).sample(10)) == 10
+
+
+def test_sampled_ids_round_trip():
+    codes = np.array([7, 42, 123456], dtype=np.int32)
+    index = CustomerIdIndex(codes, orphan_rate=0)
+    assert set(index.sample(200)) <= {decode_customer_id(code) for code in codes}
+    assert decode_customer_id(42) == 'CUST000042'
+
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    members = np.arange(0, 200000, 2, dtype=np.int64)
+    bloom = BloomFilter(len(members), fp_rate=0.01)
+    bloom.add(members)
+
+    assert bloom.might_contain(members).all()
+    false_positive_rate = bloom.might_contain(members + 1).mean()
+    assert false_positive_rate <= 2 * bloom.fp_rate
+
+
+def test_bloom_index_keeps_every_member():
+    keys = [decode_customer_id(code) for code in range(1, 5001)] + ['GUEST-1']
+    index = ForeignKeyIndex(keys, CUSTOMER_PREFIX, bloom_fp_rate=0.01)
+    assert not index.exact
+    assert not index.orphans(keys).any()
+
+
+def _write_master_data(data_dir):
+    pd.DataFrame({'customer_id': ['CUST000001', 'CUST000002']}).to_parquet(data_dir / 'customers.parquet')
+    pd.DataFrame({'product_id': ['PRD00001', 'PRD00002']}).to_parquet(data_dir / 'products.parquet')
+    pd.DataFrame({'store_id': ['ST001']}).to_parquet(data_dir / 'stores.parquet')
+
+
+def _transactions(day, customers, products):
+    stamp = day.replace('-', '')
+    return pd.DataFrame({
+        'transaction_id': [f'TXN{stamp}{i:06d}' for i in range(len(customers))],
+        'customer_id': customers,
+        'product_id': products,
+        'store_id': 'ST001',
+    })
+
+
+def _write_summary(data_dir, day):
+    (data_dir / f'daily_summary_{day}.json').write_text(json.dumps({'date': day}))
+
+
+def test_orphans_in_flat_files(tmp_path):
+    _write_master_data(tmp_path)
+    _transactions('2025-01-01', ['CUST000001', 'CUST999999', None], ['PRD00001', 'PRD00002', 'INVALID8655']) \
+        .to_parquet(tmp_path / 'transactions_2025-01-01.parquet')
+    _write_summary(tmp_path, '2025-01-01')
+
+    report = check_referential_integrity(str(tmp_path), workers=1)
+
+    assert report['files'] == 1 and report['rows'] == 3
+    assert report['per_column'] == {'customer_id': 1, 'product_id': 1, 'store_id': 0}
+    assert report['per_day']['2025-01-01'] == {'rows': 3, 'customer_id': 1, 'product_id': 1, 'store_id': 0}
+
+
+def test_orphans_in_pipelined_part_files(tmp_path):
+    _write_master_data(tmp_path)
+    parts_dir = tmp_path / 'transactions_2025-01-02'
+    parts_dir.mkdir()
+    _transactions('2025-01-02', ['CUST000003'], ['PRD00001']).to_parquet(parts_dir / 'part-0000.parquet')
+    _transactions('2025-01-02', ['CUST000001'], ['INVALID1000']).to_parquet(parts_dir / 'part-0001.parquet')
+
+    # Parts of a day without its summary are still being written
+    assert check_referential_integrity(str(tmp_path), workers=1)['files'] == 0
+
+    _write_summary(tmp_path, '2025-01-02')
+    report = check_referential_integrity(str(tmp_path), workers=1)
+    assert report['files'] == 2 and report['rows'] == 2
+    assert report['per_column'] == {'customer_id': 1, 'product_id': 1, 'store_id': 0}
+
+
+def test_orphans_in_compacted_files(tmp_path):
+    _write_master_data(tmp_path)
+    for day, customer in (('2025-01-01', 'CUST000001'), ('2025-01-02', 'CUST000042')):
+        _transactions(day, [customer], ['PRD00002']).to_parquet(tmp_path / f'transactions_{day}.parquet')
+        _write_summary(tmp_path, day)
+    compaction.compact_month(str(tmp_path), '2025-01', today=date(2025, 3, 1))
+    compaction.prune_month(str(tmp_path), '2025-01')
+
+    report = check_referential_integrity(str(tmp_path), workers=1)
+
+    assert report['files'] == 1 and report['rows'] == 2
+    assert report['per_day'] == {
+        '2025-01-01': {'rows': 1, 'customer_id': 0, 'product_id': 0, 'store_id': 0},
+        '2025-01-02': {'rows': 1, 'customer_id': 1, 'product_id': 0, 'store_id': 0},
+    }
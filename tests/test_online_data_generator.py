@@ -0,0 +1,113 @@
+import json
+import os
+import re
+from datetime import datetime
+
+import pyarrow.parquet as pq
+import pytest
+
+import online_data_generator as odg
+
+
+def test_offset_days():
+    assert odg._offset_days('+30d') == 30
+    assert odg._offset_days('+7d') == 7
+    for offset in ('30d', '+d', '+30', '-30d', 'd30+'):
+        with pytest.raises(ValueError):
+            odg._offset_days(offset)
+
+
+def test_future_timestamps_stay_within_the_offset():
+    day = datetime(2025, 1, 1)
+    for _ in range(50):
+        timestamp = odg._event_timestamp(day, '-90d', '+7d', True)
+        assert datetime(2025, 1, 1, 23, 59, 59) <= timestamp <= datetime(2025, 1, 8, 23, 59, 59)
+
+
+@pytest.mark.parametrize('batched_chats', [False, True])
+def test_daily_partitions_write_complete_files_only(tmp_path, batched_chats):
+    output_dir = str(tmp_path)
+    generated = odg.generate_daily_partitions(datetime(2025, 1, 1), datetime(2025, 1, 2), 'both', batched_chats,
+                                              output_dir)
+    assert len(generated) == 2 * len(odg.SOURCE_FILES)
+    assert not [name for name in os.listdir(output_dir) if name.endswith('.tmp')]
+    for source in odg.SOURCE_FILES:
+        assert all(os.path.exists(path) for path in odg._partition_files(source, datetime(2025, 1, 2), 'both', output_dir))
+
+    assert odg.generate_daily_partitions(datetime(2025, 1, 1), datetime(2025, 1, 2), 'both', batched_chats,
+                                         output_dir) == []
+
+
+def test_interrupted_write_leaves_no_partition_file(tmp_path, monkeypatch):
+    def failing_batch(*args, **kwargs):
+        raise RuntimeError('interrupted')
+
+    monkeypatch.setattr(odg, '_build_chat_batch', failing_batch)
+    with pytest.raises(RuntimeError):
+        odg.generate_chat_transcripts_batched(10, 'both', output_dir=str(tmp_path), partition_date=datetime(2025, 1, 1))
+    assert os.listdir(tmp_path) == []
+
+
+def test_generators_create_a_missing_output_dir(tmp_path):
+    day = datetime(2025, 1, 1)
+    odg.generate_google_analytics_data(20, 'both', output_dir=str(tmp_path / 'ga'), partition_date=day)
+    odg.generate_customer_service_data(5, 5, 'both', output_dir=str(tmp_path / 'cs'), partition_date=day)
+    odg.generate_chat_transcripts_batched(5, 'both', output_dir=str(tmp_path / 'chats'), partition_date=day)
+    odg.generate_social_media_data(20, 'both', output_dir=str(tmp_path / 'social'), partition_date=day)
+
+    assert sorted(os.listdir(tmp_path)) == ['chats', 'cs', 'ga', 'social']
+    assert all(os.listdir(tmp_path / name) for name in os.listdir(tmp_path))
+
+
+def _chat_fields(chats):
+    """Key order of the JSONL chats and messages, and the value types seen under each key"""
+    messages = [message for chat in chats for message in chat['messages']]
+    key_orders = {tuple(record) for record in chats + messages}
+    types = {}
+    for record in chats + messages:
+        for key, value in record.items():
+            if key != 'messages':
+                types.setdefault(key, set()).add(type(value).__name__)
+    return key_orders, types
+
+
+def _check_chat(chat, day):
+    assert re.fullmatch(r'chat_[0-9a-f]{10}', chat['chat_id'])
+    assert chat['chat_start'].startswith(day)
+    assert chat['duration_minutes'] is None or 5 <= chat['duration_minutes'] <= 60
+    assert chat['satisfaction_score'] is None or 1 <= chat['satisfaction_score'] <= 5
+    assert 2 <= len(chat['messages']) <= 20
+    for message in chat['messages']:
+        assert message['sender'] in ('customer', 'agent')
+        assert datetime.strptime(message['timestamp'], '%Y-%m-%d %H:%M:%S') >= datetime.strptime(
+            chat['chat_start'], '%Y-%m-%d %H:%M:%S')
+
+
+def test_batched_chats_match_the_per_chat_generator(tmp_path):
+    day = datetime(2025, 1, 1)
+    num_chats = 300
+    per_chat_dir, batched_dir = tmp_path / 'per_chat', tmp_path / 'batched'
+    _, chats = odg.generate_customer_service_data(5, num_chats, 'both', output_dir=str(per_chat_dir),
+                                                  partition_date=day)
+    assert odg.generate_chat_transcripts_batched(num_chats, 'both', batch_size=64, output_dir=str(batched_dir),
+                                                 partition_date=day) == num_chats
+
+    outputs = {}
+    for name, output_dir in (('per_chat', per_chat_dir), ('batched', batched_dir)):
+        with open(output_dir / 'customer_service_chats_2025-01-01.jsonl', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        table = pq.read_table(output_dir / 'customer_service_chats_2025-01-01.parquet')
+        assert len(records) == table.num_rows == num_chats
+        assert table.schema.names == odg.CHAT_TRANSCRIPT_SCHEMA.names
+        for chat in records:
+            _check_chat(chat, '2025-01-01')
+        outputs[name] = records, table.schema
+    assert outputs['per_chat'][0] == chats
+    assert outputs['batched'][1].equals(outputs['per_chat'][1])
+
+    # Same keys in the same order, with no value types the per-chat generator doesn't write
+    batched_orders, batched_types = _chat_fields(outputs['batched'][0])
+    per_chat_orders, per_chat_types = _chat_fields(outputs['per_chat'][0])
+    assert batched_orders == per_chat_orders
+    assert batched_types.keys() == per_chat_types.keys()
+    assert all(batched_types[key] <= per_chat_types[key] for key in batched_types)
@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from online_data_reader import read_tolerant_json
+
+# Chunk sizes from a few bytes (every record straddles a boundary) to one chunk for the whole file
+CHUNK_SIZES = [7, 64, 333, 1024 * 1024]
+
+
+def _record(i):
+    return {'id': i, 'name': f"O'Brien {i}", 'note': 'n\xa0b', 'tags': ['a', None], 'flag': i % 2 == 0,
+            'meta': {'score': i / 2, 'items': [{'sku': f'SKU{i}'}]}}
+
+
+def _malformed(record):
+    """The generator's malformed form: a Python repr with single quotes swapped for double quotes"""
+    return str(record).replace("'", '"')
+
+
+def _jsonl(ids, malformed_ids=()):
+    return ''.join((_malformed(_record(i)) if i in malformed_ids else json.dumps(_record(i))) + '\n' for i in ids)
+
+
+def _array(ids, malformed_ids=()):
+    """A JSON array written like social_media_sample.json, malformed records on one indented line"""
+    parts = [f'  {_malformed(_record(i))}' if i in malformed_ids else json.dumps(_record(i), indent=2)
+             for i in ids]
+    return '[\n' + ',\n'.join(parts) + '\n]\n'
+
+
+def _read(path, chunk_size):
+    records, stats = read_tolerant_json(str(path), workers=1, chunk_size=chunk_size)
+    return sorted(record['id'] for record in records), stats
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_repaired_records_round_trip(tmp_path, chunk_size):
+    path = tmp_path / 'tickets.json'
+    path.write_text(_jsonl(range(40), malformed_ids={3, 17, 39}), encoding='utf-8')
+
+    ids, stats = _read(path, chunk_size)
+
+    assert ids == list(range(40))
+    assert (stats['format'], stats['repaired'], stats['quarantined']) == ('jsonl', 3, 0)
+    records, _ = read_tolerant_json(str(path), workers=1, chunk_size=chunk_size)
+    assert {record['id']: record for record in records}[17] == _record(17)
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_truncated_jsonl_quarantines_the_cut_record(tmp_path, chunk_size):
+    path = tmp_path / 'tickets.json'
+    text = _jsonl(range(20), malformed_ids={5})
+    path.write_text(text[:-40], encoding='utf-8')
+
+    ids, stats = _read(path, chunk_size)
+
+    assert ids == list(range(19))
+    assert (stats['repaired'], stats['quarantined']) == (1, 1)
+    quarantined = [json.loads(line) for line in open(stats['quarantine_path'], encoding='utf-8')]
+    assert quarantined[0]['offset'] == text.index('{"id": 19')
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_truncated_array_quarantines_the_cut_record(tmp_path, chunk_size):
+    path = tmp_path / 'social.json'
+    text = _array(range(15), malformed_ids={0, 8})
+    path.write_text(text[:text.rindex('"score"')], encoding='utf-8')
+
+    ids, stats = _read(path, chunk_size)
+
+    assert ids == list(range(14))
+    assert (stats['format'], stats['repaired'], stats['quarantined']) == ('array', 2, 1)
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_concatenated_files(tmp_path, chunk_size):
+    jsonl_path = tmp_path / 'tickets.json'
+    jsonl_path.write_text(_jsonl(range(10), {2}) + _jsonl(range(10, 20), {11, 19}), encoding='utf-8')
+    array_path = tmp_path / 'social.json'
+    array_path.write_text(_array(range(10), {9}) + _array(range(10, 20), {10}), encoding='utf-8')
+
+    for path, repaired in ((jsonl_path, 3), (array_path, 2)):
+        ids, stats = _read(path, chunk_size)
+        assert ids == list(range(20))
+        assert (stats['repaired'], stats['quarantined']) == (repaired, 0)
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_truncated_file_followed_by_another(tmp_path, chunk_size):
+    jsonl_path = tmp_path / 'tickets.json'
+    jsonl_path.write_text(_jsonl(range(5), {1})[:-30] + _jsonl(range(10, 15), {10, 12}), encoding='utf-8')
+    array = _array(range(5), {1})
+    array_path = tmp_path / 'social.json'
+    array_path.write_text(array[:array.rindex('"score"')] + _array(range(10, 15), {12}), encoding='utf-8')
+
+    for path, repaired in ((jsonl_path, 3), (array_path, 2)):
+        ids, stats = _read(path, chunk_size)
+        assert ids == [0, 1, 2, 3, 10, 11, 12, 13, 14]
+        assert (stats['repaired'], stats['quarantined']) == (repaired, 1)
+
+
+@pytest.mark.parametrize('chunk_size', CHUNK_SIZES)
+def test_records_run_together_on_one_line(tmp_path, chunk_size):
+    path = tmp_path / 'tickets.json'
+    path.write_text(_jsonl(range(3)).rstrip('\n') + _jsonl(range(3, 6), {3}), encoding='utf-8')
+
+    ids, stats = _read(path, chunk_size)
+
+    assert ids == list(range(6))
+    assert (stats['repaired'], stats['quarantined']) == (1, 0)
+
+
+def test_parallel_chunks_match_a_single_chunk(tmp_path):
+    path = tmp_path / 'social.json'
+    path.write_text(_array(range(300), malformed_ids=set(range(0, 300, 7))), encoding='utf-8')
+
+    single, single_stats = read_tolerant_json(str(path), workers=1, chunk_size=1024 * 1024)
+    parallel, parallel_stats = read_tolerant_json(str(path), workers=4, chunk_size=4096)
+
+    assert parallel_stats['chunks'] > 4
+    assert parallel == single
+    assert (parallel_stats['records'], parallel_stats['repaired']) == (300, 43)
+    assert single_stats['repaired'] == 43
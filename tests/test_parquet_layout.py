@@ -0,0 +1,99 @@
+import glob
+import os
+from datetime import datetime
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from parquet_layout import write_flat_transactions, write_partitioned_transactions
+from transaction_dataset import load_transactions
+
+DAYS = ['2025-01-01', '2025-01-02', '2025-01-03']
+STORES = ['ST001', 'ST002', None]
+ROWS_PER_STORE = 40
+
+
+def _day(date_str):
+    """ROWS_PER_STORE line items per store, in reverse time order so the writer has to sort them"""
+    rows = []
+    for store_number, store_id in enumerate(STORES):
+        for i in range(ROWS_PER_STORE):
+            number = store_number * ROWS_PER_STORE + i
+            rows.append({
+                'transaction_id': f"TXN{date_str.replace('-', '')}{number:06d}",
+                'datetime': datetime.strptime(date_str, '%Y-%m-%d').replace(hour=23 - i % 24, minute=i),
+                'date': datetime.strptime(date_str, '%Y-%m-%d'),
+                'store_id': store_id,
+                'product_id': f'PRD{i % 5:05d}',
+                'payment_method': 'cash',
+                'line_total': 1.0,
+            })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture(params=['flat', 'partitioned'])
+def layout_dir(request, tmp_path):
+    for date_str in DAYS:
+        if request.param == 'flat':
+            write_flat_transactions(_day(date_str), str(tmp_path / f'transactions_{date_str}.parquet'))
+            (tmp_path / f'daily_summary_{date_str}.json').write_text('{}')
+        else:
+            write_partitioned_transactions(_day(date_str), str(tmp_path), date_str)
+    return request.param, str(tmp_path)
+
+
+def test_round_trip_with_filters(layout_dir):
+    layout, data_dir = layout_dir
+
+    everything = load_transactions(DAYS[0], DAYS[-1], data_dir=data_dir, layout=layout)
+    assert len(everything) == len(DAYS) * len(STORES) * ROWS_PER_STORE
+    assert set(everything['transaction_id']) == set(pd.concat([_day(day) for day in DAYS])['transaction_id'])
+
+    one_store = load_transactions(DAYS[0], DAYS[-1], ['transaction_id', 'store_id'], [('store_id', '=', 'ST002')],
+                                  data_dir=data_dir, layout=layout)
+    assert len(one_store) == len(DAYS) * ROWS_PER_STORE
+    assert set(one_store['store_id']) == {'ST002'}
+
+    one_day = load_transactions(DAYS[1], DAYS[1], ['transaction_id'], data_dir=data_dir, layout=layout)
+    assert len(one_day) == len(STORES) * ROWS_PER_STORE
+    assert one_day['transaction_id'].str.startswith('TXN20250102').all()
+
+    batches = list(load_transactions(DAYS[1], DAYS[-1], ['transaction_id'], [('store_id', '=', 'ST001')],
+                                     data_dir=data_dir, layout=layout, stream=True, batch_size=16))
+    assert sum(batch.num_rows for batch in batches) == 2 * ROWS_PER_STORE
+    assert len(batches) > 1
+
+
+def test_partitioned_layout_paths_and_file_settings(tmp_path):
+    written = write_partitioned_transactions(_day(DAYS[0]), str(tmp_path), DAYS[0])
+
+    partition = os.path.join(str(tmp_path), 'transactions', f'transaction_date={DAYS[0]}')
+    assert written == sorted(os.path.join(partition, f'store_id={store}', 'part-0.parquet')
+                             for store in ('ST001', 'ST002', '__HIVE_DEFAULT_PARTITION__'))
+    assert not glob.glob(os.path.join(str(tmp_path), 'transactions', '.*'))
+
+    parquet_file = pq.ParquetFile(written[0])
+    assert 'store_id' not in parquet_file.schema_arrow.names
+    times = parquet_file.read(columns=['datetime']).column('datetime').to_pylist()
+    assert times == sorted(times)
+
+    row_group = parquet_file.metadata.row_group(0)
+    columns = {row_group.column(i).path_in_schema: row_group.column(i) for i in range(row_group.num_columns)}
+    assert {column.compression for column in columns.values()} == {'ZSTD'}
+    assert all(column.statistics is not None and column.statistics.has_min_max for column in columns.values())
+    assert all(column.has_column_index for column in columns.values())
+    # Only the listed low-cardinality columns are dictionary encoded
+    assert 'RLE_DICTIONARY' in columns['product_id'].encodings
+    assert 'RLE_DICTIONARY' in columns['payment_method'].encodings
+    assert 'RLE_DICTIONARY' not in columns['transaction_id'].encodings
+    assert 'RLE_DICTIONARY' not in columns['line_total'].encodings
+
+
+def test_row_group_size(tmp_path):
+    path = str(tmp_path / 'transactions_2025-01-01.parquet')
+    write_flat_transactions(_day(DAYS[0]), path, row_group_size=50)
+
+    metadata = pq.read_metadata(path)
+    assert metadata.num_rows == len(STORES) * ROWS_PER_STORE
+    assert [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)] == [50, 50, 20]
@@ -0,0 +1,67 @@
+import os
+
+import boto3
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from moto import mock_aws
+
+from pipelined_upload import delete_prefix, part_files_dir, upload_transaction_parts
+
+BUCKET = 'pipelined-test'
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for key, value in {'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+                       'AWS_DEFAULT_REGION': 'us-east-1'}.items():
+        monkeypatch.setenv(key, value)
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def _keys(s3):
+    return sorted(obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET).get('Contents', []))
+
+
+def _to_dataframe(batch):
+    return pd.DataFrame({'transaction_id': [txn['transaction_id'] for txn in batch],
+                         'datetime': [txn['datetime'] for txn in batch]})
+
+
+def test_parts_are_written_and_uploaded_in_order(s3, tmp_path):
+    batches = [[{'transaction_id': f'T{b}{i}', 'datetime': f'2025-01-01 1{b}:0{i}:00'} for i in range(3)]
+               for b in range(4)]
+    transactions, transactions_df, timings = upload_transaction_parts(
+        iter(batches), _to_dataframe, str(tmp_path), '2025-01-01', BUCKET, 'raw/transactions/2025-01-01', s3,
+        upload_threads=2)
+
+    assert len(transactions) == 12
+    assert list(transactions_df['transaction_id']) == [txn['transaction_id'] for txn in transactions]
+    parts_dir = part_files_dir(str(tmp_path), '2025-01-01')
+    assert sorted(os.listdir(parts_dir)) == [f'part-{i:04d}.parquet' for i in range(4)]
+    assert pq.read_table(os.path.join(parts_dir, 'part-0002.parquet')).column('transaction_id').to_pylist() == [
+        'T20', 'T21', 'T22']
+    assert _keys(s3) == [f'raw/transactions/2025-01-01/transactions_2025-01-01/part-{i:04d}.parquet' for i in range(4)]
+    assert set(timings) == {'generate', 'write', 'upload', 'total'}
+
+
+def test_upload_failure_is_raised(s3, tmp_path):
+    batches = [[{'transaction_id': 'T1', 'datetime': '2025-01-01 10:00:00'}]]
+    with pytest.raises(Exception):
+        upload_transaction_parts(iter(batches), _to_dataframe, str(tmp_path), '2025-01-01', 'missing-bucket',
+                                 'raw', s3)
+
+
+def test_delete_prefix_only_removes_the_day(s3):
+    for key in ('raw/transactions/2025-01-01/transactions_2025-01-01/part-0000.parquet',
+                'raw/transactions/2025-01-01/transactions_2025-01-01/part-0007.parquet',
+                'raw/transactions/2025-01-01/daily_summary_2025-01-01.json',
+                'raw/transactions/2025-01-02/daily_summary_2025-01-02.json'):
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b'x')
+
+    assert delete_prefix(s3, BUCKET, 'raw/transactions/2025-01-01/') == 3
+    assert _keys(s3) == ['raw/transactions/2025-01-02/daily_summary_2025-01-02.json']
+    assert delete_prefix(s3, BUCKET, 'raw/transactions/2025-01-01/') == 0
@@ -0,0 +1,147 @@
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+
+import retail_tasks
+
+REGION = retail_tasks.REGION
+BUCKET = 'retail-tasks-test'
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    for key, value in {'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+                       'AWS_DEFAULT_REGION': REGION}.items():
+        monkeypatch.setenv(key, value)
+    with mock_aws():
+        yield
+
+
+@pytest.fixture
+def ec2(aws):
+    return boto3.client('ec2', region_name=REGION)
+
+
+@pytest.fixture
+def instance_id(ec2):
+    image_id = ec2.describe_images()['Images'][0]['ImageId']
+    return ec2.run_instances(ImageId=image_id, MinCount=1, MaxCount=1)['Instances'][0]['InstanceId']
+
+
+@pytest.fixture
+def s3(aws):
+    client = boto3.client('s3', region_name=REGION)
+    client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={'LocationConstraint': REGION})
+    return client
+
+
+def _state(ec2, instance_id):
+    return ec2.describe_instances(InstanceIds=[instance_id])['Reservations'][0]['Instances'][0]['State']['Name']
+
+
+def _keys(s3):
+    return sorted(obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET).get('Contents', []))
+
+
+def test_window_dates_full_window():
+    assert retail_tasks.window_dates('2025-01-01T00:00:00+00:00', '2025-01-08T00:00:00+00:00') == [
+        '2025-01-01', '2025-01-02', '2025-01-03', '2025-01-04', '2025-01-05', '2025-01-06', '2025-01-07']
+
+
+def test_window_dates_crosses_month_and_year_end():
+    assert retail_tasks.window_dates('2024-12-30', '2025-01-02') == ['2024-12-30', '2024-12-31', '2025-01-01']
+    assert retail_tasks.window_dates('2024-02-27', '2024-03-01') == ['2024-02-27', '2024-02-28', '2024-02-29']
+
+
+def test_window_dates_partial_and_empty_windows():
+    assert retail_tasks.window_dates('2025-01-30', '2025-02-01') == ['2025-01-30', '2025-01-31']
+    assert retail_tasks.window_dates('2025-01-01', '2025-01-01') == []
+    assert retail_tasks.window_dates('2025-01-02', '2025-01-01') == []
+
+
+def test_start_and_stop_instance_wait_for_state(ec2, instance_id):
+    assert retail_tasks.stop_instance(instance_id, ec2=ec2) == 'instance_stopped'
+    assert _state(ec2, instance_id) == 'stopped'
+    assert retail_tasks.start_instance(instance_id, ec2=ec2) == 'instance running'
+    assert _state(ec2, instance_id) == 'running'
+
+
+def test_start_and_stop_instance_without_waiting(ec2, instance_id):
+    # The DAGs only send the request and leave the wait to a deferrable sensor
+    assert retail_tasks.stop_instance(instance_id, ec2=ec2, wait=False) == 'instance stopping'
+    assert _state(ec2, instance_id) in ('stopping', 'stopped')
+    assert retail_tasks.start_instance(instance_id, ec2=ec2, wait=False) == 'instance starting'
+    assert _state(ec2, instance_id) in ('pending', 'running')
+
+
+
+def test_instance_stops_only_when_the_last_run_releases_it(ec2, instance_id):
+    retail_tasks.stop_instance(instance_id, ec2=ec2)
+    assert retail_tasks.acquire_instance('scheduled__2025-01-01T00:00:00+00:00', instance_id, ec2=ec2)
+    assert retail_tasks.acquire_instance('scheduled__2025-01-02T00:00:00+00:00', instance_id, ec2=ec2)
+    assert _state(ec2, instance_id) == 'running'
+
+    assert retail_tasks.release_instance('scheduled__2025-01-01T00:00:00+00:00', instance_id, ec2=ec2) is False
+    assert _state(ec2, instance_id) == 'running'
+    assert retail_tasks.release_instance('scheduled__2025-01-02T00:00:00+00:00', instance_id, ec2=ec2) is True
+    assert _state(ec2, instance_id) == 'stopped'
+    assert retail_tasks._run_tags(ec2, instance_id) == []
+
+
+def test_acquire_waits_out_a_stop_in_progress(ec2, instance_id):
+    retail_tasks.stop_instance(instance_id, ec2=ec2, wait=False)
+    assert retail_tasks.acquire_instance('manual__1', instance_id, ec2=ec2) == 'instance running'
+    assert _state(ec2, instance_id) == 'running'
+
+
+def _touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x')
+
+
+def test_upload_to_s3_maps_run_files_to_keys(s3, tmp_path):
+    master_dir, run_dir = tmp_path / 'master', tmp_path / 'run'
+    for name in ('customers.parquet', 'products.parquet', 'stores.parquet'):
+        _touch(str(master_dir / name))
+    _touch(str(run_dir / 'transactions_2025-01-02.parquet'))
+    _touch(str(run_dir / 'daily_summary_2025-01-02.json'))
+    _touch(str(run_dir / 'transactions_2025-01-01.parquet'))  # another day: not uploaded
+    _touch(str(run_dir / '.locks' / 'daily_2025-01-02.lock'))
+    _touch(str(run_dir / 'transactions' / 'transaction_date=2025-01-02' / 'store_id=ST001' / 'part-0.parquet'))
+    _touch(str(run_dir / 'normalized' / 'transaction_items' / 'transaction_items_2025-01-02.parquet'))
+
+    retail_tasks.upload_to_s3(str(run_dir), BUCKET, '2025-01-02', master_dir=str(master_dir), s3=s3)
+
+    assert _keys(s3) == [
+        'data/raw/normalized/transaction_items/2025-01-02/transaction_items_2025-01-02.parquet',
+        'data/raw/static/customers.parquet',
+        'data/raw/static/products.parquet',
+        'data/raw/static/stores.parquet',
+        'data/raw/transactions/2025-01-02/daily_summary_2025-01-02.json',
+        'data/raw/transactions/2025-01-02/transactions_2025-01-02.parquet',
+        'data/raw/transactions/transaction_date=2025-01-02/store_id=ST001/part-0.parquet',
+    ]
+
+
+def test_upload_to_s3_can_leave_master_data_to_the_window(s3, tmp_path):
+    master_dir, run_dir = tmp_path / 'master', tmp_path / 'run'
+    _touch(str(master_dir / 'customers.parquet'))
+    _touch(str(run_dir / 'transactions_2025-01-02.parquet'))
+
+    retail_tasks.upload_to_s3(str(run_dir), BUCKET, '2025-01-02', master_dir=str(master_dir), s3=s3,
+                              include_master_data=False)
+    assert _keys(s3) == ['data/raw/transactions/2025-01-02/transactions_2025-01-02.parquet']
+
+    retail_tasks.upload_master_data(BUCKET, str(master_dir), s3)
+    assert 'data/raw/static/customers.parquet' in _keys(s3)
+
+
+def test_cleanup_run_dir(tmp_path):
+    run_dir = tmp_path / 'run'
+    _touch(str(run_dir / 'transactions_2025-01-02.parquet'))
+    retail_tasks.cleanup_run_dir(str(run_dir))
+    assert not run_dir.exists()
+    retail_tasks.cleanup_run_dir(str(run_dir))  # already gone
@@ -0,0 +1,41 @@
+import os
+from datetime import date
+
+import pandas as pd
+
+import rollup_store
+
+
+def _day(rows):
+    """Line items: (transaction_id, quantity, line_total), all in one store, category, payment and status"""
+    return pd.DataFrame({
+        'transaction_id': [row[0] for row in rows],
+        'quantity': [row[1] for row in rows],
+        'line_total': [row[2] for row in rows],
+        'store_id': 'ST001',
+        'category': 'Grocery',
+        'payment_method': 'cash',
+        'status': 'completed',
+    })
+
+
+def test_negative_quantities_net_against_units_and_revenue():
+    df = _day([('TXN1', 3, 30.0), ('TXN2', -2, -20.0)])
+
+    rollup = rollup_store.build_daily_rollup(df, date(2025, 1, 6))
+
+    assert rollup[['transactions', 'line_items', 'quantity', 'revenue']].to_dict('records') == [
+        {'transactions': 2, 'line_items': 2, 'quantity': 1, 'revenue': 10.0}]
+
+
+def test_week_and_month_rollups_sum_the_days_and_lock_outside_the_store(tmp_path):
+    rollup_dir = str(tmp_path / rollup_store.ROLLUP_DIR)
+    rollup_store.ingest_daily_rollup(_day([('TXN1', 2, 20.0)]), date(2025, 1, 6), rollup_dir)
+    rollup_store.ingest_daily_rollup(_day([('TXN2', -1, -10.0)]), date(2025, 1, 7), rollup_dir)
+
+    week = rollup_store.query_rollup('2025-01-06', '2025-01-12', rollup_dir=rollup_dir)
+    assert week[['quantity', 'revenue']].to_dict('records') == [{'quantity': 1, 'revenue': 10.0}]
+
+    for grain in rollup_store.GRAINS:
+        assert all(name.endswith('.parquet') for name in os.listdir(os.path.join(rollup_dir, grain)))
+    assert sorted(os.listdir(tmp_path / '.locks')) == ['rollup_month_2025-01-01.lock', 'rollup_week_2025-01-06.lock']
@@ -0,0 +1,11 @@
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def test_scripts_imports_as_a_package_without_boto3():
+    # A fresh interpreter, so the sys.path entries added by conftest don't hide a missing one
+    code = ("import sys; import scripts, scripts.transaction_stream, scripts.compaction; "
+            "assert scripts.RetailDataGenerator; assert 'boto3' not in sys.modules")
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sketches import (DEFAULT_PRECISION, HyperLogLog, IdBitmap, build_daily_sketches, distinct_count,
+                      load_daily_sketches, save_daily_sketches)
+
+
+def _day(customer_codes):
+    return pd.DataFrame({'customer_id': [f'CUST{code:06d}' for code in customer_codes] + ['GUEST', None]})
+
+
+def test_merged_days_equal_the_sketch_of_their_union():
+    monday = _day(range(0, 6000))
+    tuesday = _day(range(4000, 9000))
+
+    merged = build_daily_sketches(monday)['customer_id']
+    other = build_daily_sketches(tuesday)['customer_id']
+    merged['hll'].merge(other['hll'])
+    merged['bitmap'].merge(other['bitmap'])
+    union = build_daily_sketches(pd.concat([monday, tuesday]))['customer_id']
+
+    assert np.array_equal(merged['hll'].registers, union['hll'].registers)
+    assert np.array_equal(merged['bitmap'].bits, union['bitmap'].bits)
+    assert merged['bitmap'].count() == 9000
+
+
+@pytest.mark.parametrize('cardinality', [1000, 50000, 300000])
+def test_hll_error_within_bound(cardinality):
+    sketch = HyperLogLog().add(f'CUST{i}' for i in range(cardinality))
+
+    standard_error = 1.04 / np.sqrt(1 << DEFAULT_PRECISION)
+    assert abs(sketch.count() - cardinality) <= 3 * standard_error * cardinality
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(12).merge(HyperLogLog(14))
+
+
+def test_sketches_round_trip_through_save_and_load(tmp_path):
+    sketches = build_daily_sketches(_day([1, 5, 70000]))
+    save_daily_sketches(sketches, str(tmp_path), '2025-01-01')
+    save_daily_sketches(build_daily_sketches(_day([5, 9])), str(tmp_path), '2025-01-02')
+
+    loaded = load_daily_sketches(str(tmp_path), '2025-01-01')['customer_id']
+
+    assert np.array_equal(loaded['bitmap'].bits, sketches['customer_id']['bitmap'].bits)
+    assert loaded['bitmap'].count() == 3 and loaded['unencoded'] == 1
+    assert np.array_equal(loaded['hll'].registers, sketches['customer_id']['hll'].registers)
+    assert loaded['hll'].precision == DEFAULT_PRECISION
+    result = distinct_count(str(tmp_path), datetime(2025, 1, 1), datetime(2025, 1, 3))
+    assert (result['days'], result['distinct']) == (2, 4)
+
+
+def test_bitmap_skips_ids_without_the_prefix():
+    bitmap = IdBitmap('PRD')
+    assert bitmap.add(['PRD00003', 'INVALID8655', 'PRD00010']) == 1
+    assert bitmap.count() == 2
@@ -0,0 +1,109 @@
+import json
+import os
+import random
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import transaction_stream
+from data_generator_2 import RetailDataGenerator
+from transaction_stream import (MicroBatchFileSink, NDJSONSink, ParquetSink, QueueSink, consume_queue,
+                                stream_transactions)
+
+DAY = datetime(2025, 1, 1)
+
+
+def _txn(i, timestamp='2025-01-01 10:00:00'):
+    return {'transaction_id': f'TXN{i:04d}', 'datetime': timestamp, 'items': [{'product_id': 'P1', 'quantity': 1}]}
+
+
+def _read_ndjson(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line)['transaction_id'] for line in f]
+
+
+class _ListGenerator:
+    def __init__(self, transactions):
+        self.transactions = transactions
+
+    def replay_daily_transactions(self, date, events_per_second=None):
+        yield from self.transactions
+
+
+class _FrameGenerator:
+    def transactions_to_dataframe(self, transactions):
+        return pd.DataFrame({'transaction_id': [txn['transaction_id'] for txn in transactions]})
+
+
+def test_file_sink_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        MicroBatchFileSink(output_dir=str(tmp_path))
+
+
+def test_batches_rotate_by_event_count_and_close_flushes(tmp_path):
+    sink = NDJSONSink(output_dir=str(tmp_path), prefix='t', batch_events=3, batch_seconds=3600)
+    for i in range(7):
+        sink.write(_txn(i))
+    assert [os.path.basename(path) for path in sink.files_written] == ['t_000000.ndjson', 't_000001.ndjson']
+    assert len(sink.buffer) == 1
+
+    sink.close()
+    assert [_read_ndjson(path) for path in sink.files_written] == [
+        ['TXN0000', 'TXN0001', 'TXN0002'], ['TXN0003', 'TXN0004', 'TXN0005'], ['TXN0006']]
+    assert sorted(os.listdir(tmp_path)) == ['t_000000.ndjson', 't_000001.ndjson', 't_000002.ndjson']
+
+    sink.close()  # nothing left to flush
+    assert len(sink.files_written) == 3
+
+
+def test_batches_rotate_by_age(tmp_path, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(transaction_stream.time, 'monotonic', lambda: clock[0])
+    sink = NDJSONSink(output_dir=str(tmp_path), prefix='t', batch_events=1000, batch_seconds=10)
+    sink.write(_txn(0))
+    clock[0] += 5
+    sink.write(_txn(1))
+    assert sink.files_written == []
+    clock[0] += 5
+    sink.write(_txn(2))
+    assert [_read_ndjson(path) for path in sink.files_written] == [['TXN0000', 'TXN0001', 'TXN0002']]
+
+
+def test_replay_orders_by_timestamp_with_missing_timestamps_last():
+    transactions = [_txn(i, f'2025-01-01 {i % 24:02d}:{i % 60:02d}:00') for i in range(50)]
+    transactions += [_txn(50, None), _txn(51, '2025-01-02 01:00:00'), _txn(52, None)]
+    random.Random(0).shuffle(transactions)
+    generator = RetailDataGenerator.__new__(RetailDataGenerator)
+    generator.generate_daily_transactions = lambda date: list(transactions)
+
+    replayed = list(generator.replay_daily_transactions(DAY))
+    timestamps = [txn['datetime'] for txn in replayed]
+    assert timestamps[:-2] == sorted(t for t in timestamps if t)
+    assert timestamps[-3:] == ['2025-01-02 01:00:00', None, None]
+
+
+def test_stream_to_queue_keeps_replay_order_and_ends_the_stream():
+    transactions = [_txn(i) for i in range(100)] + [_txn(100, '2025-01-02 00:30:00')]
+    sink = QueueSink(maxsize=5)  # smaller than the stream: the replay waits on the consumer
+    received, consumed = [], []
+    consumer = threading.Thread(target=lambda: consumed.append(consume_queue(sink.queue, received.append)))
+    consumer.start()
+
+    metrics = stream_transactions(_ListGenerator(transactions), DAY, sink)
+    consumer.join(timeout=10)
+
+    assert received == transactions
+    assert consumed == [len(transactions)]
+    assert metrics['events'] == len(transactions)
+    assert metrics['late_events'] == 1
+
+
+def test_stream_to_parquet_batches(tmp_path):
+    transactions = [_txn(i) for i in range(5)]
+    sink = ParquetSink(_FrameGenerator(), output_dir=str(tmp_path), prefix='t', batch_events=2)
+    stream_transactions(_ListGenerator(transactions), DAY, sink)
+    assert [list(pd.read_parquet(path)['transaction_id']) for path in sink.files_written] == [
+        ['TXN0000', 'TXN0001'], ['TXN0002', 'TXN0003'], ['TXN0004']]
+